@@ -1,61 +1,173 @@
 """Batch API endpoint for loading multiple resources at once."""
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import JSONResponse
-from typing import Optional
+import asyncio
+import time
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-from app.quickbooks.client import QuickBooksClient
-from app.quickbooks.mock_client import MockQuickBooksClient
-from app.payroll.service import PayrollService
-from app.api.routes import get_qb_client
+from app.api.routes import get_datasets
 from app.api.auto_sync import auto_sync_on_data_access
+from app.api.streaming import bytes_response
+from app.api.fastjson import frame_payload, FRAME_ORIENTS
+from app.api.rendered import cached_render_async, render_json, etag_response
+from app.reports.columnar import COLUMNAR_FORMATS, columnar_available, to_columnar
+from app.services.datasets import DatasetContext
+from app.services.executors import run_light
 
 router = APIRouter(prefix="/api/v1", tags=["batch"])
 
 
+DASHBOARD_PARTS = ("trends", "department", "employees", "report")
+
+
+def parse_parts(parts: Optional[str]) -> List[str]:
+    """
+    Parse a comma-separated parts selector (all parts when empty).
+
+    Raises:
+        HTTPException: 400 for an unknown part
+    """
+    if not parts:
+        return list(DASHBOARD_PARTS)
+    selected = [name.strip() for name in parts.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in DASHBOARD_PARTS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown dashboard parts: {', '.join(unknown) or parts}")
+    # Canonical order, so equivalent selectors share a cache entry
+    return [name for name in DASHBOARD_PARTS if name in selected]
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value for per-part durations in milliseconds."""
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
+
+
+async def build_parts(datasets: DatasetContext, parts: List[str], months: int, year: int, month: int,
+                      timings: Dict[str, float]) -> Dict:
+    """
+    Build the selected dashboard parts as concurrent tasks.
+
+    All parts come from the request's dataset context, so the month's
+    payroll and the budgets are loaded once and every part sees the same
+    snapshot. The department slice is taken from the report rather than
+    recomputed.
+
+    Args:
+        datasets: Request-scoped dataset context shared by the parts
+        parts: Parts to build
+        months: Trends window length
+        year: Report year
+        month: Report month
+        timings: Filled with milliseconds spent per part
+
+    Returns:
+        Part name -> DataFrame (employees: list of dicts)
+    """
+    async def timed(name: str, func: Callable, *args):
+        started = time.perf_counter()
+        value = await run_light(func, *args)
+        timings[name] = (time.perf_counter() - started) * 1000
+        return value
+
+    tasks = {}
+    if "report" in parts or "department" in parts:
+        tasks["report"] = timed("report", datasets.formatted_report, year, month)
+    if "trends" in parts:
+        tasks["trends"] = timed("trends", datasets.trends, months, year, month)
+    if "employees" in parts:
+        tasks["employees"] = timed("employees", datasets.employees)
+
+    results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+    if "department" in parts:
+        results["department"] = datasets.departments(year, month)
+    return {name: results[name] for name in parts}
+
+
 @router.get("/batch/dashboard")
 async def get_dashboard_data(
+    request: Request,
     months: int = Query(12, ge=1, le=24),
     year: int = Query(...),
     month: int = Query(..., ge=1, le=12),
-    qb_client = Depends(get_qb_client)
+    parts: Optional[str] = Query(None, description="Comma-separated parts to include: trends, department, employees, report (default: all)"),
+    format: str = Query("json", description="json, parquet or arrow"),
+    part: str = Query("report", description="Dashboard part for parquet/arrow: trends, department, employees or report"),
+    orient: str = Query("records", description="JSON tables as records (row objects) or split (columns + row arrays)"),
+    datasets: DatasetContext = Depends(get_datasets)
 ):
     """
     Batch endpoint to get all dashboard data in one request.
     This reduces the number of HTTP requests and improves performance.
+
+    The parts are built concurrently from one payroll/budget snapshot;
+    use parts= to fetch only the sections a client renders. Per-part
+    build times are reported in the Server-Timing header.
+
+    JSON responses are cached pre-serialized with a strong ETag, and
+    If-None-Match requests get 304 Not Modified while the data is unchanged.
+    With orient=split each table is sent as {"columns": [...], "data":
+    [[...], ...]}, which is much smaller for large firms. With format=parquet
+    or arrow a single part is returned as a typed columnar file (one table
+    per download).
     """
+    if format != "json" and format not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if orient not in FRAME_ORIENTS:
+        raise HTTPException(status_code=400, detail=f"Unsupported orient: {orient}")
+    if format in COLUMNAR_FORMATS:
+        if part not in DASHBOARD_PARTS:
+            raise HTTPException(status_code=400, detail=f"Unknown dashboard part: {part}")
+        if not columnar_available():
+            raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow")
+    selected = [part] if format in COLUMNAR_FORMATS else parse_parts(parts)
+
     try:
-        payroll_service = PayrollService(qb_client)
-        
-        # Get all data in parallel
-        from app.reports.exporter import ReportExporter
-        from app.reports.variance import format_variance_report
-        
-        # Generate variance report
-        df = payroll_service.generate_variance_report(year, month)
-        df_formatted = format_variance_report(df)
-        
-        # Get department breakdown
-        dept_df = df_formatted[df_formatted["Employee ID"] == ""].copy()
-        dept_df = dept_df[dept_df["Employee Name"].str.startswith("DEPARTMENT TOTAL")]
-        
-        # Get historical trends
-        trends_df = payroll_service.get_historical_variance_trends(months, year, month)
-        
-        # Get employees
-        employees = qb_client.get_employees()
-        
+        timings: Dict[str, float] = {}
+
+        def encode_json(frames: Dict):
+            if orient == "split" and "employees" in frames:
+                frames["employees"] = pd.DataFrame(frames["employees"])
+            return render_json({
+                name: value if isinstance(value, list) else frame_payload(value, orient)
+                for name, value in frames.items()
+            })
+
+        def encode_columnar(frames: Dict):
+            value = frames[part]
+            df = pd.DataFrame(value) if part == "employees" else value
+            return to_columnar(df, format)
+
+        async def build_dashboard():
+            frames = await build_parts(datasets, selected, months, year, month, timings)
+            started = time.perf_counter()
+            rendered = await run_light(encode_json, frames)
+            timings["render"] = (time.perf_counter() - started) * 1000
+            return rendered
+
+        if format in COLUMNAR_FORMATS:
+            frames = await build_parts(datasets, selected, months, year, month, timings)
+            data = await run_light(encode_columnar, frames)
+        else:
+            # The dashboard depends on the same inputs as its trends window,
+            # which ends at the report month
+            trends_key, tags = datasets.payroll_service.trends_cache_key(months, year, month)
+            rendered, hit = await cached_render_async(
+                f"dashboard:{orient}:{','.join(selected)}:{trends_key}", build_dashboard, tags=tags
+            )
+
         # Auto-sync if current month
         now = datetime.now()
         if year == now.year and month == now.month:
             auto_sync_on_data_access()
-        
-        return JSONResponse(content={
-            "trends": trends_df.to_dict(orient="records"),
-            "department": dept_df.to_dict(orient="records"),
-            "employees": [emp.dict() for emp in employees],
-            "report": df_formatted.to_dict(orient="records"),
-        })
+
+        if format in COLUMNAR_FORMATS:
+            media_type, extension = COLUMNAR_FORMATS[format]
+            response = bytes_response(data, filename=f"dashboard_{part}_{year}_{month:02d}.{extension}", media_type=media_type)
+            response.headers["Server-Timing"] = server_timing(timings)
+            return response
+        timing = 'cache;desc="hit"' if hit else server_timing(timings)
+        return await etag_response(rendered, request, headers={"Server-Timing": timing})
+    except HTTPException:
+        raise
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=str(e))
-
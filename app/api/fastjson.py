@@ -0,0 +1,135 @@
+"""Fast JSON encoding with native NumPy/pandas support, plus response compression."""
+import gzip
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from config import settings
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the standard library
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+FRAME_ORIENTS = ("records", "split")
+
+
+def _default(value: Any) -> Any:
+    """Convert values json/orjson cannot encode natively."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, pd.DataFrame):
+        return frame_payload(value)
+    if isinstance(value, pd.Series):
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _clean_floats(value: Any) -> Any:
+    """Replace NaN/inf with None (the stdlib fallback would emit invalid JSON)."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _clean_floats(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean_floats(item) for item in value]
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode content as compact UTF-8 JSON.
+
+    NumPy scalars and arrays, pandas timestamps and DataFrames (as records)
+    are encoded natively; NaN and infinity become null. Uses orjson when it
+    is installed and the standard library otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        _clean_floats(content), default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def frame_payload(df: pd.DataFrame, orient: str = "records") -> Any:
+    """
+    JSON-ready form of a DataFrame.
+
+    Args:
+        df: DataFrame to encode
+        orient: "records" (a list of row objects) or "split" (column names
+            once plus rows as arrays; much smaller for wide, repetitive tables)
+    """
+    if orient == "split":
+        return df.to_dict(orient="split", index=False)
+    if orient != "records":
+        raise ValueError(f"Unsupported orient: {orient}")
+    return df.to_dict(orient="records")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with dumps()."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with a content coding from ENCODINGS."""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=settings.response_brotli_quality)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """
+    Pick the content coding for a response from an Accept-Encoding header.
+
+    Codings with q=0 are refused; among the acceptable ones the order of
+    available decides (brotli before gzip). "*" accepts any coding.
+
+    Returns:
+        The chosen coding, or None to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
@@ -0,0 +1,184 @@
+"""Asynchronous export job API: submit, poll or subscribe, then download."""
+import asyncio
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from app.api.streaming import file_range_response
+from app.payroll.service import PayrollService
+from app.quickbooks.client import create_qb_client
+from app.reports.bulk import export_bulk, BULK_OUTPUTS
+from app.reports.exporter import ReportExporter
+from app.services.datasets import DatasetContext
+from app.services.executors import run_export
+from app.services.export_jobs import get_export_jobs, JobQueueFullError, FINISHED, DONE
+
+router = APIRouter(prefix="/api/v1", tags=["exports"])
+
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+JOB_FORMATS = ("excel", "csv", "sheets", "bulk")
+EVENT_POLL_SECONDS = 0.5
+
+
+class ExportJobRequest(BaseModel):
+    """Request model for an export job."""
+    format: str = "excel"  # excel, csv, sheets (one month) or bulk (year-end pack)
+    year: int
+    month: Optional[int] = None  # Required for excel, csv and sheets
+    months: Optional[int] = 12  # Months of trends in excel charts
+    bulk_months: Optional[List[int]] = None  # Months in a bulk pack (default: 1-12)
+    company_ids: Optional[List[str]] = None  # Companies in a bulk pack
+    output: str = "workbook"  # Bulk packs: workbook or zip
+
+
+def _build_month_export(params: Dict, target: Path, progress: Callable) -> Dict:
+    """Build a one-month Excel/CSV artifact or push the month to Google Sheets."""
+    year, month = params["year"], params["month"]
+    datasets = DatasetContext(PayrollService(create_qb_client()))
+    progress(0, 2, "report")
+    df_formatted = datasets.formatted_report(year, month)
+    exporter = ReportExporter()
+    progress(1, 2, params["format"])
+
+    if params["format"] == "sheets":
+        sheet_name = f"VarianceReport_{year}_{month:02d}"
+        result = exporter.export_to_google_sheets(df_formatted, sheet_name=sheet_name)
+        progress(2, 2, "done")
+        return {"result": {"updated_cells": result.get("updatedCells", 0), "sheet_name": sheet_name}}
+
+    if params["format"] == "csv":
+        exporter.export_to_csv(df_formatted, target)
+        progress(2, 2, "done")
+        return {"filename": f"variance_report_{year}_{month:02d}.csv", "media_type": "text/csv"}
+
+    exporter.export_to_excel(
+        df_formatted,
+        target,
+        department_data=datasets.departments(year, month),
+        trends_data=datasets.trends(params["months"] or 12, year, month),
+        include_charts=True
+    )
+    progress(2, 2, "done")
+    return {"filename": f"variance_report_{year}_{month:02d}.xlsx", "media_type": EXCEL_MEDIA_TYPE}
+
+
+def _build_bulk_export(params: Dict, target: Path, progress: Callable) -> Dict:
+    """Build a year-end pack artifact."""
+    export_bulk(target, params["year"], months=params["bulk_months"],
+                company_ids=params["company_ids"], output=params["output"], progress=progress)
+    if params["output"] == "zip":
+        return {"filename": f"variance_pack_{params['year']}.zip", "media_type": "application/zip"}
+    return {"filename": f"variance_pack_{params['year']}.xlsx", "media_type": EXCEL_MEDIA_TYPE}
+
+
+def _job_params(request: ExportJobRequest) -> Dict:
+    """Validate a request and reduce it to the parameters that identify the job."""
+    if request.format not in JOB_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
+    if request.format == "bulk":
+        if request.output not in BULK_OUTPUTS:
+            raise HTTPException(status_code=400, detail=f"Unsupported output: {request.output}")
+        if request.bulk_months and any(month < 1 or month > 12 for month in request.bulk_months):
+            raise HTTPException(status_code=400, detail="Months must be between 1 and 12")
+        return {
+            "format": "bulk",
+            "year": request.year,
+            "bulk_months": sorted(set(request.bulk_months)) if request.bulk_months else None,
+            "company_ids": request.company_ids,
+            "output": request.output,
+        }
+    if request.month is None or not 1 <= request.month <= 12:
+        raise HTTPException(status_code=400, detail="month (1-12) is required")
+    params = {"format": request.format, "year": request.year, "month": request.month}
+    if request.format == "excel":
+        params["months"] = request.months or 12
+    return params
+
+
+def _get_job(job_id: str):
+    """Look up a job or raise 404."""
+    job = get_export_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return job
+
+
+@router.post("/exports", status_code=202)
+async def create_export_job(request: ExportJobRequest):
+    """
+    Start an export job and return its ID without waiting for the export.
+
+    Submitting the same export while an identical job is still queued or
+    running returns that job (created: false) instead of starting another.
+    Poll GET /exports/{id}, or subscribe to GET /exports/{id}/events, then
+    download from GET /exports/{id}/download.
+    """
+    params = _job_params(request)
+    if params["format"] == "sheets":
+        exporter = await run_export(ReportExporter)
+        if not exporter.sheets_service:
+            raise HTTPException(
+                status_code=400,
+                detail="Google Sheets not configured. Please set up credentials."
+            )
+
+    builder = _build_bulk_export if params["format"] == "bulk" else _build_month_export
+    try:
+        job, created = get_export_jobs().submit(params, builder)
+    except JobQueueFullError:
+        raise HTTPException(status_code=503, detail="Too many export jobs queued. Please retry shortly.")
+
+    return JSONResponse(
+        status_code=202 if created else 200,
+        content={**job.to_dict(), "created": created},
+        headers={"Location": f"/api/v1/exports/{job.id}"}
+    )
+
+
+@router.get("/exports/{job_id}")
+async def get_export_job(job_id: str):
+    """Get the status and progress of an export job."""
+    return _get_job(job_id).to_dict()
+
+
+@router.get("/exports/{job_id}/events")
+async def export_job_events(job_id: str, request: Request):
+    """
+    Server-sent events for an export job.
+
+    Sends a "progress" event on every state change and a final "done" or
+    "failed" event, then closes the stream.
+    """
+    job = _get_job(job_id)
+
+    async def events():
+        version = -1
+        while not await request.is_disconnected():
+            if job.version != version:
+                version = job.version
+                state = job.to_dict()
+                finished = state["status"] in FINISHED
+                event = state["status"] if finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(state)}\n\n"
+                if finished:
+                    return
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/exports/{job_id}/download")
+async def download_export(job_id: str, request: Request):
+    """Download a finished export; supports single byte Range requests for resuming."""
+    job = _get_job(job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    if job.path is None or not job.path.exists():
+        raise HTTPException(status_code=404, detail="Export job has no downloadable artifact")
+    return file_range_response(job.path, job.filename, job.media_type, request.headers.get("range"))
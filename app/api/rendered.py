@@ -0,0 +1,159 @@
+"""Pre-serialized JSON responses cached with a strong ETag."""
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from app.api.fastjson import dumps, compress, negotiate_encoding, ENCODINGS
+from app.services.cache import HIT, STALE, WAIT, get_cache
+from app.services.executors import run_light
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Clients may keep responses but must revalidate them (cheap with the ETag)
+CACHE_CONTROL = "private, no-cache"
+
+
+class RenderedResponse:
+    """
+    Serialized response body with its ETag and compressed variants.
+
+    Bodies of at least settings.response_compression_min_bytes may be sent
+    with any available content coding. Each coding is compressed the first
+    time a client negotiates it and kept, so a cached response is
+    compressed at most once per coding and an uncached one at most once.
+    """
+
+    __slots__ = ("body", "etag", "media_type", "encodings", "encoded")
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = ENCODINGS if len(body) >= settings.response_compression_min_bytes else ()
+        self.encoded: Dict[str, bytes] = {}
+
+    def etag_for(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag of one representation (each content coding has its own)."""
+        return f'"{self.etag}-{encoding}"' if encoding else f'"{self.etag}"'
+
+    def content(self, encoding: Optional[str] = None) -> bytes:
+        """The body in a content coding from encodings (None: uncompressed)."""
+        if encoding is None:
+            return self.body
+        encoded = self.encoded.get(encoding)
+        if encoded is None:
+            encoded = self.encoded[encoding] = compress(self.body, encoding)
+        return encoded
+
+
+def render_json(content: Any) -> RenderedResponse:
+    """Serialize content as JSON (see app/api/fastjson.py)."""
+    return RenderedResponse(dumps(content))
+
+
+def cached_render(key: str, render: Callable[[], RenderedResponse], ttl: int = 300,
+                  stale_ttl: float = 0, tags: Iterable[str] = ()) -> RenderedResponse:
+    """
+    Get a rendered response from the cache, rendering it once on a miss.
+
+    Args:
+        key: Key of the data the response is rendered from (prefixed with "rendered:")
+        render: Builds the response (blocking; call from a worker thread)
+        ttl: Seconds the response is fresh
+        stale_ttl: Seconds an expired response is served while re-rendering
+        tags: The data's tags, so the response is invalidated with it
+    """
+    return get_cache().get_or_compute(f"rendered:{key}", render, ttl=ttl, stale_ttl=stale_ttl, tags=tags)
+
+
+async def cached_render_async(key: str, build: Callable[[], Awaitable[RenderedResponse]], ttl: int = 300,
+                              stale_ttl: float = 0, tags: Iterable[str] = ()) -> Tuple[RenderedResponse, bool]:
+    """
+    cached_render for responses assembled by concurrent async tasks.
+
+    Concurrent misses share one build, and a response built while one of
+    its tags was invalidated is not stored (see CacheBackend.claim).
+
+    Returns:
+        (response, hit) where hit tells whether this request reused a
+        response from the cache or built by another request
+    """
+    cache = get_cache()
+    full_key = f"rendered:{key}"
+    state, rendered, flight = await run_light(cache.claim, full_key, tags)
+    if state == HIT:
+        return rendered, True
+    if state == STALE:
+        if flight is not None:
+            task = asyncio.ensure_future(_build_flight(full_key, flight, build, ttl, stale_ttl))
+            _refreshes.add(task)
+            task.add_done_callback(_refreshes.discard)
+        return rendered, True
+    if state == WAIT:
+        return await run_light(cache.wait, flight), True
+    return await _build_flight(full_key, flight, build, ttl, stale_ttl, raise_errors=True), False
+
+
+# Background refreshes in progress (the event loop only keeps weak references)
+_refreshes: Set[asyncio.Future] = set()
+
+
+async def _build_flight(key: str, flight, build: Callable[[], Awaitable[RenderedResponse]], ttl: int,
+                        stale_ttl: float, raise_errors: bool = False) -> Optional[RenderedResponse]:
+    """Build a response for a claimed cache flight and complete it."""
+    cache = get_cache()
+    try:
+        rendered = await build()
+    except BaseException as e:
+        # Also on cancellation, so waiters are never left hanging
+        cache.complete(key, flight, error=e)
+        if raise_errors or not isinstance(e, Exception):
+            raise
+        logger.warning(f"Background refresh of {key} failed: {e}")
+        return None
+    await run_light(cache.complete, key, flight, rendered, None, ttl, stale_ttl)
+    return rendered
+
+
+def etag_matches(if_none_match: Optional[str], rendered: RenderedResponse) -> bool:
+    """
+    Whether an If-None-Match header names any representation of a response.
+
+    Uses weak comparison, as RFC 9110 requires for If-None-Match, and
+    accepts the ETag of any content coding since they share one body.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    known = {rendered.etag_for(encoding) for encoding in (None, *rendered.encodings)}
+    return any(tag.strip().removeprefix("W/") in known for tag in if_none_match.split(","))
+
+
+async def etag_response(rendered: RenderedResponse, request: Request, headers: Optional[dict] = None) -> Response:
+    """
+    Send a rendered response, compressed if the client accepts it, or 304
+    Not Modified if the client already has it.
+
+    A coding not compressed yet is compressed in a worker thread.
+
+    Args:
+        rendered: Cached response
+        request: Incoming request (for If-None-Match and Accept-Encoding)
+        headers: Extra response headers
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), rendered.encodings)
+    headers = {**(headers or {}), "ETag": rendered.etag_for(encoding), "Cache-Control": CACHE_CONTROL}
+    if rendered.encodings:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), rendered):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=rendered.body, media_type=rendered.media_type, headers=headers)
+    headers["Content-Encoding"] = encoding
+    content = rendered.encoded.get(encoding) or await run_light(rendered.content, encoding)
+    return Response(content=content, media_type=rendered.media_type, headers=headers)
+
@@ -1,21 +1,28 @@
 """FastAPI routes for the application."""
-from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from datetime import datetime
 import logging
 from pydantic import BaseModel
-import tempfile
-from pathlib import Path
 
-from app.quickbooks.client import QuickBooksClient
-from app.quickbooks.mock_client import MockQuickBooksClient
-from app.payroll.service import PayrollService
+from app.quickbooks.client import create_qb_client
+from app.payroll.service import PayrollService, resolve_end_period
 from app.reports.exporter import ReportExporter
-from app.reports.variance import format_variance_report
+from app.reports.bulk import export_bulk, BULK_OUTPUTS
+from app.reports.columnar import COLUMNAR_FORMATS, columnar_available, to_columnar
+from app.reports.variance import department_rows, iter_formatted_rows, iter_ndjson, iter_json_array
 from app.services.sheets_sync import SheetsSyncService
 from app.api.auto_sync import auto_sync_latest_report, auto_sync_on_data_access
-from app.services.cache import get_cache
+from app.api.streaming import get_export_limiter, spooled_buffer, buffer_response, bytes_response
+from app.api.fastjson import frame_payload
+from app.api.rendered import cached_render, render_json, etag_response
+from app.services.cache import get_cache, period_tag
+from app.services.sync_queue import get_sync_queue
+from app.services.sheets_quota import get_sheets_scheduler
+from app.services.executors import run_light, run_export, get_loop_monitor
+from app.services.warmup import get_cache_warmer
+from app.services.datasets import DatasetContext
 from config import settings
 
 
@@ -31,28 +38,70 @@ def get_qb_client():
     1. Get tokens from session/database
     2. Use real QuickBooksClient
     """
-    # Use mock data if configured or if credentials are missing
-    if settings.use_mock_data or not settings.qb_client_id or not settings.qb_client_secret:
-        return MockQuickBooksClient()
+    return create_qb_client()
+
+
+def get_datasets(qb_client = Depends(get_qb_client)) -> DatasetContext:
+    """
+    Get the request's dataset context.
     
-    # In production, get tokens from OAuth flow/session
-    access_token = "your_access_token"  # Get from OAuth flow
-    company_id = "your_company_id"  # Get from OAuth flow
-    return QuickBooksClient(access_token, company_id)
+    FastAPI resolves a dependency once per request, so every use within a
+    request shares one context and each dataset is built at most once.
+    """
+    return DatasetContext(PayrollService(qb_client))
 
 
 class VarianceReportRequest(BaseModel):
     """Request model for variance report."""
     year: int
     month: int
-    format: str = "json"
+    format: str = "json"  # json, ndjson, json-stream, parquet, arrow, excel, csv, sheets
     months: Optional[int] = 12  # Number of months for historical trends
+    compress: bool = False  # gzip excel/csv downloads when the client accepts it
+
+
+class BulkExportRequest(BaseModel):
+    """Request model for a bulk (year-end pack) export."""
+    year: int
+    months: Optional[List[int]] = None  # Defaults to all 12 months
+    company_ids: Optional[List[str]] = None  # Defaults to the configured company
+    output: str = "workbook"  # workbook (one merged workbook) or zip (one workbook per company)
+    compress: bool = False
 
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "service": "QuickBooks Accounting Automation"}
+    return {
+        "status": "healthy",
+        "service": "QuickBooks Accounting Automation",
+        "event_loop_lag": get_loop_monitor().stats(),
+        "cache_warmup": get_cache_warmer().stats()
+    }
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Get cache size and per-namespace hit/miss/eviction statistics."""
+    return get_cache().stats()
+
+
+class CacheInvalidateRequest(BaseModel):
+    """Request model for tag-based cache invalidation."""
+    tags: List[str] = []  # e.g. "period:2024-03", "company:default", "budgets"
+    year: Optional[int] = None  # year + month add the period tag
+    month: Optional[int] = None
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(request: CacheInvalidateRequest):
+    """Invalidate only the cache entries depending on the given inputs."""
+    tags = list(request.tags)
+    if request.year is not None and request.month is not None:
+        tags.append(period_tag(request.year, request.month))
+    if not tags:
+        raise HTTPException(status_code=400, detail="Give tags or year and month to invalidate")
+    return {"status": "success", "tags": tags, "invalidated": get_cache().invalidate_tags(*tags)}
 
 
 @router.post("/cache/clear")
@@ -70,7 +119,7 @@ async def clear_cache():
 async def get_employees(qb_client = Depends(get_qb_client)):
     """Get list of employees from QuickBooks."""
     try:
-        employees = qb_client.get_employees()
+        employees = await run_light(qb_client.get_employees)
         return {"employees": [emp.dict() for emp in employees]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -79,65 +128,98 @@ async def get_employees(qb_client = Depends(get_qb_client)):
 @router.post("/reports/variance")
 async def generate_variance_report(
     request: VarianceReportRequest,
-    qb_client = Depends(get_qb_client)
+    http_request: Request,
+    datasets: DatasetContext = Depends(get_datasets)
 ):
     """
     Generate salary variance report.
     
+    The ndjson and json-stream formats stream rows as they are generated
+    instead of building the whole report before responding. Excel and CSV
+    exports are built in memory (spilling to an anonymous temp file when
+    large) and streamed; set compress to gzip the download.
+    
     Args:
         request: Report request with year, month, and format
-        qb_client: QuickBooks client dependency
+        http_request: Incoming HTTP request (for Accept-Encoding)
+        datasets: Request-scoped dataset context
     """
     try:
-        payroll_service = PayrollService(qb_client)
-        df = payroll_service.generate_variance_report(request.year, request.month)
-        df_formatted = format_variance_report(df)
+        if request.format in COLUMNAR_FORMATS and not columnar_available():
+            raise HTTPException(status_code=400, detail=f"{request.format} export requires pyarrow")
         
-        exporter = ReportExporter()
+        if request.format in ("ndjson", "json-stream"):
+            # Stream rows straight from the generator pipeline; department
+            # totals are emitted last, once all employee rows have been sent
+            rows = iter_formatted_rows(
+                datasets.payroll_service.iter_variance_rows(request.year, request.month)
+            )
+            auto_sync_latest_report(request.year, request.month)
+            if request.format == "ndjson":
+                return StreamingResponse(iter_ndjson(rows), media_type="application/x-ndjson")
+            return StreamingResponse(iter_json_array(rows), media_type="application/json")
+        
+        df_formatted = await run_light(datasets.formatted_report, request.year, request.month)
         
         if request.format == "json":
             # Auto-sync latest report if this is current month
             auto_sync_latest_report(request.year, request.month)
-            return JSONResponse(content=df_formatted.to_dict(orient="records"))
+            rendered = await run_light(lambda: render_json(frame_payload(df_formatted)))
+            return await etag_response(rendered, http_request)
         
-        elif request.format == "excel":
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-                # Get additional data for charts
-                dept_df = payroll_service.generate_variance_report(request.year, request.month)
-                dept_df_formatted = format_variance_report(dept_df)
-                
-                # Get department breakdown
-                dept_breakdown = dept_df_formatted[dept_df_formatted["Employee ID"] == ""].copy()
-                dept_breakdown = dept_breakdown[dept_breakdown["Employee Name"].str.startswith("DEPARTMENT TOTAL")]
-                
-                # Get historical trends
-                trends_df = payroll_service.get_historical_variance_trends(
-                    request.months or 12, 
-                    request.year, 
-                    request.month
-                )
-                
-                filepath = exporter.export_to_excel(
+        if request.format in COLUMNAR_FORMATS:
+            auto_sync_latest_report(request.year, request.month)
+            media_type, extension = COLUMNAR_FORMATS[request.format]
+            data = await run_export(to_columnar, df_formatted, request.format)
+            return bytes_response(
+                data,
+                filename=f"variance_report_{request.year}_{request.month:02d}.{extension}",
+                media_type=media_type
+            )
+        
+        # Exporter setup and export stages run in the export pool
+        exporter = await run_export(ReportExporter)
+        
+        if request.format in ("excel", "csv"):
+            def build_excel(buffer):
+                # Chart data comes from the same report build as the main sheet
+                return exporter.export_to_excel(
                     df_formatted, 
-                    tmp.name,
-                    department_data=dept_breakdown,
-                    trends_data=trends_df,
+                    buffer,
+                    department_data=datasets.departments(request.year, request.month),
+                    trends_data=datasets.trends(request.months or 12, request.year, request.month),
                     include_charts=True
                 )
-                return FileResponse(
-                    filepath,
-                    filename=f"variance_report_{request.year}_{request.month:02d}.xlsx",
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-        
-        elif request.format == "csv":
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
-                filepath = exporter.export_to_csv(df_formatted, tmp.name)
-                return FileResponse(
-                    filepath,
-                    filename=f"variance_report_{request.year}_{request.month:02d}.csv",
-                    media_type="text/csv"
-                )
+            
+            limiter = get_export_limiter()
+            if not await limiter.acquire(settings.export_slot_timeout):
+                raise HTTPException(status_code=503, detail="Too many concurrent exports. Please retry shortly.")
+            
+            # Exports are built in a spooled buffer and streamed; the buffer
+            # and the export slot are released once the response is sent
+            buffer = spooled_buffer()
+            try:
+                if request.format == "excel":
+                    await run_export(build_excel, buffer)
+                    extension = "xlsx"
+                    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                else:
+                    await run_export(exporter.export_to_csv, df_formatted, buffer)
+                    extension = "csv"
+                    media_type = "text/csv"
+            except Exception:
+                buffer.close()
+                limiter.release()
+                raise
+            
+            return buffer_response(
+                buffer,
+                filename=f"variance_report_{request.year}_{request.month:02d}.{extension}",
+                media_type=media_type,
+                compress=request.compress,
+                accept_encoding=http_request.headers.get("accept-encoding"),
+                on_close=limiter.release
+            )
         
         elif request.format == "sheets":
             if not exporter.sheets_service:
@@ -148,7 +230,8 @@ async def generate_variance_report(
             
             # Export to specific month sheet
             month_sheet_name = f"VarianceReport_{request.year}_{request.month:02d}"
-            result = exporter.export_to_google_sheets(
+            result = await run_export(
+                exporter.export_to_google_sheets,
                 df_formatted,
                 sheet_name=month_sheet_name
             )
@@ -166,54 +249,124 @@ async def generate_variance_report(
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported format: {request.format}")
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/reports/bulk")
+async def bulk_export(request: BulkExportRequest, http_request: Request):
+    """
+    Export a year-end pack: a sheet per month (and company) plus summary charts.
+    
+    The monthly reports are built in parallel worker processes. Returns
+    one merged workbook, or a zip with one workbook per company.
+    """
+    if request.output not in BULK_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"Unsupported output: {request.output}")
+    if request.months and any(month < 1 or month > 12 for month in request.months):
+        raise HTTPException(status_code=400, detail="Months must be between 1 and 12")
+    
+    limiter = get_export_limiter()
+    if not await limiter.acquire(settings.export_slot_timeout):
+        raise HTTPException(status_code=503, detail="Too many concurrent exports. Please retry shortly.")
+    
+    buffer = spooled_buffer()
+    try:
+        await run_export(
+            export_bulk,
+            buffer,
+            request.year,
+            months=request.months,
+            company_ids=request.company_ids,
+            output=request.output
+        )
+    except Exception as e:
+        buffer.close()
+        limiter.release()
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if request.output == "zip":
+        extension, media_type = "zip", "application/zip"
+    else:
+        extension = "xlsx"
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return buffer_response(
+        buffer,
+        filename=f"variance_pack_{request.year}.{extension}",
+        media_type=media_type,
+        compress=request.compress,
+        accept_encoding=http_request.headers.get("accept-encoding"),
+        on_close=limiter.release
+    )
+
+
 @router.get("/reports/variance/trends")
 async def get_variance_trends(
+    http_request: Request,
     months: int = Query(12, ge=1, le=24),
     end_year: Optional[int] = Query(None, description="End year for trends (defaults to current year)"),
     end_month: Optional[int] = Query(None, ge=1, le=12, description="End month for trends (defaults to current month)"),
-    qb_client = Depends(get_qb_client)
+    format: str = Query("json", description="json, parquet or arrow"),
+    datasets: DatasetContext = Depends(get_datasets)
 ):
     """
     Get historical variance trends.
     
+    JSON responses are cached pre-serialized with a strong ETag; send it
+    back in If-None-Match to get 304 Not Modified while trends are unchanged.
+    
     Args:
         months: Number of months to look back
         end_year: End year for trends (defaults to current year)
         end_month: End month for trends (defaults to current month)
+        format: json, or parquet/arrow for a typed columnar download
     """
+    if format != "json" and format not in COLUMNAR_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if format in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow")
     try:
-        payroll_service = PayrollService(qb_client)
-        df = payroll_service.get_historical_variance_trends(months, end_year, end_month)
-        
         # Auto-sync latest data when trends are accessed (only if using current date)
         if end_year is None or end_month is None:
             auto_sync_on_data_access()
         
-        return JSONResponse(content=df.to_dict(orient="records"))
+        end_year, end_month = resolve_end_period(end_year, end_month)
+        if format in COLUMNAR_FORMATS:
+            df = await run_light(datasets.trends, months, end_year, end_month)
+            media_type, extension = COLUMNAR_FORMATS[format]
+            data = await run_export(to_columnar, df, format)
+            return bytes_response(data, filename=f"variance_trends_{months}.{extension}", media_type=media_type)
+        
+        cache_key, tags = datasets.payroll_service.trends_cache_key(months, end_year, end_month)
+        
+        def render():
+            return render_json(frame_payload(datasets.trends(months, end_year, end_month)))
+        
+        # Hits skip both the DataFrame conversion and JSON encoding
+        rendered = await run_light(
+            cached_render, cache_key, render, stale_ttl=settings.trends_cache_stale_seconds, tags=tags
+        )
+        return await etag_response(rendered, http_request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/reports/variance/by-department")
 async def get_variance_by_department(
+    http_request: Request,
     year: int = Query(...),
     month: int = Query(..., ge=1, le=12),
-    qb_client = Depends(get_qb_client)
+    datasets: DatasetContext = Depends(get_datasets)
 ):
     """Get variance report aggregated by department."""
     try:
-        payroll_service = PayrollService(qb_client)
-        df = payroll_service.generate_variance_report(year, month)
+        def build_departments():
+            # Department totals only
+            return render_json(frame_payload(department_rows(datasets.report(year, month))))
         
-        # Filter to department totals only
-        dept_df = df[df["Employee ID"] == ""].copy()
-        dept_df = dept_df[dept_df["Employee Name"].str.startswith("DEPARTMENT TOTAL")]
-        
-        return JSONResponse(content=dept_df.to_dict(orient="records"))
+        return await etag_response(await run_light(build_departments), http_request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -232,10 +385,10 @@ async def sync_to_sheets(
         months: Number of months for historical sync (default: 12)
     """
     try:
-        sync_service = SheetsSyncService()
+        sync_service = await run_export(SheetsSyncService)
         
         if sync_type == "latest":
-            success = sync_service.sync_latest_report()
+            success = await run_export(sync_service.sync_latest_report)
             return {
                 "status": "success" if success else "failed",
                 "message": "Latest report synced to Google Sheets" if success else "Failed to sync",
@@ -243,14 +396,14 @@ async def sync_to_sheets(
             }
         
         elif sync_type == "current":
-            success = sync_service.sync_current_month()
+            success = await run_export(sync_service.sync_current_month)
             return {
                 "status": "success" if success else "failed",
                 "message": "Current month synced to Google Sheets" if success else "Failed to sync"
             }
         
         elif sync_type == "historical":
-            success = sync_service.sync_historical_trends(months)
+            success = await run_export(sync_service.sync_historical_trends, months)
             return {
                 "status": "success" if success else "failed",
                 "message": f"{months} months of historical trends synced" if success else "Failed to sync",
@@ -258,7 +411,7 @@ async def sync_to_sheets(
             }
         
         elif sync_type == "all":
-            results = sync_service.sync_all()
+            results = await run_export(sync_service.sync_all)
             return {
                 "status": "success" if all(results.values()) else "partial",
                 "message": "All data synced to Google Sheets",
@@ -268,3 +421,12 @@ async def sync_to_sheets(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+@router.get("/sync/status")
+async def get_sync_status():
+    """Get background Google Sheets sync queue and API quota status."""
+    return {
+        **get_sync_queue().stats(),
+        "sheets_api": get_sheets_scheduler().stats()
+    }
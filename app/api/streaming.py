@@ -0,0 +1,235 @@
+"""Stream generated export files to the client without leaving files behind."""
+import asyncio
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.api.fastjson import negotiate_encoding
+from config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ExportLimiter:
+    """Cap the number of exports being produced or streamed at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.active = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for an export slot."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A semaphore belongs to the loop that first waits on it; exports
+            # of a previous loop (e.g. an earlier app lifespan) are gone
+            self._semaphore = asyncio.Semaphore(self.limit)
+            self._loop = loop
+            self.active = 0
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.active += 1
+        return True
+
+    def release(self):
+        """Give an export slot back."""
+        self.active -= 1
+        self._semaphore.release()
+
+
+_export_limiter = ExportLimiter(settings.max_concurrent_exports)
+
+
+def get_export_limiter() -> ExportLimiter:
+    """Get the global export limiter."""
+    return _export_limiter
+
+
+def spooled_buffer():
+    """
+    Create a buffer for one export.
+
+    Small exports stay in memory; larger ones roll over to an anonymous
+    temporary file that the OS removes as soon as the buffer is closed.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=settings.export_spool_max_bytes, mode="w+b")
+
+
+class _BufferCleanup:
+    """Close an export buffer and run its on_close callback, once."""
+
+    def __init__(self, buffer, on_close: Optional[Callable]):
+        self.buffer = buffer
+        self.on_close = on_close
+        self._done = False
+
+    def __call__(self):
+        if self._done:
+            return
+        self._done = True
+        try:
+            self.buffer.close()
+        finally:
+            if self.on_close:
+                self.on_close()
+
+
+class CleanupStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that runs a cleanup callback however it ends.
+
+    The body generator's own finally block never runs if the response is
+    cancelled (or the client disconnects) before the first chunk is
+    requested, so the cleanup is also run once the response is done.
+    """
+
+    def __init__(self, content, cleanup: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.cleanup()
+
+
+async def _iter_buffer(buffer, compress: bool, cleanup: Callable[[], None]):
+    """Yield the buffer contents in chunks, cleaning up as soon as they are sent."""
+    try:
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        while True:
+            chunk = await run_in_threadpool(buffer.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+        if compressor:
+            yield compressor.flush()
+    finally:
+        cleanup()
+
+
+def buffer_response(buffer, filename: str, media_type: str, compress: bool = False,
+                    accept_encoding: Optional[str] = None, on_close: Optional[Callable] = None) -> StreamingResponse:
+    """
+    Stream a spooled export buffer as a file download.
+
+    Args:
+        buffer: Buffer holding the export (read from the start)
+        filename: Download filename
+        media_type: Content type of the export
+        compress: gzip the response body (Content-Encoding: gzip) if the
+            client's Accept-Encoding allows it
+        accept_encoding: The request's Accept-Encoding header
+        on_close: Called once the buffer is closed, even if the client disconnects
+    """
+    size = buffer.seek(0, 2)
+    buffer.seek(0)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compress:
+        # The body depends on Accept-Encoding whichever way it is negotiated
+        headers["Vary"] = "Accept-Encoding"
+        compress = negotiate_encoding(accept_encoding, ("gzip",)) == "gzip"
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    else:
+        headers["Content-Length"] = str(size)
+    cleanup = _BufferCleanup(buffer, on_close)
+    return CleanupStreamingResponse(
+        _iter_buffer(buffer, compress, cleanup),
+        cleanup,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" Range header.
+
+    Returns:
+        (start, end) inclusive, None for a full download; raises ValueError
+        if the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length <= 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("Range not satisfiable")
+    return first, last
+
+
+async def _iter_file(path: Path, start: int, length: int):
+    """Yield length bytes of a file from start, in chunks."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_range_response(path: Path, filename: str, media_type: str,
+                        range_header: Optional[str] = None) -> Response:
+    """
+    Serve a stored file as a download, honoring a single byte Range.
+
+    Args:
+        path: File to serve
+        filename: Download filename
+        media_type: Content type of the file
+        range_header: Value of the request's Range header
+    """
+    size = path.stat().st_size
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Accept-Ranges": "bytes",
+    }
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+def bytes_response(data: bytes, filename: str, media_type: str) -> Response:
+    """Return an in-memory export as a file download."""
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,8 +1,28 @@
 """Budget management for salary tracking."""
+import hashlib
 import json
+import threading
 from pathlib import Path
 from typing import Dict, Optional
 from datetime import datetime
+from app.services.cache import get_cache, period_tag, BUDGETS_TAG
+
+# Resolved budget file path -> content hash last seen in this process. A
+# different hash on load means that file changed outside set_budget(), so
+# every cached result that depends on budgets is invalidated.
+_known_versions: Dict[str, str] = {}
+_known_versions_lock = threading.Lock()
+
+
+def _observe_version(budget_file: Path, version: str, saved: bool = False):
+    """Record a budget file's version, invalidating budget-dependent cache entries on external changes."""
+    path = str(budget_file.resolve())
+    with _known_versions_lock:
+        known = _known_versions.get(path)
+        changed = not saved and known is not None and known != version
+        _known_versions[path] = version
+    if changed:
+        get_cache().invalidate_tags(BUDGETS_TAG)
 
 
 class BudgetManager:
@@ -32,17 +52,30 @@ class BudgetManager:
             import os
             mtime = os.path.getmtime(self.budget_file)
             if not hasattr(self, '_last_mtime') or mtime > self._last_mtime:
-                with open(self.budget_file, "r") as f:
-                    self.budgets = json.load(f)
+                with open(self.budget_file, "rb") as f:
+                    raw = f.read()
+                self.budgets = json.loads(raw)
+                self._version = hashlib.sha1(raw).hexdigest()
                 self._last_mtime = mtime
+                _observe_version(self.budget_file, self._version)
         else:
             self.budgets = {}
+            self._version = "empty"
             # Don't create empty file if it doesn't exist - might be deployment issue
     
     def _save_budgets(self):
         """Save budgets to JSON file."""
+        raw = json.dumps(self.budgets, indent=2)
         with open(self.budget_file, "w") as f:
-            json.dump(self.budgets, f, indent=2)
+            f.write(raw)
+        self._version = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        _observe_version(self.budget_file, self._version, saved=True)
+    
+    @property
+    def version(self) -> str:
+        """Content hash of the budget store; changes whenever budgets change."""
+        self._load_budgets()
+        return self._version
     
     def get_budget(self, employee_id: str, month: str, year: int) -> float:
         """
@@ -83,6 +116,8 @@ class BudgetManager:
             "amount": amount
         }
         self._save_budgets()
+        # Only results covering this month depend on the new budget
+        get_cache().invalidate_tags(period_tag(year, int(month)))
     
     def get_all_budgets(self, month: str, year: int) -> Dict:
         """Get all budgets for a specific month."""
@@ -1,27 +1,61 @@
 """Payroll service for processing and comparing data."""
+import hashlib
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict, Union, Optional
+from typing import Callable, List, Dict, Iterator, Union, Optional, Tuple
 from app.quickbooks.client import QuickBooksClient
 from app.quickbooks.mock_client import MockQuickBooksClient
 from app.quickbooks.models import PayrollItem
 from app.payroll.budget import BudgetManager
-from app.services.cache import cached, get_cache
+from app.services.cache import cached, get_cache, period_tag, company_tag, BUDGETS_TAG
+from config import settings
 import pandas as pd
 
 
+# Called with (year, month) to get that month's (payroll by employee, budgets);
+# lets callers that already hold the inputs (see DatasetContext) supply them
+PeriodInputs = Callable[[int, int], Tuple[Dict, Dict]]
+
+
+def _report_tags(service: "PayrollService", year: int, month: int,
+                 inputs: Optional[PeriodInputs] = None) -> List[str]:
+    """Inputs of a month's variance report."""
+    return [company_tag(service.company_id), BUDGETS_TAG, period_tag(year, month)]
+
+
 class PayrollService:
     """Service for processing payroll data and generating variance reports."""
     
     def __init__(self, qb_client: Union[QuickBooksClient, MockQuickBooksClient]):
         """Initialize payroll service."""
         self.qb_client = qb_client
+        self.company_id = getattr(qb_client, "company_id", None)
         self.budget_manager = BudgetManager()
         self._payroll_cache = {}  # Simple cache for monthly payroll data
+        self._payroll_locks: Dict[str, threading.Lock] = {}  # One load per month, even when called concurrently
+        self._payroll_locks_lock = threading.Lock()
+    
+    def __cache_key__(self) -> str:
+        """Results depend only on the company, so services for it share cache entries."""
+        return company_tag(self.company_id)
+    
+    def invalidate_period(self, year: int, month: int):
+        """
+        Drop cached data computed from one month's payroll (call on a payroll update).
+        
+        Only the trends and reports covering that month are invalidated;
+        the rest of the cache stays warm.
+        """
+        self._payroll_cache.pop(f"payroll_{year}_{month:02d}", None)
+        get_cache().invalidate_tags(period_tag(year, month))
     
     def get_monthly_payroll(self, year: int, month: int) -> Dict:
         """
         Get payroll data for a specific month (cached).
         
+        Thread-safe: concurrent callers for the same month share one load, so
+        one service can serve as a payroll snapshot for parallel work.
+        
         Args:
             year: Year (e.g., 2024)
             month: Month (1-12)
@@ -34,6 +68,15 @@ class PayrollService:
         if cache_key in self._payroll_cache:
             return self._payroll_cache[cache_key]
         
+        with self._payroll_locks_lock:
+            lock = self._payroll_locks.setdefault(cache_key, threading.Lock())
+        with lock:
+            if cache_key not in self._payroll_cache:
+                self._payroll_cache[cache_key] = self._load_monthly_payroll(year, month)
+            return self._payroll_cache[cache_key]
+    
+    def _load_monthly_payroll(self, year: int, month: int) -> Dict:
+        """Fetch a month's payroll and aggregate it by employee (uncached)."""
         start_date = datetime(year, month, 1)
         if month == 12:
             end_date = datetime(year + 1, 1, 1) - timedelta(days=1)
@@ -58,33 +101,86 @@ class PayrollService:
             employee_totals[emp_id]["total_amount"] += item.amount
             employee_totals[emp_id]["items"].append(item)
         
-        # Cache the result
-        self._payroll_cache[cache_key] = employee_totals
         return employee_totals
     
-    def generate_variance_report(self, year: int, month: int) -> pd.DataFrame:
+    def payroll_rollup_hash(self, year: int, month: int) -> str:
         """
-        Generate salary variance report comparing actual vs budget.
+        Hash the per-employee payroll totals for a month.
+        
+        The hash changes whenever any employee's monthly total changes, so it
+        can be used to detect new payroll data without comparing reports.
+        """
+        payroll_data = self.get_monthly_payroll(year, month)
+        rollup = sorted(
+            (emp_id, round(emp_data["total_amount"], 2)) for emp_id, emp_data in payroll_data.items()
+        )
+        return hashlib.sha1(repr(rollup).encode("utf-8")).hexdigest()
+    
+    def period_inputs(self, year: int, month: int) -> Tuple[Dict, Dict]:
+        """A month's payroll by employee and all its budget entries."""
+        return self.get_monthly_payroll(year, month), self.budget_manager.get_all_budgets(f"{month:02d}", year)
+    
+    @cached(ttl=300, key_prefix="report:", tags=_report_tags, ignore=("inputs",))
+    def generate_variance_report(self, year: int, month: int,
+                                 inputs: Optional[PeriodInputs] = None) -> pd.DataFrame:
+        """
+        Generate salary variance report comparing actual vs budget (cached).
+        
+        The cached DataFrame is shared between callers; copy it before
+        modifying it.
         
         Args:
             year: Year
             month: Month (1-12)
+            inputs: Supplies the month's payroll and budgets on a cache miss
+                (default: period_inputs)
             
         Returns:
             DataFrame with variance report
         """
-        month_str = f"{month:02d}"
-        payroll_data = self.get_monthly_payroll(year, month)
+        payroll_data, budgets = (inputs or self.period_inputs)(year, month)
+        df = pd.DataFrame(list(self.iter_variance_rows(year, month, payroll_data, budgets)))
+        return df
+    
+    def iter_variance_rows(self, year: int, month: int, payroll_data: Optional[Dict] = None,
+                           budgets: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Yield variance report rows one at a time.
+        
+        Employee rows are yielded as they are computed; department totals
+        are accumulated along the way and yielded at the end, so callers
+        can stream the report without materializing it.
+        
+        Args:
+            year: Year
+            month: Month (1-12)
+            payroll_data: The month's payroll by employee (fetched if not given)
+            budgets: The month's budget entries (loaded if not given)
+            
+        Yields:
+            Report row dictionaries (same columns as generate_variance_report)
+        """
+        if payroll_data is None or budgets is None:
+            fetched_payroll, fetched_budgets = self.period_inputs(year, month)
+            payroll_data = fetched_payroll if payroll_data is None else payroll_data
+            budgets = fetched_budgets if budgets is None else budgets
+        
+        # Department budgets include employees without payroll
+        department_budgets = {}
+        for budget_data in budgets.values():
+            department = budget_data.get("department")
+            department_budgets[department] = department_budgets.get(department, 0.0) + budget_data.get("amount", 0.0)
         
-        report_rows = []
+        # Department actuals accumulated from the employee rows
+        departments = {}
         
         for emp_id, emp_data in payroll_data.items():
             actual = emp_data["total_amount"]
-            budget = self.budget_manager.get_budget(emp_id, month_str, year)
+            budget = budgets.get(f"{emp_id}_{year}_{month:02d}", {}).get("amount", 0.0)
             variance = actual - budget
             variance_percent = (variance / budget * 100) if budget > 0 else 0
             
-            report_rows.append({
+            row = {
                 "Employee ID": emp_id,
                 "Employee Name": emp_data["employee_name"],
                 "Department": emp_data.get("department", "N/A"),
@@ -92,44 +188,28 @@ class PayrollService:
                 "Actual": round(actual, 2),
                 "Variance": round(variance, 2),
                 "Variance %": round(variance_percent, 2)
-            })
+            }
+            departments[row["Department"]] = departments.get(row["Department"], 0.0) + row["Actual"]
+            yield row
         
-        # Add department totals
-        # First, calculate actuals from payroll data
-        departments = {}
-        for row in report_rows:
-            dept = row["Department"]
-            if dept not in departments:
-                departments[dept] = {
-                    "Budget": 0.0,
-                    "Actual": 0.0,
-                    "Variance": 0.0
-                }
-            departments[dept]["Actual"] += row["Actual"]
-        
-        # Then, get ALL budgets for each department (including employees without payroll)
-        for dept in departments.keys():
-            dept_budget = self.budget_manager.get_department_budget(dept, month_str, year)
-            departments[dept]["Budget"] = dept_budget
-            departments[dept]["Variance"] = departments[dept]["Actual"] - dept_budget
-        
-        # Add department summary rows
-        for dept, totals in departments.items():
-            dept_variance_pct = (totals["Variance"] / totals["Budget"] * 100) if totals["Budget"] > 0 else 0
-            report_rows.append({
+        # Department summary rows use ALL budgets for each department
+        # (including employees without payroll)
+        for dept, dept_actual in departments.items():
+            dept_budget = department_budgets.get(dept, 0.0)
+            dept_variance = dept_actual - dept_budget
+            dept_variance_pct = (dept_variance / dept_budget * 100) if dept_budget > 0 else 0
+            yield {
                 "Employee ID": "",
                 "Employee Name": f"DEPARTMENT TOTAL: {dept}",
                 "Department": dept,
-                "Budget": round(totals["Budget"], 2),
-                "Actual": round(totals["Actual"], 2),
-                "Variance": round(totals["Variance"], 2),
+                "Budget": round(dept_budget, 2),
+                "Actual": round(dept_actual, 2),
+                "Variance": round(dept_variance, 2),
                 "Variance %": round(dept_variance_pct, 2)
-            })
-        
-        df = pd.DataFrame(report_rows)
-        return df
+            }
     
-    def get_historical_variance_trends(self, months: int = 12, end_year: Optional[int] = None, end_month: Optional[int] = None) -> pd.DataFrame:
+    def get_historical_variance_trends(self, months: int = 12, end_year: Optional[int] = None, end_month: Optional[int] = None,
+                                       inputs: Optional[PeriodInputs] = None) -> pd.DataFrame:
         """
         Get historical variance trends for the past N months (optimized).
         
@@ -137,47 +217,47 @@ class PayrollService:
             months: Number of months to look back
             end_year: End year for trends (defaults to current year)
             end_month: End month for trends (defaults to current month)
+            inputs: Supplies each month's payroll and budgets on a cache miss
+                (default: period_inputs)
             
         Returns:
             DataFrame with historical trends
         """
-        # Use provided end date or current date
-        if end_year is None or end_month is None:
-            today = datetime.now()
-            end_year = end_year or today.year
-            end_month = end_month or today.month
-        
-        # Check cache
-        cache_key = f"trends_{months}_{end_year}_{end_month:02d}"
-        cache = get_cache()
-        cached_result = cache.get(cache_key)
-        if cached_result is not None:
-            return cached_result
+        end_year, end_month = resolve_end_period(end_year, end_month)
         
-        trend_rows = []
+        # Concurrent callers share one computation; an expired result keeps
+        # being served briefly while it is refreshed in the background
+        cache_key, tags = self.trends_cache_key(months, end_year, end_month)
+        return get_cache().get_or_compute(
+            cache_key,
+            lambda: self._compute_historical_trends(months, end_year, end_month, inputs),
+            ttl=300,  # 5 minutes
+            stale_ttl=settings.trends_cache_stale_seconds,
+            tags=tags
+        )
+    
+    def trends_cache_key(self, months: int, end_year: int, end_month: int) -> Tuple[str, List[str]]:
+        """
+        Cache key and tags of a trends window.
         
-        # Optimize: Generate all months in one pass
-        months_to_process = []
-        for i in range(months):
-            target_month = end_month - i
-            target_year = end_year
-            
-            # Handle year rollover
-            while target_month <= 0:
-                target_month += 12
-                target_year -= 1
-            
-            months_to_process.append((target_year, target_month))
+        Anything derived only from the window (e.g. its rendered response)
+        can be cached under the same tags to be invalidated with it.
+        """
+        cache_key = f"trends:{company_tag(self.company_id)}:{months}:{end_year}:{end_month:02d}"
+        tags = [company_tag(self.company_id), BUDGETS_TAG]
+        tags += [period_tag(year, month) for year, month in _trend_periods(months, end_year, end_month)]
+        return cache_key, tags
+    
+    def _compute_historical_trends(self, months: int, end_year: int, end_month: int,
+                                   inputs: Optional[PeriodInputs] = None) -> pd.DataFrame:
+        """Build the historical trends DataFrame (uncached)."""
+        trend_rows = []
         
         # Process months (reuse cached payroll data)
-        for target_year, target_month in months_to_process:
+        for target_year, target_month in _trend_periods(months, end_year, end_month):
             try:
-                # Use cached monthly payroll
-                payroll_data = self.get_monthly_payroll(target_year, target_month)
-                month_str = f"{target_month:02d}"
-                
-                # Get ALL budgets for this month (not just employees with payroll)
-                all_budgets = self.budget_manager.get_all_budgets(month_str, target_year)
+                # ALL budgets for the month (not just employees with payroll)
+                payroll_data, all_budgets = (inputs or self.period_inputs)(target_year, target_month)
                 total_budget = sum(budget_data.get("amount", 0.0) for budget_data in all_budgets.values())
                 
                 # Calculate actual from payroll data
@@ -205,9 +285,31 @@ class PayrollService:
         if trend_rows:
             trend_df = pd.DataFrame(trend_rows)
             trend_df = trend_df.sort_values("Month")
-            # Cache the result
-            cache.set(cache_key, trend_df, ttl=300)  # 5 minutes
             return trend_df
         
         return pd.DataFrame(trend_rows)
 
+
+def resolve_end_period(end_year: Optional[int] = None, end_month: Optional[int] = None) -> Tuple[int, int]:
+    """Fill a missing trends end year/month with the current date's."""
+    if end_year is None or end_month is None:
+        today = datetime.now()
+        end_year = end_year or today.year
+        end_month = end_month or today.month
+    return end_year, end_month
+
+
+def _trend_periods(months: int, end_year: int, end_month: int) -> List[tuple]:
+    """(year, month) pairs of a trends window, newest first."""
+    periods = []
+    for i in range(months):
+        target_month = end_month - i
+        target_year = end_year
+        
+        # Handle year rollover
+        while target_month <= 0:
+            target_month += 12
+            target_year -= 1
+        
+        periods.append((target_year, target_month))
+    return periods
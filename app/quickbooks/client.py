@@ -149,3 +149,24 @@ class QuickBooksClient:
         
         return []
 
+
+
+def create_qb_client(company_id: Optional[str] = None):
+    """
+    Create a QuickBooks client - uses mock data if credentials not configured.
+    
+    In production with real QuickBooks account, tokens would come from
+    the OAuth flow/session.
+    
+    Args:
+        company_id: QuickBooks company ID (None for the default company)
+    """
+    # Imported here: the mock client is only needed without credentials
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    
+    # Use mock data if configured or if credentials are missing
+    if settings.use_mock_data or not settings.qb_client_id or not settings.qb_client_secret:
+        return MockQuickBooksClient(company_id=company_id or "mock_company")
+    
+    access_token = "your_access_token"  # Get from OAuth flow
+    return QuickBooksClient(access_token, company_id or "your_company_id")
@@ -0,0 +1,190 @@
+"""Bulk multi-month / multi-company workbook exports built in worker processes."""
+import io
+import logging
+import re
+import zipfile
+from concurrent.futures import Executor, Future, as_completed
+from typing import Callable, Dict, List, Optional, Sequence
+import pandas as pd
+from openpyxl import Workbook
+from app.payroll.service import PayrollService
+from app.quickbooks.client import create_qb_client
+from app.reports.excel_template import get_excel_template, column_widths
+from app.reports.variance import format_variance_report
+from app.services.executors import get_process_pool
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+BULK_OUTPUTS = ("workbook", "zip")
+
+# progress(done, total, label) is called as each piece finishes
+ProgressCallback = Callable[[int, int, str], None]
+
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+class InlineExecutor(Executor):
+    """Executor running each task immediately in the calling thread."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def sheet_title(year: int, month: int, company_id: Optional[str] = None) -> str:
+    """Worksheet title for one month of one company (Excel allows 31 characters)."""
+    period = f"{year}-{month:02d}"
+    if company_id is None:
+        return period
+    company = _INVALID_SHEET_CHARS.sub("_", company_id)[:31 - len(period) - 1]
+    return f"{company} {period}"
+
+
+def build_month_report(company_id: Optional[str], year: int, month: int) -> pd.DataFrame:
+    """
+    Build the formatted variance report for one company and month.
+
+    Runs in a worker process, so it creates its own client and service.
+    """
+    service = PayrollService(create_qb_client(company_id))
+    return format_variance_report(service.generate_variance_report(year, month))
+
+
+def write_pack(sections: Dict[str, pd.DataFrame], target):
+    """
+    Write a pack workbook: a summary chart sheet plus one sheet per report.
+
+    Args:
+        sections: Mapping of sheet title to formatted variance report, in order
+        target: Path or writable binary file object
+    """
+    template = get_excel_template()
+    workbook = Workbook(write_only=True)
+
+    summary = pd.DataFrame(
+        [_period_totals(title, df) for title, df in sections.items()],
+        columns=['Period', 'Budget', 'Actual', 'Variance']
+    )
+    if not summary.empty:
+        template.write_chart_sheet(workbook, 'summary', summary)
+    for title, df in sections.items():
+        template.write_data_sheet(workbook, title, df, column_widths(df))
+
+    workbook.save(target)
+    return target
+
+
+def render_company_pack(company_id: Optional[str], year: int, months: Sequence[int]) -> bytes:
+    """Build one company's pack workbook in a worker process and return its bytes."""
+    sections = {
+        sheet_title(year, month): build_month_report(company_id, year, month)
+        for month in months
+    }
+    buffer = io.BytesIO()
+    write_pack(sections, buffer)
+    return buffer.getvalue()
+
+
+def _period_totals(title: str, df: pd.DataFrame) -> List:
+    """Sum a report's department totals into one summary row."""
+    totals = df[df['Employee ID'] == ''] if 'Employee ID' in df else df.iloc[0:0]
+    return [title, float(totals['Budget'].sum()), float(totals['Actual'].sum()),
+            float(totals['Variance'].sum())]
+
+
+def _pack_filename(year: int, company_id: Optional[str]) -> str:
+    """Filename of one company's workbook inside a zip."""
+    if company_id is None:
+        return f"variance_pack_{year}.xlsx"
+    return f"variance_pack_{re.sub(r'[^A-Za-z0-9_.-]', '_', company_id)}_{year}.xlsx"
+
+
+def export_bulk(target, year: int, months: Optional[Sequence[int]] = None,
+                company_ids: Optional[Sequence[str]] = None, output: str = "workbook",
+                executor: Optional[Executor] = None,
+                progress: Optional[ProgressCallback] = None):
+    """
+    Export a year-end pack of monthly variance reports.
+
+    The per-month reports (or, for zip output, whole per-company
+    workbooks) are built in parallel worker processes, since pandas and
+    openpyxl work is CPU-bound and holds the GIL.
+
+    Args:
+        target: Path or writable binary file object
+        year: Report year
+        months: Months to include (default: 1-12)
+        company_ids: Companies to include (default: the configured company)
+        output: "workbook" for one merged workbook with a sheet per company
+            and month, or "zip" for a zip holding one workbook per company
+        executor: Executor for the pieces (default: the shared process pool,
+            or in-process when settings.bulk_export_processes is 0)
+        progress: Called with (done, total, label) as each piece finishes
+
+    Returns:
+        target
+    """
+    if output not in BULK_OUTPUTS:
+        raise ValueError(f"Unsupported bulk output: {output}. Use one of: {', '.join(BULK_OUTPUTS)}")
+    months = list(months or range(1, 13))
+    if any(month < 1 or month > 12 for month in months):
+        raise ValueError("Months must be between 1 and 12")
+    companies = list(company_ids) if company_ids else [None]
+    if executor is None:
+        executor = get_process_pool() if settings.bulk_export_processes > 0 else InlineExecutor()
+
+    if output == "zip":
+        futures = {
+            executor.submit(render_company_pack, company_id, year, months): company_id
+            for company_id in companies
+        }
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_STORED) as archive:
+            for done, future in enumerate(_completed(futures), start=1):
+                company_id = futures[future]
+                archive.writestr(_pack_filename(year, company_id), future.result())
+                _report(progress, done, len(futures), company_id or "default")
+        return target
+
+    multi_company = len(companies) > 1
+    pieces = [
+        (sheet_title(year, month, company_id if multi_company else None), company_id, month)
+        for company_id in companies for month in months
+    ]
+    futures = {
+        executor.submit(build_month_report, company_id, year, month): title
+        for title, company_id, month in pieces
+    }
+    total = len(futures) + 1
+    reports = {}
+    for done, future in enumerate(_completed(futures), start=1):
+        reports[futures[future]] = future.result()
+        _report(progress, done, total, futures[future])
+
+    write_pack({title: reports[title] for title, _, _ in pieces}, target)
+    _report(progress, total, total, "workbook")
+    return target
+
+
+def _completed(futures: Dict[Future, str]):
+    """Yield futures as they finish, cancelling the rest if one fails."""
+    try:
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                raise future.exception()
+            yield future
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def _report(progress: Optional[ProgressCallback], done: int, total: int, label: str):
+    """Log progress and pass it on to the caller's callback."""
+    logger.info(f"Bulk export {done}/{total}: {label}")
+    if progress:
+        progress(done, total, label)
@@ -0,0 +1,180 @@
+"""Process-wide Excel workbook template: styles, sheet layouts and chart settings."""
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, LineChart, Reference
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+EXCEL_CHUNK_ROWS = 10000
+
+
+class ChartSheet:
+    """Layout of one chart sheet: table headers, column widths and its chart's settings."""
+
+    def __init__(self, title: str, headers: List[str], widths: List[float], chart: Callable,
+                 anchor: str = "F2"):
+        """
+        Initialize chart sheet layout.
+
+        Args:
+            title: Worksheet title
+            headers: Header row of the data table
+            widths: Column widths, starting at column A
+            chart: Builds a new chart, without data, for each workbook
+            anchor: Cell the chart is anchored to
+        """
+        self.title = title
+        self.headers = headers
+        self.widths = widths
+        self.chart = chart
+        self.anchor = anchor
+
+
+def _chart(kind, title: str, x_title: str, y_title: str, bar_type: Optional[str] = None, style: int = 10):
+    """Build a chart without data, with titles and style set."""
+    chart = kind()
+    if bar_type:
+        chart.type = bar_type
+    chart.style = style
+    chart.title = title
+    chart.y_axis.title = y_title
+    chart.x_axis.title = x_title
+    return chart
+
+
+class ExcelTemplate:
+    """
+    Everything about the report workbook that does not depend on the data.
+
+    Header styles and chart sheet layouts are defined once per process;
+    an export appends its rows and builds each chart over the written
+    data range.
+    """
+
+    def __init__(self):
+        """Build styles and chart sheet layouts."""
+        self.header_font = Font(bold=True, color="FFFFFF")
+        self.header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        self.header_alignment = Alignment(horizontal="center")
+        self.table_header_font = Font(bold=True)
+
+        self.sheets: Dict[str, ChartSheet] = {
+            'department': ChartSheet(
+                'Department Charts', ['Department', 'Budget', 'Actual', 'Variance'], [15] * 4,
+                partial(_chart, BarChart, "Department Budget vs Actual", "Department", "Amount ($)", "col")
+            ),
+            'trends': ChartSheet(
+                'Historical Trends', ['Month', 'Total Budget', 'Total Actual', 'Total Variance'], [20] * 4,
+                partial(_chart, LineChart, "Historical Variance Trends", "Month", "Amount ($)", style=13)
+            ),
+            'monthly': ChartSheet(
+                'Monthly Comparison', ['Month', 'Budget', 'Actual', 'Variance'], [20] * 4,
+                partial(_chart, BarChart, "Monthly Budget vs Actual Comparison", "Month", "Amount ($)", "col")
+            ),
+            'employee': ChartSheet(
+                'Employee Charts', ['Employee', 'Budget', 'Actual', 'Variance'], [25, 15, 15, 15],
+                partial(_chart, BarChart, "Top 10 Employees - Budget vs Actual", "Amount ($)", "Employee", "bar")
+            ),
+            'summary': ChartSheet(
+                'Summary', ['Period', 'Budget', 'Actual', 'Variance'], [30, 15, 15, 15],
+                partial(_chart, BarChart, "Budget vs Actual by Period", "Period", "Amount ($)", "col")
+            ),
+        }
+
+    def header_row(self, ws, names: List[str]) -> List[WriteOnlyCell]:
+        """Build the styled header row of the main data sheet."""
+        row = []
+        for name in names:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = self.header_font
+            cell.fill = self.header_fill
+            cell.alignment = self.header_alignment
+            row.append(cell)
+        return row
+
+    def write_data_sheet(self, workbook: Workbook, title: str, df: pd.DataFrame, widths: List[float]):
+        """
+        Write a DataFrame to a new sheet with the styled header row.
+
+        Args:
+            workbook: Workbook to add the sheet to
+            title: Worksheet title
+            df: Data to write
+            widths: Column widths, starting at column A
+        """
+        ws = workbook.create_sheet(title)
+        _set_widths(ws, widths)
+        ws.append(self.header_row(ws, list(df.columns)))
+        for row in iter_rows(df):
+            ws.append(row)
+        return ws
+
+    def write_chart_sheet(self, workbook: Workbook, key: str, data: pd.DataFrame):
+        """
+        Write a chart sheet: its data table plus a chart over the first two value columns.
+
+        Args:
+            workbook: Workbook to add the sheet to
+            key: Chart sheet key ('department', 'trends', 'monthly', 'employee' or 'summary')
+            data: Table rows, columns in header order
+        """
+        layout = self.sheets[key]
+        ws = workbook.create_sheet(layout.title)
+        _set_widths(ws, layout.widths)
+
+        header = []
+        for name in layout.headers:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = self.table_header_font
+            header.append(cell)
+        ws.append(header)
+        for row in iter_rows(data):
+            ws.append(row)
+
+        chart = layout.chart()
+        last_row = len(data) + 1
+        chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=last_row, max_col=3), titles_from_data=True)
+        chart.set_categories(Reference(ws, min_col=1, min_row=2, max_row=last_row))
+        ws.add_chart(chart, layout.anchor)
+        return ws
+
+
+def _set_widths(ws, widths: List[float]):
+    """Set column widths (must happen before rows are written in write-only mode)."""
+    for c_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(c_idx)].width = width
+
+
+def column_widths(df: pd.DataFrame) -> List[float]:
+    """Column widths fitting the longest value (header included), capped at 50."""
+    widths = []
+    for col in df.columns:
+        max_length = len(str(col))
+        if len(df):
+            max_length = max(max_length, int(df[col].astype(str).str.len().max()))
+        widths.append(min(max_length + 2, 50))
+    return widths
+
+
+def iter_rows(df: pd.DataFrame):
+    """Yield DataFrame rows as lists of Python values, converting in chunks."""
+    for start in range(0, len(df), EXCEL_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXCEL_CHUNK_ROWS]
+        yield from chunk.to_numpy(dtype=object).tolist()
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_excel_template() -> ExcelTemplate:
+    """Get the process-wide Excel template (built on first use)."""
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = ExcelTemplate()
+        return _template
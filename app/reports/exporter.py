@@ -1,15 +1,18 @@
 """Export reports to various formats."""
+import contextvars
+import math
+import threading
+import zlib
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, List, Dict
-from google.oauth2.credentials import Credentials
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from openpyxl import Workbook
-from openpyxl.chart import BarChart, LineChart, Reference
-from openpyxl.chart.label import DataLabelList
-from openpyxl.styles import Font, Alignment, PatternFill
+from app.reports.excel_template import get_excel_template, column_widths
+from app.services.sheets_client import get_sheets_service
+from app.services.sheets_diff import sheet_fingerprints, changed_runs
+from app.services.sheets_quota import get_sheets_scheduler
 from config import settings
 
 
@@ -18,71 +21,66 @@ class ReportExporter:
     
     def __init__(self):
         """Initialize exporter."""
-        self.sheets_service = None
+        self._sheets_service = None
+        self._sheets_enabled = False
         if settings.google_sheets_credentials_path:
             self._init_google_sheets()
     
     def _init_google_sheets(self):
-        """Initialize Google Sheets API client."""
+        """Initialize Google Sheets API client (shared process-wide)."""
         try:
-            creds = service_account.Credentials.from_service_account_file(
-                settings.google_sheets_credentials_path,
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
-            self.sheets_service = build('sheets', 'v4', credentials=creds)
+            get_sheets_service()
+            self._sheets_enabled = True
         except Exception as e:
             print(f"Warning: Could not initialize Google Sheets: {e}")
     
-    def export_to_excel(self, df: pd.DataFrame, filepath: str, 
+    @property
+    def sheets_service(self):
+        """Google Sheets API client for the calling thread (None if not configured)."""
+        if self._sheets_service is not None:
+            return self._sheets_service
+        return get_sheets_service() if self._sheets_enabled else None
+    
+    @sheets_service.setter
+    def sheets_service(self, service):
+        self._sheets_service = service
+    
+    def export_to_excel(self, df: pd.DataFrame, filepath, 
                        department_data: Optional[pd.DataFrame] = None,
                        trends_data: Optional[pd.DataFrame] = None,
-                       include_charts: bool = True):
+                       include_charts: bool = True,
+                       streaming: bool = True):
         """
         Export DataFrame to Excel file with optional charts.
         
+        In streaming mode the workbook is written with openpyxl's write-only
+        worksheets, which flush rows as they are appended, so memory stays
+        flat regardless of report size. Column widths are computed from the
+        DataFrame up front instead of by walking the written cells.
+        Styles, sheet layouts and charts come from the process-wide
+        ExcelTemplate, so each export only fills in its data.
+        
         Args:
             df: Main variance report DataFrame
-            filepath: Path to save Excel file
+            filepath: Path (or writable binary file object) to save Excel file
             department_data: Department breakdown data for charts
             trends_data: Historical trends data for charts
             include_charts: Whether to include charts in the Excel file
+            streaming: Use constant-memory write-only mode (default: True)
         """
-        filepath = Path(filepath)
-        filepath.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(filepath, (str, Path)):
+            filepath = Path(filepath)
+            filepath.parent.mkdir(parents=True, exist_ok=True)
         
-        workbook = Workbook()
+        template = get_excel_template()
+        workbook = Workbook(write_only=streaming)
         
         # Remove default sheet
         if 'Sheet' in workbook.sheetnames:
             workbook.remove(workbook['Sheet'])
         
-        # Create main data sheet
-        ws_data = workbook.create_sheet('Variance Report')
-        
-        # Write header
-        for c_idx, col_name in enumerate(df.columns, start=1):
-            cell = ws_data.cell(row=1, column=c_idx, value=col_name)
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-        
-        # Write data rows
-        for r_idx, row in enumerate(df.itertuples(index=False), start=1):
-            for c_idx, value in enumerate(row, start=1):
-                ws_data.cell(row=r_idx + 1, column=c_idx, value=value)
-        
-        # Auto-adjust column widths
-        for column in ws_data.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws_data.column_dimensions[column_letter].width = adjusted_width
+        # Main data sheet; widths must be set before rows are written
+        template.write_data_sheet(workbook, 'Variance Report', df, column_widths(df))
         
         # Add charts if requested and data available
         if include_charts:
@@ -105,202 +103,64 @@ class ReportExporter:
     def _add_department_chart(self, workbook: Workbook, dept_df: pd.DataFrame):
         """Add department breakdown bar chart."""
         try:
-            ws_chart = workbook.create_sheet('Department Charts')
-            
             # Prepare department data (filter department totals)
-            dept_rows = []
-            for _, row in dept_df.iterrows():
-                if 'DEPARTMENT TOTAL' in str(row.get('Employee Name', '')):
-                    dept_name = row.get('Department', 'Unknown')
-                    dept_rows.append({
-                        'Department': dept_name,
-                        'Budget': row.get('Budget', 0),
-                        'Actual': row.get('Actual', 0),
-                        'Variance': row.get('Variance', 0)
-                    })
+            is_total = dept_df['Employee Name'].astype(str).str.contains('DEPARTMENT TOTAL', regex=False)
+            dept_data = dept_df.loc[is_total, ['Department', 'Budget', 'Actual', 'Variance']]
             
-            if not dept_rows:
+            if dept_data.empty:
                 return
             
-            dept_data = pd.DataFrame(dept_rows)
-            
-            # Write department data
-            headers = ['Department', 'Budget', 'Actual', 'Variance']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws_chart.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-            for row_idx, (_, row) in enumerate(dept_data.iterrows(), start=2):
-                ws_chart.cell(row=row_idx, column=1, value=row['Department'])
-                ws_chart.cell(row=row_idx, column=2, value=row['Budget'])
-                ws_chart.cell(row=row_idx, column=3, value=row['Actual'])
-                ws_chart.cell(row=row_idx, column=4, value=row['Variance'])
-            
-            # Create bar chart
-            chart = BarChart()
-            chart.type = "col"
-            chart.style = 10
-            chart.title = "Department Budget vs Actual"
-            chart.y_axis.title = "Amount ($)"
-            chart.x_axis.title = "Department"
-            
-            data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(dept_data) + 1, max_col=3)
-            cats = Reference(ws_chart, min_col=1, min_row=2, max_row=len(dept_data) + 1)
-            
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(cats)
-            
-            ws_chart.add_chart(chart, "F2")
-            
-            # Auto-adjust column widths
-            for col in range(1, 5):
-                ws_chart.column_dimensions[chr(64 + col)].width = 15
+            get_excel_template().write_chart_sheet(workbook, 'department', dept_data)
         except Exception as e:
             print(f"Warning: Could not add department chart: {e}")
     
     def _add_trends_chart(self, workbook: Workbook, trends_df: pd.DataFrame):
         """Add historical trends line chart."""
         try:
-            ws_chart = workbook.create_sheet('Historical Trends')
-            
-            # Write trends data
-            headers = ['Month', 'Total Budget', 'Total Actual', 'Total Variance']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws_chart.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-            for row_idx, (_, row) in enumerate(trends_df.iterrows(), start=2):
-                ws_chart.cell(row=row_idx, column=1, value=row.get('Month', ''))
-                ws_chart.cell(row=row_idx, column=2, value=row.get('Total Budget', 0))
-                ws_chart.cell(row=row_idx, column=3, value=row.get('Total Actual', 0))
-                ws_chart.cell(row=row_idx, column=4, value=row.get('Total Variance', 0))
-            
-            # Create line chart
-            chart = LineChart()
-            chart.title = "Historical Variance Trends"
-            chart.style = 13
-            chart.y_axis.title = "Amount ($)"
-            chart.x_axis.title = "Month"
-            
-            data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(trends_df) + 1, max_col=3)
-            cats = Reference(ws_chart, min_col=1, min_row=2, max_row=len(trends_df) + 1)
-            
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(cats)
-            
-            ws_chart.add_chart(chart, "F2")
-            
-            # Auto-adjust column widths
-            for col in range(1, 5):
-                ws_chart.column_dimensions[chr(64 + col)].width = 20
+            get_excel_template().write_chart_sheet(workbook, 'trends', _trend_columns(trends_df))
         except Exception as e:
             print(f"Warning: Could not add trends chart: {e}")
     
     def _add_employee_chart(self, workbook: Workbook, df: pd.DataFrame):
         """Add employee variance bar chart."""
         try:
-            ws_chart = workbook.create_sheet('Employee Charts')
-            
             # Filter employee rows (exclude department totals)
-            employee_rows = []
-            for _, row in df.iterrows():
-                emp_name = row.get('Employee Name', '')
-                if emp_name and 'DEPARTMENT TOTAL' not in str(emp_name) and row.get('Employee ID'):
-                    employee_rows.append({
-                        'Employee': emp_name[:20],  # Truncate long names
-                        'Budget': row.get('Budget', 0),
-                        'Actual': row.get('Actual', 0),
-                        'Variance': row.get('Variance', 0)
-                    })
-            
-            if not employee_rows:
+            names = df['Employee Name'].fillna('').astype(str)
+            is_employee = (
+                (names != '')
+                & ~names.str.contains('DEPARTMENT TOTAL', regex=False)
+                & (df['Employee ID'].fillna('') != '')
+            )
+            if not is_employee.any():
                 return
             
-            emp_data = pd.DataFrame(employee_rows)
+            emp_data = pd.DataFrame({
+                'Employee': names[is_employee].str[:20],  # Truncate long names
+                'Budget': df.loc[is_employee, 'Budget'],
+                'Actual': df.loc[is_employee, 'Actual'],
+                'Variance': df.loc[is_employee, 'Variance'],
+            })
             
             # Limit to top 10 employees by variance for chart readability
             emp_data = emp_data.nlargest(10, 'Variance', keep='all')
             
-            # Write employee data
-            headers = ['Employee', 'Budget', 'Actual', 'Variance']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws_chart.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-            for row_idx, (_, row) in enumerate(emp_data.iterrows(), start=2):
-                ws_chart.cell(row=row_idx, column=1, value=row['Employee'])
-                ws_chart.cell(row=row_idx, column=2, value=row['Budget'])
-                ws_chart.cell(row=row_idx, column=3, value=row['Actual'])
-                ws_chart.cell(row=row_idx, column=4, value=row['Variance'])
-            
-            # Create bar chart
-            chart = BarChart()
-            chart.type = "bar"
-            chart.style = 10
-            chart.title = "Top 10 Employees - Budget vs Actual"
-            chart.y_axis.title = "Employee"
-            chart.x_axis.title = "Amount ($)"
-            
-            data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(emp_data) + 1, max_col=3)
-            cats = Reference(ws_chart, min_col=1, min_row=2, max_row=len(emp_data) + 1)
-            
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(cats)
-            
-            ws_chart.add_chart(chart, "F2")
-            
-            # Auto-adjust column widths
-            ws_chart.column_dimensions['A'].width = 25
-            for col in range(2, 5):
-                ws_chart.column_dimensions[chr(64 + col)].width = 15
+            get_excel_template().write_chart_sheet(workbook, 'employee', emp_data)
         except Exception as e:
             print(f"Warning: Could not add employee chart: {e}")
     
     def _add_monthly_comparison_chart(self, workbook: Workbook, trends_df: pd.DataFrame):
         """Add monthly budget vs actual comparison chart."""
         try:
-            ws_chart = workbook.create_sheet('Monthly Comparison')
-            
-            # Write comparison data
-            headers = ['Month', 'Budget', 'Actual', 'Variance']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws_chart.cell(row=1, column=col_idx, value=header)
-                cell.font = Font(bold=True)
-            
-            for row_idx, (_, row) in enumerate(trends_df.iterrows(), start=2):
-                ws_chart.cell(row=row_idx, column=1, value=row.get('Month', ''))
-                ws_chart.cell(row=row_idx, column=2, value=row.get('Total Budget', 0))
-                ws_chart.cell(row=row_idx, column=3, value=row.get('Total Actual', 0))
-                ws_chart.cell(row=row_idx, column=4, value=row.get('Total Variance', 0))
-            
-            # Create combined chart (bar + line)
-            chart = BarChart()
-            chart.type = "col"
-            chart.style = 10
-            chart.title = "Monthly Budget vs Actual Comparison"
-            chart.y_axis.title = "Amount ($)"
-            chart.x_axis.title = "Month"
-            
-            # Add budget and actual as bars
-            data = Reference(ws_chart, min_col=2, min_row=1, max_row=len(trends_df) + 1, max_col=3)
-            cats = Reference(ws_chart, min_col=1, min_row=2, max_row=len(trends_df) + 1)
-            
-            chart.add_data(data, titles_from_data=True)
-            chart.set_categories(cats)
-            
-            ws_chart.add_chart(chart, "F2")
-            
-            # Auto-adjust column widths
-            for col in range(1, 5):
-                ws_chart.column_dimensions[chr(64 + col)].width = 20
+            get_excel_template().write_chart_sheet(workbook, 'monthly', _trend_columns(trends_df))
         except Exception as e:
             print(f"Warning: Could not add monthly comparison chart: {e}")
     
-    def export_to_csv(self, df: pd.DataFrame, filepath: str):
-        """Export DataFrame to CSV file."""
-        filepath = Path(filepath)
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        df.to_csv(filepath, index=False)
+    def export_to_csv(self, df: pd.DataFrame, filepath):
+        """Export DataFrame to CSV file (path or writable binary file object)."""
+        if isinstance(filepath, (str, Path)):
+            filepath = Path(filepath)
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(filepath, index=False, encoding="utf-8")
         return filepath
     
     def export_to_google_sheets(self, df: pd.DataFrame, spreadsheet_id: Optional[str] = None,
@@ -313,6 +173,32 @@ class ReportExporter:
             spreadsheet_id: Google Sheets spreadsheet ID (uses config if not provided)
             sheet_name: Name of the sheet to create/update (no spaces recommended)
         """
+        return self.export_sheets_to_google_sheets({sheet_name: df}, spreadsheet_id)
+    
+    def export_sheets_to_google_sheets(self, frames: Dict[str, pd.DataFrame],
+                                       spreadsheet_id: Optional[str] = None,
+                                       previous_fingerprints: Optional[Dict[str, List[str]]] = None):
+        """
+        Export several DataFrames to Google Sheets in a single batchUpdate.
+        
+        Missing sheets are created, existing content is cleared and the new
+        values are written, all in one round trip. Sheet metadata is cached
+        per spreadsheet, so only the first export needs a metadata read.
+        
+        When previous_fingerprints (row hashes of the last write, as returned
+        in the result) are given, unchanged sheets are skipped and only the
+        changed row ranges are rewritten. Writes larger than
+        settings.sheets_write_chunk_rows are split into chunks sent in parallel.
+        
+        Args:
+            frames: Mapping of sheet name to DataFrame
+            spreadsheet_id: Google Sheets spreadsheet ID (uses config if not provided)
+            previous_fingerprints: Optional mapping of sheet name to row hashes
+            
+        Returns:
+            Dictionary with spreadsheetId, updatedSheets, skippedSheets,
+            updatedCells and fingerprints (row hashes per sheet)
+        """
         if not self.sheets_service:
             raise Exception("Google Sheets not initialized. Check credentials.")
         
@@ -321,58 +207,208 @@ class ReportExporter:
             raise Exception("No spreadsheet ID provided")
         
         try:
-            # Convert DataFrame to list of lists
-            values = [df.columns.tolist()] + df.values.tolist()
-            
-            # Check if sheet exists, create if not
             try:
-                # Get spreadsheet metadata
-                spreadsheet = self.sheets_service.spreadsheets().get(
-                    spreadsheetId=spreadsheet_id
-                ).execute()
-                
-                # Check if sheet exists
-                sheet_exists = any(
-                    sheet['properties']['title'] == sheet_name 
-                    for sheet in spreadsheet.get('sheets', [])
-                )
-                
-                if not sheet_exists:
-                    # Create new sheet
-                    self.sheets_service.spreadsheets().batchUpdate(
-                        spreadsheetId=spreadsheet_id,
-                        body={
-                            'requests': [{
-                                'addSheet': {
-                                    'properties': {
-                                        'title': sheet_name
-                                    }
-                                }
-                            }]
-                        }
-                    ).execute()
-                
-                # Clear existing data
-                self.sheets_service.spreadsheets().values().clear(
-                    spreadsheetId=spreadsheet_id,
-                    range=f"'{sheet_name}'!A1:Z1000"
-                ).execute()
-            except Exception as e:
-                print(f"Warning: Could not check/create sheet: {e}")
-            
-            # Write data
-            body = {
-                'values': values
-            }
-            
-            result = self.sheets_service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=f"'{sheet_name}'!A1",
-                valueInputOption='RAW',
-                body=body
-            ).execute()
-            
-            return result
+                return self._batch_write_sheets(spreadsheet_id, frames, previous_fingerprints)
+            except HttpError as error:
+                # A sheet may have been added or deleted behind our back;
+                # refresh the cached metadata and rewrite in full
+                if error.resp.status != 400:
+                    raise
+                _invalidate_sheet_metadata(spreadsheet_id)
+                return self._batch_write_sheets(spreadsheet_id, frames)
         except HttpError as error:
             raise Exception(f"Google Sheets API error: {error}")
+    
+    def _batch_write_sheets(self, spreadsheet_id: str, frames: Dict[str, pd.DataFrame],
+                            previous_fingerprints: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Build and send the batchUpdate(s) that bring the given sheets up to date."""
+        previous_fingerprints = previous_fingerprints or {}
+        fingerprints = {}
+        pending = {}
+        skipped = []
+        
+        for sheet_name, df in frames.items():
+            values = dataframe_values(df)
+            fingerprints[sheet_name] = sheet_fingerprints(values)
+            if previous_fingerprints.get(sheet_name) == fingerprints[sheet_name]:
+                skipped.append(sheet_name)
+            else:
+                pending[sheet_name] = values
+        
+        result = {
+            'spreadsheetId': spreadsheet_id,
+            'updatedSheets': list(pending.keys()),
+            'skippedSheets': skipped,
+            'updatedCells': 0,
+            'fingerprints': fingerprints
+        }
+        if not pending:
+            return result
+        
+        sheet_ids = self._get_sheet_ids(spreadsheet_id)
+        new_sheets = {}
+        structure = []  # addSheet, resize and clear requests, sent before any values
+        writes = []  # (sheet_id, start row, values)
+        
+        for sheet_name, values in pending.items():
+            sheet_id = sheet_ids.get(sheet_name)
+            old = previous_fingerprints.get(sheet_name)
+            if sheet_id is None:
+                sheet_id = _new_sheet_id(sheet_name, set(sheet_ids.values()) | set(new_sheets.values()))
+                new_sheets[sheet_name] = sheet_id
+                old = None
+                structure.append({
+                    'addSheet': {'properties': {'sheetId': sheet_id, 'title': sheet_name}}
+                })
+            
+            # updateCells does not grow the grid (new sheets have 1000 x 26
+            # cells), so size it to the data first; this also drops the
+            # rows of a longer previous write
+            structure.append(_resize_request(sheet_id, len(values), max((len(row) for row in values), default=0)))
+            runs = changed_runs(old, fingerprints[sheet_name])
+            if old is None:
+                structure.append(_clear_request(sheet_id))
+            else:
+                for start, end in runs:
+                    structure.append(_clear_request(sheet_id, start, end))
+            
+            for start, end in runs:
+                for chunk_start in range(start, end, settings.sheets_write_chunk_rows):
+                    chunk_end = min(chunk_start + settings.sheets_write_chunk_rows, end)
+                    writes.append((sheet_id, chunk_start, values[chunk_start:chunk_end]))
+                    result['updatedCells'] += sum(len(row) for row in values[chunk_start:chunk_end])
+        
+        # Pack writes into batches of at most sheets_write_chunk_rows rows.
+        # The first batch also carries the structural requests; the rest
+        # touch disjoint ranges and are sent in parallel.
+        batches = [[]]
+        batch_rows = 0
+        for write in writes:
+            if batches[-1] and batch_rows + len(write[2]) > settings.sheets_write_chunk_rows:
+                batches.append([])
+                batch_rows = 0
+            batches[-1].append(_write_request(*write))
+            batch_rows += len(write[2])
+        
+        self._send_batch(spreadsheet_id, structure + batches[0])
+        if len(batches) > 1:
+            workers = min(settings.sheets_write_parallelism, len(batches) - 1)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sheets-write") as pool:
+                # Each chunk runs in a copy of our context to keep its priority lane
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._send_batch, spreadsheet_id, batch)
+                    for batch in batches[1:]
+                ]
+                for future in futures:
+                    future.result()
+        
+        if new_sheets:
+            with _sheet_metadata_lock:
+                _sheet_metadata.setdefault(spreadsheet_id, {}).update(new_sheets)
+        
+        return result
+    
+    def _send_batch(self, spreadsheet_id: str, requests: List[Dict]):
+        """Send one spreadsheets.batchUpdate."""
+        request = self.sheets_service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': requests}
+        )
+        return get_sheets_scheduler().execute(request, 'write')
+    
+    def _get_sheet_ids(self, spreadsheet_id: str) -> Dict[str, int]:
+        """Get sheet title -> sheetId for a spreadsheet (cached process-wide)."""
+        with _sheet_metadata_lock:
+            cached = _sheet_metadata.get(spreadsheet_id)
+            if cached is not None:
+                return dict(cached)
+        
+        request = self.sheets_service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields='sheets.properties(sheetId,title)'
+        )
+        spreadsheet = get_sheets_scheduler().execute(request, 'read')
+        sheet_ids = {
+            sheet['properties']['title']: sheet['properties']['sheetId']
+            for sheet in spreadsheet.get('sheets', [])
+        }
+        with _sheet_metadata_lock:
+            _sheet_metadata[spreadsheet_id] = sheet_ids
+        return dict(sheet_ids)
+
+
+# Spreadsheet ID -> {sheet title: sheetId}, shared by all exporters
+_sheet_metadata: Dict[str, Dict[str, int]] = {}
+_sheet_metadata_lock = threading.Lock()
+
+
+def _invalidate_sheet_metadata(spreadsheet_id: str):
+    """Forget cached sheet metadata for a spreadsheet."""
+    with _sheet_metadata_lock:
+        _sheet_metadata.pop(spreadsheet_id, None)
+
+
+def _new_sheet_id(sheet_name: str, used: set) -> int:
+    """Pick a stable, unused sheetId for a new sheet."""
+    sheet_id = zlib.crc32(sheet_name.encode("utf-8")) & 0x7FFFFFFF
+    while sheet_id in used:
+        sheet_id = (sheet_id + 1) & 0x7FFFFFFF
+    return sheet_id
+
+
+def _cell(value) -> Dict:
+    """Convert a Python value to Sheets CellData (RAW input semantics)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+
+def _clear_request(sheet_id: int, start_row: int = 0, end_row: Optional[int] = None) -> Dict:
+    """Build an updateCells request clearing rows [start_row, end_row) of a sheet."""
+    grid = {'sheetId': sheet_id, 'startRowIndex': start_row}
+    if end_row is not None:
+        grid['endRowIndex'] = end_row
+    return {'updateCells': {'range': grid, 'fields': 'userEnteredValue'}}
+
+
+def _resize_request(sheet_id: int, rows: int, columns: int) -> Dict:
+    """Build an updateSheetProperties request setting a sheet's grid size."""
+    return {
+        'updateSheetProperties': {
+            'properties': {
+                'sheetId': sheet_id,
+                'gridProperties': {'rowCount': max(rows, 1), 'columnCount': max(columns, 1)}
+            },
+            'fields': 'gridProperties(rowCount,columnCount)'
+        }
+    }
+
+
+def _write_request(sheet_id: int, start_row: int, values: List[list]) -> Dict:
+    """Build an updateCells request writing values starting at start_row."""
+    return {
+        'updateCells': {
+            'start': {'sheetId': sheet_id, 'rowIndex': start_row, 'columnIndex': 0},
+            'rows': [{'values': [_cell(value) for value in row]} for row in values],
+            'fields': 'userEnteredValue'
+        }
+    }
+
+
+def _trend_columns(trends_df: pd.DataFrame) -> pd.DataFrame:
+    """Select trend columns for chart sheets, defaulting missing ones."""
+    return pd.DataFrame({
+        'Month': trends_df.get('Month', ''),
+        'Budget': trends_df.get('Total Budget', 0),
+        'Actual': trends_df.get('Total Actual', 0),
+        'Variance': trends_df.get('Total Variance', 0),
+    }, index=trends_df.index)
+
 
+def dataframe_values(df: pd.DataFrame) -> List[list]:
+    """Convert a DataFrame to a list of rows, header first."""
+    return [df.columns.tolist()] + df.values.tolist()
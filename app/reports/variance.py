@@ -1,16 +1,46 @@
 """Variance report generation utilities."""
+import json
 import pandas as pd
-from typing import Optional
+from typing import Dict, Iterable, Iterator, Optional
+
+
+def variance_status(variance: float) -> str:
+    """Get the status label for a variance amount."""
+    return "Over Budget" if variance > 0 else "Under Budget" if variance < 0 else "On Budget"
 
 
 def format_variance_report(df: pd.DataFrame) -> pd.DataFrame:
     """Format variance report for better readability."""
     df_formatted = df.copy()
-    
+
     # Add conditional formatting indicators
-    df_formatted["Status"] = df_formatted["Variance"].apply(
-        lambda x: "Over Budget" if x > 0 else "Under Budget" if x < 0 else "On Budget"
-    )
-    
+    df_formatted["Status"] = df_formatted["Variance"].apply(variance_status)
+
     return df_formatted
 
+
+def department_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Department total rows of a variance report (the rows without an employee ID)."""
+    return df[df["Employee ID"] == ""]
+
+
+def iter_formatted_rows(rows: Iterable[Dict]) -> Iterator[Dict]:
+    """Streaming counterpart of format_variance_report for row dictionaries."""
+    for row in rows:
+        yield {**row, "Status": variance_status(row["Variance"])}
+
+
+def iter_ndjson(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Serialize rows as newline-delimited JSON, one line per row."""
+    for row in rows:
+        yield (json.dumps(row) + "\n").encode("utf-8")
+
+
+def iter_json_array(rows: Iterable[Dict]) -> Iterator[bytes]:
+    """Serialize rows as a JSON array emitted one element at a time."""
+    yield b"["
+    separator = b""
+    for row in rows:
+        yield separator + json.dumps(row).encode("utf-8")
+        separator = b","
+    yield b"]"
@@ -1,80 +1,623 @@
-"""Simple in-memory cache for API responses."""
-from functools import wraps
-from typing import Any, Callable
+"""Bounded, thread-safe cache for API responses and computed reports."""
+import logging
+import sys
+from abc import ABC, abstractmethod
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import pandas as pd
+from app.services.cache_keys import KeyBuilder, CacheKeyError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+COUNTERS = ("hits", "misses", "stale_hits", "coalesced", "refreshes", "evictions", "expirations")
+
+# States returned by CacheBackend.claim()
+HIT = "hit"  # Fresh value
+STALE = "stale"  # Expired value that may still be served; refresh if a flight was handed over
+COMPUTE = "compute"  # Miss; the caller owns the flight and must complete() it
+WAIT = "wait"  # Miss already being computed; wait on the flight
+
+
+# Tags name the inputs an entry was computed from, so a change to one input
+# invalidates exactly the entries that depend on it
+BUDGETS_TAG = "budgets"
+
+
+def period_tag(year: int, month: int) -> str:
+    """Tag for entries computed from one month's payroll or budgets."""
+    return f"period:{year}-{month:02d}"
+
+
+def company_tag(company_id: Optional[str]) -> str:
+    """Tag for entries computed from one QuickBooks company's data."""
+    return f"company:{company_id or 'default'}"
+
+
+def namespace_of(key: str) -> str:
+    """Statistics namespace of a key: the part before the first ':'."""
+    return key.split(":", 1)[0]
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class CacheEntry:
+    """One cached value with its expiry and accounted size."""
+
+    __slots__ = ("value", "expires_at", "stale_until", "size", "namespace", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, namespace: str, stale_until: float = None,
+                 tags: Iterable[str] = ()):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until or expires_at  # May be served stale until then
+        self.size = size
+        self.namespace = namespace
+        self.tags = tuple(tags)
+
+
+class _Flight:
+    """A computation in progress that concurrent callers wait on."""
+
+    def __init__(self, tags: Iterable[str] = ()):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.tags = frozenset(tags)
+        self.invalidated = False  # An input changed mid-computation; don't store the result
+        self.started = time.time()  # Invalidations by other processes after this also count
+
+
+class CacheBackend(ABC):
+    """
+    Cache interface plus the behaviour shared by all storage backends.
+
+    Expired entries are removed when read and by a periodic sweep. All
+    operations are thread-safe. Hits, misses, evictions and expirations
+    are counted per namespace (the key prefix before ':') in this process.
 
+    get_or_compute() adds single-flight semantics: concurrent callers
+    missing the same key wait for one computation instead of each running
+    it. With stale_ttl, an expired value keeps being served for that long
+    while a single background refresh runs.
 
-class SimpleCache:
-    """Simple in-memory cache with TTL."""
-    
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default
-        self.cache = {}
+    Entries can carry tags naming their inputs (see period_tag,
+    company_tag, BUDGETS_TAG); invalidate_tags() drops exactly the entries
+    carrying a tag, via an index from tag to keys.
+
+    Backends implement storage through the underscore methods below; all
+    but _encode and _decode are called with the lock held. LRUCache keeps
+    entries in this process; SQLiteCache (app/services/cache_sqlite.py)
+    shares them between worker processes.
+    """
+
+    name = "base"
+
+    def __init__(self, default_ttl: int = 300, max_entries: int = 1024,
+                 max_bytes: int = 256 * 1024 * 1024, sweep_interval: float = 60.0):
+        """
+        Initialize cache.
+
+        Args:
+            default_ttl: Seconds an entry lives unless set() says otherwise
+            max_entries: Maximum number of entries
+            max_bytes: Approximate maximum total size of the values
+            sweep_interval: Seconds between expiry sweeps
+        """
         self.default_ttl = default_ttl
-    
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._last_sweep = time.monotonic()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._flights: Dict[str, _Flight] = {}
+
+    # Storage, implemented by backends (lock held) -------------------------
+
+    @abstractmethod
+    def _encode(self, value: Any) -> Tuple[Any, int]:
+        """Convert a value to its stored form and size (called without the lock)."""
+
+    @abstractmethod
+    def _decode(self, stored: Any) -> Any:
+        """Convert a stored value back (called without the lock)."""
+
+    @abstractmethod
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        """Get the entry for a key, expired or not, holding its stored value."""
+
+    @abstractmethod
+    def _touch(self, key: str):
+        """Mark a key as recently used."""
+
+    @abstractmethod
+    def _store(self, key: str, entry: CacheEntry) -> List[str]:
+        """Store an entry, evicting LRU entries over the limits; returns evicted namespaces."""
+
+    @abstractmethod
+    def _discard(self, key: str) -> Optional[CacheEntry]:
+        """Remove one key; returns its entry if it was present."""
+
+    @abstractmethod
+    def _discard_tags(self, tags: Iterable[str]) -> int:
+        """Remove entries carrying any of the tags; returns how many."""
+
+    @abstractmethod
+    def _discard_matching(self, pattern: str):
+        """Remove entries whose key contains pattern."""
+
+    @abstractmethod
+    def _discard_expired(self, now: float) -> List[str]:
+        """Remove entries past their stale window; returns their namespaces."""
+
+    @abstractmethod
+    def _clear(self):
+        """Remove all entries."""
+
+    @abstractmethod
+    def _usage(self) -> Dict:
+        """Entry count, bytes, tag count and per-namespace entries/bytes."""
+
+    def _invalidated_since(self, tags: Iterable[str], since: float) -> bool:
+        """Whether another process invalidated any of the tags (or cleared) at or after since."""
+        return False
+
+    # Public interface ------------------------------------------------------
+
+    def _count(self, namespace: str, event: str, amount: int = 1):
+        """Bump a per-namespace counter (lock held)."""
+        counters = self._stats.get(namespace)
+        if counters is None:
+            counters = self._stats[namespace] = dict.fromkeys(COUNTERS, 0)
+        counters[event] += amount
+
     def get(self, key: str) -> Any:
-        """Get value from cache if not expired."""
-        if key in self.cache:
-            value, expiry = self.cache[key]
-            if time.time() < expiry:
-                return value
-            else:
-                del self.cache[key]
-        return None
-    
-    def set(self, key: str, value: Any, ttl: int = None):
-        """Set value in cache with TTL."""
+        """Get value from cache if not expired (None on a miss)."""
+        with self._lock:
+            self._maybe_sweep()
+            entry = self._lookup(key)
+            namespace = namespace_of(key)
+            if entry is None:
+                self._count(namespace, "misses")
+                return None
+            now = time.time()
+            if now >= entry.expires_at:
+                if now >= entry.stale_until:
+                    self._discard(key)
+                    self._count(namespace, "expirations")
+                self._count(namespace, "misses")
+                return None
+            self._touch(key)
+            self._count(namespace, "hits")
+        return self._decode(entry.value)
+
+    def set(self, key: str, value: Any, ttl: int = None, stale_ttl: float = 0, tags: Iterable[str] = ()):
+        """
+        Set value in cache with TTL, evicting least recently used entries if over the limits.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Seconds the value is fresh (default: default_ttl)
+            stale_ttl: Further seconds get_or_compute may serve it while refreshing
+            tags: Inputs the value depends on, for invalidate_tags()
+        """
+        stored, size = self._encode(value)
+        with self._lock:
+            self._insert(key, stored, size, ttl, stale_ttl, tags)
+
+    def _insert(self, key: str, stored: Any, size: int, ttl: Optional[int], stale_ttl: float,
+                tags: Iterable[str]):
+        """Store an already encoded value (lock held)."""
         ttl = ttl or self.default_ttl
-        expiry = time.time() + ttl
-        self.cache[key] = (value, expiry)
-    
+        if size > self.max_bytes:
+            # Would evict everything else and still not fit
+            self._discard(key)
+            logger.debug(f"Not caching {key}: {size} bytes exceeds the cache size")
+            return
+        expires_at = time.time() + ttl
+        entry = CacheEntry(stored, expires_at, size, namespace_of(key), expires_at + stale_ttl, tags)
+        for namespace in self._store(key, entry):
+            self._count(namespace, "evictions")
+        self._maybe_sweep()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int = None,
+                       stale_ttl: float = 0, tags: Iterable[str] = ()) -> Any:
+        """
+        Get a cached value, computing it once on a miss however many callers ask.
+
+        Args:
+            key: Cache key
+            compute: Called (without arguments) to produce the value on a miss
+            ttl: Seconds the computed value is fresh (default: default_ttl)
+            stale_ttl: Seconds past expiry during which the old value is
+                returned immediately while one background refresh runs
+            tags: Inputs the value depends on, for invalidate_tags()
+
+        Returns:
+            The cached or computed value; if the computation fails, every
+            caller waiting on it gets the exception
+        """
+        state, value, flight = self.claim(key, tags)
+        if state == HIT:
+            return value
+        if state == STALE:
+            if flight is not None:
+                threading.Thread(
+                    target=self._compute, args=(key, flight, compute, ttl, stale_ttl),
+                    name="cache-refresh", daemon=True
+                ).start()
+            return value
+        if state == WAIT:
+            return self.wait(flight)
+        return self._compute(key, flight, compute, ttl, stale_ttl, raise_errors=True)
+
+    def claim(self, key: str, tags: Iterable[str] = ()) -> Tuple[str, Any, Optional[_Flight]]:
+        """
+        Look a key up for a caller that computes missing values itself.
+
+        get_or_compute() is built on this; callers that cannot hand over a
+        blocking compute function (async code) use it with complete() and
+        wait() to get the same single-flight and invalidation guarantees.
+
+        Args:
+            key: Cache key
+            tags: Inputs the value depends on, for invalidate_tags()
+
+        Returns:
+            (state, value, flight): HIT or STALE with the cached value (for
+            STALE, a flight the caller must refresh and complete(), or None
+            if a refresh is already running); COMPUTE with a new flight the
+            caller must complete(); WAIT with the flight to wait() on
+        """
+        namespace = namespace_of(key)
+        with self._lock:
+            self._maybe_sweep()
+            entry = self._lookup(key)
+            now = time.time()
+            if entry is not None and now < entry.expires_at:
+                self._touch(key)
+                self._count(namespace, "hits")
+                state, flight = HIT, None
+            elif entry is not None and now < entry.stale_until:
+                self._touch(key)
+                self._count(namespace, "stale_hits")
+                state, flight = STALE, None
+                if key not in self._flights:
+                    flight = self._flights[key] = _Flight(tags)
+                    self._count(namespace, "refreshes")
+            else:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight(tags)
+                    self._count(namespace, "misses")
+                    return COMPUTE, None, flight
+                self._count(namespace, "coalesced")
+                return WAIT, None, flight
+        return state, self._decode(entry.value), flight
+
+    def complete(self, key: str, flight: _Flight, value: Any = None, error: Optional[BaseException] = None,
+                 ttl: int = None, stale_ttl: float = 0):
+        """
+        Finish a claimed computation: store its value and wake its waiters.
+
+        The value is not stored if any of the flight's tags were
+        invalidated (or the cache cleared) after the flight started, in
+        this process or another, since it may have been computed from the
+        old inputs; waiters still receive it.
+
+        Args:
+            key: Cache key the flight was claimed for
+            flight: Flight returned by claim()
+            value: Computed value
+            error: Exception raised by the computation, passed to waiters
+            ttl: Seconds the value is fresh (default: default_ttl)
+            stale_ttl: Further seconds get_or_compute may serve it while refreshing
+        """
+        flight.value, flight.error = value, error
+        try:
+            if error is None:
+                # Encode (e.g. pickle) before taking the lock; only the
+                # invalidation check and the insert need it
+                stored, size = self._encode(value)
+                with self._lock:
+                    if not flight.invalidated and not self._invalidated_since(flight.tags, flight.started):
+                        self._insert(key, stored, size, ttl, stale_ttl, flight.tags)
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    @staticmethod
+    def wait(flight: _Flight) -> Any:
+        """Wait for another caller's computation; returns its value or raises its error."""
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _compute(self, key: str, flight: _Flight, compute: Callable[[], Any], ttl: Optional[int],
+                 stale_ttl: float, raise_errors: bool = False) -> Any:
+        """Run the computation for a claimed flight and complete it."""
+        try:
+            value = compute()
+        except Exception as e:
+            self.complete(key, flight, error=e)
+            if raise_errors:
+                raise
+            logger.warning(f"Background refresh of {key} failed: {e}")
+            return None
+        self.complete(key, flight, value, ttl=ttl, stale_ttl=stale_ttl)
+        return value
+
+    def delete(self, key: str) -> bool:
+        """Remove one key; returns whether it was present."""
+        with self._lock:
+            return self._discard(key) is not None
+
     def clear(self):
         """Clear all cache."""
-        self.cache.clear()
-    
+        with self._lock:
+            self._clear()
+            for flight in self._flights.values():
+                flight.invalidated = True
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        Remove every entry carrying any of the given tags.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            removed = self._discard_tags(tags)
+            for flight in self._flights.values():
+                if flight.tags.intersection(tags):
+                    flight.invalidated = True
+            return removed
+
     def invalidate(self, pattern: str = None):
         """Invalidate cache entries matching pattern."""
-        if pattern:
-            keys_to_delete = [k for k in self.cache.keys() if pattern in k]
-            for key in keys_to_delete:
-                del self.cache[key]
-        else:
+        if not pattern:
             self.clear()
+            return
+        with self._lock:
+            self._discard_matching(pattern)
+
+    def sweep(self) -> int:
+        """Remove all expired entries; returns how many were removed."""
+        with self._lock:
+            namespaces = self._discard_expired(time.time())
+            for namespace in namespaces:
+                self._count(namespace, "expirations")
+            self._last_sweep = time.monotonic()
+            return len(namespaces)
+
+    def _maybe_sweep(self):
+        """Sweep if the sweep interval has passed (lock held)."""
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    def start_sweeper(self):
+        """Sweep expired entries in a background thread, even while the cache is idle."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper."""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=1)
+            self._sweeper = None
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            removed = self.sweep()
+            if removed:
+                logger.debug(f"Cache sweep removed {removed} expired entries")
+
+    def stats(self) -> Dict:
+        """Get size and per-namespace hit/miss/eviction statistics."""
+        with self._lock:
+            usage = self._usage()
+            namespaces = {name: dict(counters) for name, counters in self._stats.items()}
+            for name, held in usage["namespaces"].items():
+                namespaces.setdefault(name, dict.fromkeys(COUNTERS, 0)).update(held)
+            for counters in namespaces.values():
+                counters.setdefault("entries", 0)
+                counters.setdefault("bytes", 0)
+                lookups = counters["hits"] + counters["misses"]
+                counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else None
+            return {
+                "backend": self.name,
+                "entries": usage["entries"],
+                "bytes": usage["bytes"],
+                "tags": usage["tags"],
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "namespaces": namespaces,
+            }
+
+
+class LRUCache(CacheBackend):
+    """
+    In-memory cache backend with TTL expiry and LRU eviction.
+
+    The cache is bounded by an entry count and an approximate byte size
+    (DataFrames are measured with memory_usage(deep=True)); the least
+    recently used entries are evicted once either limit is exceeded.
+    Values are stored as is, so callers share the cached objects.
+    """
+
+    name = "memory"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._tag_index: Dict[str, Set[str]] = {}
+
+    def _encode(self, value: Any) -> Tuple[Any, int]:
+        return value, estimate_size(value)
+
+    def _decode(self, stored: Any) -> Any:
+        return stored
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        return self._entries.get(key)
+
+    def _touch(self, key: str):
+        self._entries.move_to_end(key)
+
+    def _discard(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+        return entry
+
+    def _store(self, key: str, entry: CacheEntry) -> List[str]:
+        self._discard(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        for tag in entry.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        evicted = []
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            evicted.append(self._discard(next(iter(self._entries))).namespace)
+        return evicted
+
+    def _discard_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys |= self._tag_index.get(tag, set())
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    def _discard_matching(self, pattern: str):
+        for key in [k for k in self._entries if pattern in k]:
+            self._discard(key)
+
+    def _discard_expired(self, now: float) -> List[str]:
+        expired = [key for key, entry in self._entries.items() if now >= entry.stale_until]
+        return [self._discard(key).namespace for key in expired]
+
+    def _clear(self):
+        self._entries.clear()
+        self._tag_index.clear()
+        self._bytes = 0
+
+    def _usage(self) -> Dict:
+        namespaces: Dict[str, Dict[str, int]] = {}
+        for entry in self._entries.values():
+            held = namespaces.setdefault(entry.namespace, {"entries": 0, "bytes": 0})
+            held["entries"] += 1
+            held["bytes"] += entry.size
+        return {"entries": len(self._entries), "bytes": self._bytes,
+                "tags": len(self._tag_index), "namespaces": namespaces}
+
+
+# Kept for existing imports
+SimpleCache = LRUCache
+
+
+def create_cache(backend: Optional[str] = None) -> CacheBackend:
+    """
+    Create the cache configured in settings.
+
+    Args:
+        backend: "memory" (per process) or "sqlite" (shared by all worker
+            processes on the host); defaults to settings.cache_backend
+    """
+    backend = backend or settings.cache_backend
+    options = dict(
+        default_ttl=settings.cache_default_ttl,
+        max_entries=settings.cache_max_entries,
+        max_bytes=settings.cache_max_bytes,
+        sweep_interval=settings.cache_sweep_interval,
+    )
+    if backend == "memory":
+        return LRUCache(**options)
+    if backend == "sqlite":
+        from app.services.cache_sqlite import SQLiteCache
+        return SQLiteCache(settings.cache_sqlite_path, **options)
+    raise ValueError(f"Unknown cache backend: {backend}")
 
 
 # Global cache instance
-_cache = SimpleCache(default_ttl=300)  # 5 minutes
+_cache = create_cache()
 
 
-def cached(ttl: int = 300, key_prefix: str = ""):
+def cached(ttl: int = 300, key_prefix: str = "", stale_ttl: float = 0,
+           tags: Optional[Callable[..., Iterable[str]]] = None,
+           key: Optional[Mapping[str, Callable[[Any], Any]]] = None,
+           ignore: Iterable[str] = ()):
     """
     Decorator to cache function results.
-    
+
+    Keys are built from the canonicalized arguments (see
+    app/services/cache_keys.py), so equal calls share an entry across
+    instances and processes. Concurrent calls with the same arguments
+    share one computation.
+
     Args:
         ttl: Time to live in seconds
         key_prefix: Prefix for cache key
+        stale_ttl: Seconds an expired result is still served while it is
+            recomputed in the background
+        tags: Called with the function's arguments to get the entry's tags
+        key: Argument name -> function giving the value to key that argument on
+        ignore: Argument names that do not affect the result
+
+    Raises:
+        CacheKeyError: When called with an argument that has no stable key
     """
     def decorator(func: Callable) -> Callable:
+        make_key = KeyBuilder(func, key_prefix, key=key, ignore=ignore)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            cache_key = f"{key_prefix}{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
-            
-            # Check cache
-            cached_value = _cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-            
-            # Call function and cache result
-            result = func(*args, **kwargs)
-            _cache.set(cache_key, result, ttl)
-            return result
-        
+            return _cache.get_or_compute(
+                make_key(*args, **kwargs), lambda: func(*args, **kwargs), ttl=ttl, stale_ttl=stale_ttl,
+                tags=tags(*args, **kwargs) if tags else ()
+            )
+
+        wrapper.cache_key = make_key
         return wrapper
     return decorator
 
 
-def get_cache() -> SimpleCache:
+def get_cache() -> CacheBackend:
     """Get the global cache instance."""
     return _cache
-
@@ -0,0 +1,144 @@
+"""Stable, typed cache keys built from function arguments."""
+import enum
+import hashlib
+import inspect
+import threading
+import weakref
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional
+import numpy as np
+import pandas as pd
+
+# Strings and bytes longer than this are replaced by their digest
+MAX_INLINE_LENGTH = 200
+
+
+class CacheKeyError(TypeError):
+    """Raised when an argument has no stable cache key."""
+
+
+_digests: Dict[int, tuple] = {}  # id(object) -> (weakref, digest)
+_digests_lock = threading.Lock()
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _pandas_digest(value) -> str:
+    """Digest of a DataFrame or Series, computed once per object."""
+    with _digests_lock:
+        known = _digests.get(id(value))
+        if known is not None and known[0]() is value:
+            return known[1]
+    if isinstance(value, pd.DataFrame):
+        header = repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode("utf-8")
+    else:
+        header = repr((value.name, str(value.dtype))).encode("utf-8")
+    hashed = pd.util.hash_pandas_object(value, index=True).to_numpy()
+    digest = _digest(header + hashed.tobytes())
+    key = id(value)
+    ref = weakref.ref(value, lambda _, key=key: _forget(key))
+    with _digests_lock:
+        _digests[key] = (ref, digest)
+    return digest
+
+
+def _forget(key: int):
+    with _digests_lock:
+        _digests.pop(key, None)
+
+
+def canonical(value: Any) -> str:
+    """
+    Canonical, type-tagged text for a cache key argument.
+
+    Equal values give equal text regardless of container ordering (dicts,
+    sets) and values of different types never collide (1, 1.0, "1" and True
+    all differ). DataFrames, Series and long strings/bytes are reduced to a
+    digest; a DataFrame's digest is computed once and remembered for the
+    object's lifetime, so key arguments must not be mutated afterwards.
+    Objects can define __cache_key__() to supply their own key.
+
+    Raises:
+        CacheKeyError: For objects without a stable representation (e.g.
+            instances using the default repr, which contains an address)
+    """
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return repr(value)
+    if isinstance(value, np.generic):
+        return canonical(value.item())
+    if isinstance(value, str):
+        if len(value) > MAX_INLINE_LENGTH:
+            return f"str#{_digest(value.encode('utf-8'))}"
+        return repr(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"bytes#{_digest(bytes(value))}"
+    if isinstance(value, enum.Enum):
+        return f"{type(value).__name__}.{value.name}"
+    if isinstance(value, (datetime, date, dt_time, pd.Timestamp)):
+        return f"{type(value).__name__}({value.isoformat()})"
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return f"{type(value).__name__}#{_pandas_digest(value)}"
+    if isinstance(value, np.ndarray):
+        return f"ndarray{value.shape}{value.dtype}#{_digest(np.ascontiguousarray(value).tobytes())}"
+    if isinstance(value, (list, tuple)):
+        inner = ",".join(canonical(item) for item in value)
+        return f"[{inner}]" if isinstance(value, list) else f"({inner})"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ",".join(sorted(canonical(item) for item in value)) + "}"
+    if isinstance(value, Mapping):
+        items = sorted(f"{canonical(k)}:{canonical(v)}" for k, v in value.items())
+        return "{" + ",".join(items) + "}"
+    custom = getattr(value, "__cache_key__", None)
+    if custom is not None:
+        return f"{type(value).__name__}({canonical(custom())})"
+    if type(value).__repr__ is object.__repr__:
+        raise CacheKeyError(
+            f"{type(value).__name__} has no stable cache key; define __cache_key__, "
+            "pass a key= extractor or ignore the argument"
+        )
+    return f"{type(value).__name__}({value!r})"
+
+
+class KeyBuilder:
+    """
+    Build cache keys for one function.
+
+    Arguments are bound to the function's signature, so positional,
+    keyword and defaulted arguments produce the same key for the same call.
+    """
+
+    def __init__(self, func: Callable, prefix: str = "",
+                 key: Optional[Mapping[str, Callable[[Any], Any]]] = None,
+                 ignore: Iterable[str] = ()):
+        """
+        Initialize key builder.
+
+        Args:
+            func: Function whose calls are keyed
+            prefix: Prepended to every key (its part before ':' is the stats namespace)
+            key: Argument name -> function reducing the argument to the value keyed on
+            ignore: Argument names left out of the key
+        """
+        self.signature = inspect.signature(func)
+        self.prefix = f"{prefix}{func.__qualname__}"
+        self.key = dict(key or {})
+        self.ignore = frozenset(ignore)
+        unknown = (set(self.key) | self.ignore) - set(self.signature.parameters)
+        if unknown:
+            raise ValueError(f"{func.__qualname__} has no arguments named {sorted(unknown)}")
+
+    def __call__(self, *args, **kwargs) -> str:
+        """Key of one call."""
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parts = []
+        for name, value in bound.arguments.items():
+            if name in self.ignore:
+                continue
+            if name in self.key:
+                value = self.key[name](value)
+            parts.append(f"{name}={canonical(value)}")
+        return f"{self.prefix}:{'|'.join(parts)}"
@@ -0,0 +1,210 @@
+"""SQLite cache backend shared by every worker process on a host."""
+import logging
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.services.cache import CacheBackend, CacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Recorded in the invalidations table by clear(), so computations started
+# before it in any process are not stored
+ALL_TAG = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    size INTEGER NOT NULL,
+    namespace TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_stale_until ON entries (stale_until);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+CREATE TABLE IF NOT EXISTS invalidations (
+    tag TEXT PRIMARY KEY,
+    at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache backend storing pickled values in a SQLite file.
+
+    Every worker process opening the same file sees the same entries, so a
+    value computed by one worker is a hit in the others, and delete(),
+    invalidate_tags() and clear() take effect everywhere. Invalidations are
+    also recorded with a timestamp, so a computation another process started
+    before the invalidation does not store its (stale) result.
+
+    Expiry uses wall-clock time so all processes agree on it. Entry sizes
+    are the pickled sizes; LRU eviction uses the last access time. Hit/miss
+    counters are kept per process.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, *args, **kwargs):
+        """
+        Initialize cache.
+
+        Args:
+            path: SQLite database file (created if missing)
+            *args, **kwargs: As for CacheBackend
+        """
+        super().__init__(*args, **kwargs)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection per process, serialized by the cache lock
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._db.executescript(SCHEMA)
+
+    def _encode(self, value: Any) -> Tuple[Any, int]:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return blob, len(blob)
+
+    def _decode(self, stored: Any) -> Any:
+        return pickle.loads(stored)
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        row = self._db.execute(
+            "SELECT value, expires_at, stale_until, size, namespace, tags FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at, stale_until, size, namespace, tags = row
+        return CacheEntry(value, expires_at, size, namespace, stale_until, tags.split("\n") if tags else ())
+
+    def _touch(self, key: str):
+        self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+    def _store(self, key: str, entry: CacheEntry) -> List[str]:
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM tags WHERE key = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.value, entry.expires_at, entry.stale_until, entry.size,
+                 entry.namespace, "\n".join(entry.tags), time.time())
+            )
+            self._db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)", [(tag, key) for tag in entry.tags])
+            return self._evict()
+
+    def _evict(self) -> List[str]:
+        """Remove least recently used entries until within both limits (in a transaction)."""
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        evicted = []
+        if count <= self.max_entries and total <= self.max_bytes:
+            return evicted
+        rows = self._db.execute("SELECT key, size, namespace FROM entries ORDER BY last_access")
+        victims = []
+        for key, size, namespace in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            evicted.append(namespace)
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM tags WHERE key = ?", victims)
+        self._db.executemany("DELETE FROM entries WHERE key = ?", victims)
+        return evicted
+
+    def _discard(self, key: str) -> Optional[CacheEntry]:
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM tags WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return entry
+
+    def _record_invalidation(self, tags: Iterable[str]):
+        """Timestamp invalidated tags for computations running in other processes (in a transaction)."""
+        now = time.time()
+        self._db.executemany("INSERT OR REPLACE INTO invalidations VALUES (?, ?)", [(tag, now) for tag in tags])
+
+    def _invalidated_since(self, tags: Iterable[str], since: float) -> bool:
+        tags = list(tags) + [ALL_TAG]
+        placeholders = ",".join("?" * len(tags))
+        row = self._db.execute(
+            f"SELECT 1 FROM invalidations WHERE at >= ? AND tag IN ({placeholders}) LIMIT 1", (since, *tags)
+        ).fetchone()
+        return row is not None
+
+    def _discard_tags(self, tags: Iterable[str]) -> int:
+        tags = list(tags)
+        if not tags:
+            return 0
+        placeholders = ",".join("?" * len(tags))
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            keys = [row[0] for row in self._db.execute(
+                f"SELECT DISTINCT key FROM tags WHERE tag IN ({placeholders})", tags
+            )]
+            self._db.executemany("DELETE FROM tags WHERE key = ?", [(key,) for key in keys])
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in keys])
+            self._record_invalidation(tags)
+        return len(keys)
+
+    def _discard_matching(self, pattern: str):
+        escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        like = f"%{escaped}%"
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute(
+                "DELETE FROM tags WHERE key IN (SELECT key FROM entries WHERE key LIKE ? ESCAPE '\\')", (like,)
+            )
+            self._db.execute("DELETE FROM entries WHERE key LIKE ? ESCAPE '\\'", (like,))
+
+    def _discard_expired(self, now: float) -> List[str]:
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute("SELECT key, namespace FROM entries WHERE stale_until <= ?", (now,)).fetchall()
+            self._db.executemany("DELETE FROM tags WHERE key = ?", [(key,) for key, _ in rows])
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in rows])
+            # Only computations running longer than the default TTL could still need these
+            self._db.execute("DELETE FROM invalidations WHERE at < ?", (now - self.default_ttl,))
+        return [namespace for _, namespace in rows]
+
+    def _clear(self):
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM tags")
+            self._db.execute("DELETE FROM entries")
+            self._record_invalidation([ALL_TAG])
+
+    def _usage(self) -> Dict:
+        namespaces = {
+            namespace: {"entries": entries, "bytes": size}
+            for namespace, entries, size in self._db.execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+            )
+        }
+        tags = self._db.execute("SELECT COUNT(DISTINCT tag) FROM tags").fetchone()[0]
+        return {
+            "entries": sum(held["entries"] for held in namespaces.values()),
+            "bytes": sum(held["bytes"] for held in namespaces.values()),
+            "tags": tags,
+            "namespaces": namespaces,
+        }
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,152 @@
+"""Request-scoped memo of the datasets behind reports, exports and syncs."""
+import threading
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+from app.payroll.service import PayrollService
+from app.reports.variance import format_variance_report, department_rows
+
+
+class DatasetContext:
+    """
+    Named intermediate datasets, each computed at most once per context.
+
+    A context lives for one request (or one sync run) and wraps one
+    PayrollService, so everything built from it shares one payroll and
+    budget snapshot: reports and trends take each month's payroll and
+    budgets from the payroll and budgets datasets, which are loaded only
+    when the shared cache misses. Standard datasets (payroll, budgets, report,
+    formatted_report, departments, trends, employees) are registered on
+    first use; others can be added with add_dataset() or define().
+
+    Thread-safe: concurrent requests for the same dataset wait for a single
+    computation, so parts built in parallel can share a context. Failures
+    are remembered too, so dependents fail without recomputing.
+    """
+
+    def __init__(self, payroll_service: PayrollService):
+        """
+        Initialize an empty context.
+
+        Args:
+            payroll_service: Service the standard datasets are computed with
+        """
+        self.payroll_service = payroll_service
+        self._datasets = {}  # name -> (builder, dependency names)
+        self._results = {}  # name -> value or raised exception
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def add_dataset(self, name: str, builder: Callable, depends_on: Tuple[str, ...] = ()):
+        """
+        Register a dataset.
+
+        Args:
+            name: Dataset name
+            builder: Callable receiving the dependency values in order
+            depends_on: Names of the datasets this one is computed from
+        """
+        with self._lock:
+            self._datasets[name] = (builder, depends_on)
+
+    def resolve(self, name: str):
+        """Compute a dataset (and its dependencies) once, then reuse it."""
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._results:
+                builder, depends_on = self._datasets[name]
+                try:
+                    self._results[name] = builder(*[self.resolve(dep) for dep in depends_on])
+                except Exception as e:
+                    self._results[name] = e
+                    raise
+        result = self._results[name]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def define(self, name: str, builder: Callable, depends_on: Tuple[str, ...] = ()) -> str:
+        """Register a dataset unless it already is; returns its name."""
+        with self._lock:
+            self._datasets.setdefault(name, (builder, depends_on))
+        return name
+
+    def dataset(self, name: str, builder: Callable, depends_on: Tuple[str, ...] = ()):
+        """Resolve a dataset, registering it first if it is new."""
+        return self.resolve(self.define(name, builder, depends_on))
+
+    @property
+    def computed(self) -> List[str]:
+        """Names of the datasets computed so far."""
+        return list(self._results)
+
+    # Standard datasets. The *_dataset methods register one without
+    # computing it and return its name, for use in depends_on or as a
+    # sync target.
+
+    def payroll(self, year: int, month: int) -> Dict:
+        """Payroll aggregated by employee for a month."""
+        return self.dataset(
+            f"payroll:{year}-{month:02d}", lambda: self.payroll_service.get_monthly_payroll(year, month)
+        )
+
+    def budgets(self, year: int, month: int) -> Dict:
+        """All budget entries for a month."""
+        return self.dataset(
+            f"budgets:{year}-{month:02d}",
+            lambda: self.payroll_service.budget_manager.get_all_budgets(f"{month:02d}", year)
+        )
+
+    def period_inputs(self, year: int, month: int) -> Tuple[Dict, Dict]:
+        """A month's payroll and budgets, as PayrollService inputs."""
+        return self.payroll(year, month), self.budgets(year, month)
+
+    def report_dataset(self, year: int, month: int) -> str:
+        """Name of the month's variance report dataset."""
+        return self.define(
+            f"report:{year}-{month:02d}",
+            lambda: self.payroll_service.generate_variance_report(year, month, inputs=self.period_inputs)
+        )
+
+    def report(self, year: int, month: int) -> pd.DataFrame:
+        """Variance report for a month."""
+        return self.resolve(self.report_dataset(year, month))
+
+    def formatted_report_dataset(self, year: int, month: int) -> str:
+        """Name of the month's formatted report dataset."""
+        return self.define(
+            f"formatted_report:{year}-{month:02d}", format_variance_report,
+            depends_on=(self.report_dataset(year, month),)
+        )
+
+    def formatted_report(self, year: int, month: int) -> pd.DataFrame:
+        """Variance report with the status column."""
+        return self.resolve(self.formatted_report_dataset(year, month))
+
+    def departments_dataset(self, year: int, month: int) -> str:
+        """Name of the month's department rows dataset."""
+        return self.define(
+            f"departments:{year}-{month:02d}", department_rows,
+            depends_on=(self.formatted_report_dataset(year, month),)
+        )
+
+    def departments(self, year: int, month: int) -> pd.DataFrame:
+        """Department total rows of the formatted report."""
+        return self.resolve(self.departments_dataset(year, month))
+
+    def trends_dataset(self, months: int, year: int, month: int) -> str:
+        """Name of the trends dataset for the months-long window ending at year/month."""
+        return self.define(
+            f"trends:{months}:{year}-{month:02d}",
+            lambda: self.payroll_service.get_historical_variance_trends(months, year, month, inputs=self.period_inputs)
+        )
+
+    def trends(self, months: int, year: int, month: int) -> pd.DataFrame:
+        """Historical trends for the months-long window ending at year/month."""
+        return self.resolve(self.trends_dataset(months, year, month))
+
+    def employees(self) -> List[Dict]:
+        """Employees of the company, as dictionaries."""
+        return self.dataset(
+            "employees", lambda: [emp.dict() for emp in self.payroll_service.qb_client.get_employees()]
+        )
@@ -0,0 +1,136 @@
+"""Bounded executors for running blocking work off the event loop."""
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Separate pools so slow exports (openpyxl, Google Sheets) cannot starve
+# the lightweight JSON endpoints. Pools are created on first use.
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Get (or create) the named bounded executor ("light" or "export")."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            workers = settings.export_pool_workers if name == "export" else settings.light_pool_workers
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+
+async def _run(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable in an executor, preserving context variables."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, ctx.run, partial(func, *args, **kwargs))
+
+
+async def run_light(func: Callable, *args, **kwargs) -> Any:
+    """Run blocking pandas/QuickBooks work for lightweight endpoints."""
+    return await _run(get_executor("light"), func, *args, **kwargs)
+
+
+async def run_export(func: Callable, *args, **kwargs) -> Any:
+    """Run export-heavy work (Excel, CSV, Google Sheets) in the export pool."""
+    return await _run(get_executor("export"), func, *args, **kwargs)
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get (or create) the process pool for CPU-bound bulk exports.
+    
+    Workers are spawned rather than forked so they never inherit the
+    server's threads or held locks.
+    """
+    global _process_pool
+    with _executors_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.bulk_export_processes),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def shutdown_executors():
+    """Stop accepting work and release pool threads and processes."""
+    global _process_pool
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False)
+        _executors.clear()
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+class LoopLagMonitor:
+    """Measure event loop responsiveness by timing a periodic sleep."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start sampling on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._sample())
+
+    async def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples += 1
+            # Exponentially weighted average keeps the metric cheap to maintain
+            self.avg_lag = lag if self.samples == 1 else 0.9 * self.avg_lag + 0.1 * lag
+            if lag > 0.1:
+                logger.warning(f"Event loop lag {lag * 1000:.1f}ms")
+
+    def stats(self) -> Dict:
+        """Get lag statistics in milliseconds."""
+        return {
+            "last_ms": round(self.last_lag * 1000, 2),
+            "avg_ms": round(self.avg_lag * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+            "samples": self.samples,
+        }
+
+
+# Global loop lag monitor, started by the application lifespan
+_loop_monitor = LoopLagMonitor(interval=settings.loop_lag_interval)
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Get the global event loop lag monitor."""
+    return _loop_monitor
@@ -0,0 +1,232 @@
+"""Asynchronous export jobs: a bounded worker pool writing artifacts to a TTL'd result store."""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+# builder(params, target_path, progress) -> {"filename", "media_type"} for a
+# file artifact, or {"result": {...}} for jobs that produce no file
+JobBuilder = Callable[[Dict, Path, Callable[[int, int, str], None]], Dict]
+
+
+class JobQueueFullError(Exception):
+    """Raised when too many export jobs are already waiting."""
+
+
+class ExportJob:
+    """State of one export job."""
+
+    def __init__(self, job_id: str, key: str, params: Dict):
+        self.id = job_id
+        self.key = key
+        self.params = params
+        self.status = QUEUED
+        self.progress = {"done": 0, "total": 0, "label": ""}
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.path: Optional[Path] = None
+        self.filename: Optional[str] = None
+        self.media_type: Optional[str] = None
+        self.size: Optional[int] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.version = 0  # Bumped on every state change
+
+    def to_dict(self) -> Dict:
+        """Public view of the job."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "progress": dict(self.progress),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "filename": self.filename,
+            "size": self.size,
+            "result": self.result,
+            "error": self.error,
+            "download": self.path is not None,
+        }
+
+
+class ExportJobManager:
+    """
+    Run export jobs on a bounded worker pool.
+
+    Artifacts are written to store_dir and kept for ttl seconds after the
+    job finishes. Submitting a job identical to one still queued or
+    running returns the existing job instead of starting another.
+    """
+
+    def __init__(self, store_dir: str, workers: int = 2, ttl: float = 3600.0, max_pending: int = 20):
+        """
+        Initialize job manager.
+
+        Args:
+            store_dir: Directory holding job artifacts
+            workers: Jobs run concurrently
+            ttl: Seconds a finished job and its artifact are kept
+            max_pending: Jobs allowed to wait for a worker before submissions are rejected
+        """
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-job")
+        self._jobs: Dict[str, ExportJob] = {}
+        self._in_flight: Dict[str, str] = {}  # job key -> job id
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    @staticmethod
+    def job_key(params: Dict) -> str:
+        """Identity of a job: a hash of its canonical parameters."""
+        encoded = json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha1(encoded).hexdigest()
+
+    def submit(self, params: Dict, builder: JobBuilder) -> Tuple[ExportJob, bool]:
+        """
+        Submit a job, or join the identical job already in flight.
+
+        Args:
+            params: JSON-serializable job parameters (identify the job)
+            builder: Function producing the artifact
+
+        Returns:
+            (job, created) where created is False for a deduplicated submission
+        """
+        self.sweep()
+        key = self.job_key(params)
+        with self._lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                self.deduplicated += 1
+                return self._jobs[existing], False
+            pending = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"{pending} export jobs already waiting")
+            job = ExportJob(uuid.uuid4().hex, key, params)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+        self._executor.submit(self._run, job, builder)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """Get a job by ID (None if unknown or expired)."""
+        self.sweep()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _update(self, job: ExportJob, **changes):
+        """Apply state changes to a job and bump its version."""
+        with self._lock:
+            self._apply(job, changes)
+
+    @staticmethod
+    def _apply(job: ExportJob, changes: Dict):
+        """Apply state changes to a job and bump its version (lock held)."""
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.version += 1
+
+    def _run(self, job: ExportJob, builder: JobBuilder):
+        """Run one job on a worker thread."""
+        self._update(job, status=RUNNING, started_at=time.time())
+        target = self.store_dir / f"{job.id}.part"
+
+        def progress(done: int, total: int, label: str):
+            self._update(job, progress={"done": done, "total": total, "label": label})
+
+        try:
+            output = builder(job.params, target, progress) or {}
+            changes = {"status": DONE, "result": output.get("result")}
+            if "filename" in output and target.exists():
+                path = target.with_suffix("")
+                os.replace(target, path)
+                changes.update(path=path, filename=output["filename"],
+                               media_type=output.get("media_type"), size=path.stat().st_size)
+        except Exception as e:
+            logger.exception(f"Export job {job.id} failed")
+            changes = {"status": FAILED, "error": str(e)}
+        finally:
+            target.unlink(missing_ok=True)
+        # Finish and leave the in-flight index together, so an identical
+        # submission either joins this job or starts after it has finished
+        with self._lock:
+            self._apply(job, {"finished_at": time.time(), **changes})
+            self._in_flight.pop(job.key, None)
+
+    def sweep(self):
+        """Drop finished jobs (and their artifacts) older than the TTL."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.status in FINISHED and job.finished_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.path is not None:
+                job.path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        """Get job counts by status."""
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {**counts, "deduplicated": self.deduplicated}
+
+    def shutdown(self):
+        """Stop accepting jobs and cancel those not yet started."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_export_jobs() -> ExportJobManager:
+    """Get the process-wide export job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ExportJobManager(
+                settings.export_job_dir,
+                workers=settings.export_job_workers,
+                ttl=settings.export_job_ttl_seconds,
+                max_pending=settings.export_job_max_pending,
+            )
+            # Artifacts from earlier runs have no job record; drop expired ones
+            cutoff = time.time() - _manager.ttl
+            for leftover in _manager.store_dir.iterdir():
+                if leftover.is_file() and leftover.stat().st_mtime < cutoff:
+                    leftover.unlink(missing_ok=True)
+        return _manager
+
+
+def shutdown_export_jobs():
+    """Stop the job manager if it was started."""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
@@ -0,0 +1,73 @@
+"""Process-wide Google Sheets API client factory."""
+import threading
+from typing import Optional
+import httplib2
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from config import settings
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+HTTP_TIMEOUT = 60  # seconds
+
+_lock = threading.Lock()
+_credentials = None
+_discovery_doc: Optional[str] = None
+_generation = 0  # Bumped by reset_sheets_client to retire per-thread clients
+_local = threading.local()
+
+
+def get_credentials():
+    """Load service account credentials once per process."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = service_account.Credentials.from_service_account_file(
+                settings.google_sheets_credentials_path,
+                scopes=SCOPES
+            )
+        return _credentials
+
+
+def _get_discovery_document() -> str:
+    """Get the Sheets v4 discovery document bundled with googleapiclient."""
+    global _discovery_doc
+    with _lock:
+        if _discovery_doc is None:
+            _discovery_doc = get_static_doc('sheets', 'v4')
+            if _discovery_doc is None:
+                raise Exception("Bundled Sheets v4 discovery document not found")
+        return _discovery_doc
+
+
+def get_sheets_service():
+    """
+    Get a Google Sheets API client for the calling thread.
+
+    Credentials and the discovery document are shared process-wide. Each
+    thread gets its own authorized HTTP transport (httplib2 is not thread
+    safe), which keeps its connections alive across calls. Tokens are
+    refreshed by the transport when they expire.
+
+    Returns:
+        Sheets v4 service, or None if Google Sheets is not configured
+    """
+    if not settings.google_sheets_credentials_path:
+        return None
+
+    service = getattr(_local, 'service', None)
+    if service is None or _local.generation != _generation:
+        http = AuthorizedHttp(get_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        service = build_from_document(_get_discovery_document(), http=http)
+        _local.service = service
+        _local.generation = _generation
+    return service
+
+
+def reset_sheets_client():
+    """Drop cached credentials and clients (e.g. after changing settings)."""
+    global _credentials, _generation
+    with _lock:
+        _credentials = None
+        _generation += 1
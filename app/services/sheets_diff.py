@@ -0,0 +1,44 @@
+"""Row fingerprints and change detection for incremental Google Sheets syncs."""
+import hashlib
+import json
+from typing import List, Optional, Sequence, Tuple
+
+
+def row_fingerprint(row: Sequence) -> str:
+    """Hash one row of cell values."""
+    encoded = json.dumps(list(row), default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def sheet_fingerprints(values: List[Sequence]) -> List[str]:
+    """Hash every row of a sheet (header included)."""
+    return [row_fingerprint(row) for row in values]
+
+
+def changed_runs(old: Optional[List[str]], new: List[str]) -> List[Tuple[int, int]]:
+    """
+    Find the row ranges that differ between two fingerprint lists.
+
+    Args:
+        old: Fingerprints of the rows last written (None if unknown)
+        new: Fingerprints of the rows to write
+
+    Returns:
+        List of (start, end) row index ranges of new that must be written,
+        end exclusive. Rows beyond len(new) are not included.
+    """
+    if old is None:
+        return [(0, len(new))] if new else []
+
+    runs = []
+    start = None
+    for index, fingerprint in enumerate(new):
+        changed = index >= len(old) or old[index] != fingerprint
+        if changed and start is None:
+            start = index
+        elif not changed and start is not None:
+            runs.append((start, index))
+            start = None
+    if start is not None:
+        runs.append((start, len(new)))
+    return runs
@@ -0,0 +1,185 @@
+"""Quota-aware scheduling and retry for Google Sheets API calls."""
+import contextvars
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from googleapiclient.errors import HttpError
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("sheets_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def sheets_priority(priority: int):
+    """Run the enclosed Sheets calls in the given priority lane."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Consume one token."""
+        self.tokens -= 1
+
+
+class SheetsScheduler:
+    """
+    Gate every Google Sheets API call through per-minute read/write quotas.
+
+    Calls wait for a token from the read or write bucket; waiting
+    interactive calls are always served before background ones. Calls
+    failing with 429 or 5xx are retried with exponential backoff.
+    """
+
+    def __init__(self, read_per_minute: int = 60, write_per_minute: int = 60,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 32.0):
+        """
+        Initialize scheduler.
+
+        Args:
+            read_per_minute: Read requests allowed per minute
+            write_per_minute: Write requests allowed per minute
+            max_retries: Retries for a call failing with 429 or 5xx
+            backoff_base: First retry delay in seconds (doubles per retry)
+            backoff_max: Maximum retry delay in seconds
+        """
+        self._buckets = {"read": TokenBucket(read_per_minute), "write": TokenBucket(write_per_minute)}
+        self._waiting = {kind: {priority: 0 for priority in PRIORITIES} for kind in self._buckets}
+        self._condition = threading.Condition()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def execute(self, request, kind: str = "write", priority: Optional[int] = None):
+        """
+        Execute a googleapiclient request within quota, retrying transient errors.
+
+        Args:
+            request: Request object with an execute() method
+            kind: "read" or "write" quota bucket
+            priority: INTERACTIVE or BACKGROUND (defaults to the current lane)
+
+        Returns:
+            The API response
+        """
+        priority = _priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            self._acquire(kind, priority)
+            try:
+                self._count("calls")
+                return request.execute()
+            except HttpError as error:
+                status = error.resp.status
+                if status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self._backoff_delay(attempt, error)
+                attempt += 1
+                self._count("retries")
+                logger.warning(f"Sheets API returned {status}, retrying in {delay:.2f}s (attempt {attempt})")
+                time.sleep(delay)
+
+    def _count(self, counter: str):
+        """Bump a statistics counter (calls run on many worker threads)."""
+        with self._condition:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _backoff_delay(self, attempt: int, error: HttpError) -> float:
+        """Exponential backoff with jitter, honoring Retry-After when present."""
+        retry_after = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _acquire(self, kind: str, priority: int):
+        """Block until a token is available and no higher-priority call is waiting."""
+        bucket = self._buckets[kind]
+        waiting = self._waiting[kind]
+        with self._condition:
+            waiting[priority] += 1
+            throttled = False
+            try:
+                while True:
+                    blocked = any(waiting[higher] for higher in PRIORITIES if higher < priority)
+                    delay = bucket.wait_time()
+                    if not blocked and delay <= 0:
+                        bucket.take()
+                        return
+                    if not throttled:
+                        throttled = True
+                        self.throttled += 1
+                    self._condition.wait(delay if delay > 0 else 1.0)
+            finally:
+                waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        """Get scheduler statistics."""
+        with self._condition:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "waiting": {
+                    kind: {"interactive": lanes[INTERACTIVE], "background": lanes[BACKGROUND]}
+                    for kind, lanes in self._waiting.items()
+                },
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_sheets_scheduler() -> SheetsScheduler:
+    """Get the process-wide Sheets scheduler."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SheetsScheduler(
+                read_per_minute=settings.sheets_read_requests_per_minute,
+                write_per_minute=settings.sheets_write_requests_per_minute,
+                max_retries=settings.sheets_max_retries,
+                backoff_base=settings.sheets_backoff_base_seconds,
+            )
+        return _scheduler
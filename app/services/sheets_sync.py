@@ -1,15 +1,68 @@
 """Service to keep Google Sheets synchronized with latest data."""
+import threading
 from datetime import datetime
-from typing import Optional
-from app.quickbooks.mock_client import MockQuickBooksClient
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from app.quickbooks.client import create_qb_client
 from app.payroll.service import PayrollService
 from app.reports.exporter import ReportExporter
-from app.reports.variance import format_variance_report
+from app.services.datasets import DatasetContext
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (spreadsheet ID, sheet name) -> row fingerprints of the last successful write
+_fingerprints: Dict[Tuple[str, str], List[str]] = {}
+_fingerprints_lock = threading.Lock()
+
+
+def clear_sync_fingerprints():
+    """Forget what was last written, forcing the next syncs to rewrite in full."""
+    with _fingerprints_lock:
+        _fingerprints.clear()
+
+
+class SyncPipeline(DatasetContext):
+    """
+    Dependency graph of the datasets behind a set of sync targets.
+    
+    Each dataset is computed at most once, however many target sheets use
+    it, and all target sheets are then written in a single batched export.
+    """
+    
+    def __init__(self, payroll_service: PayrollService):
+        """Initialize a pipeline without targets."""
+        super().__init__(payroll_service)
+        self._targets = {}  # target -> (sheet name, dataset name)
+    
+    def add_target(self, target: str, sheet_name: str, dataset: str):
+        """Write a dataset to a sheet when the pipeline runs."""
+        self._targets[target] = (sheet_name, dataset)
+    
+    @property
+    def targets(self) -> List[str]:
+        """Names of the registered targets."""
+        return list(self._targets)
+    
+    def build(self) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+        """
+        Compute the frames for all targets.
+        
+        Returns:
+            Tuple of (sheet name -> DataFrame, target -> sheet name) for the
+            targets whose datasets were built successfully
+        """
+        frames = {}
+        built = {}
+        for target, (sheet_name, dataset) in self._targets.items():
+            try:
+                frames[sheet_name] = self.resolve(dataset)
+                built[target] = sheet_name
+            except Exception as e:
+                logger.error(f"Error building {target} data ({dataset}): {e}")
+        return frames, built
+
 
 class SheetsSyncService:
     """Service to sync data to Google Sheets automatically."""
@@ -17,7 +70,7 @@ class SheetsSyncService:
     def __init__(self):
         """Initialize sync service."""
         self.exporter = ReportExporter()
-        self.client = MockQuickBooksClient()
+        self.client = create_qb_client()
         self.payroll_service = PayrollService(self.client)
     
     def sync_current_month(self, spreadsheet_id: Optional[str] = None):
@@ -27,32 +80,17 @@ class SheetsSyncService:
         Args:
             spreadsheet_id: Optional spreadsheet ID (uses config if not provided)
         """
-        if not self.exporter.sheets_service:
-            logger.warning("Google Sheets not initialized. Cannot sync.")
-            return False
+        now = datetime.now()
+        pipeline = SyncPipeline(self.payroll_service)
+        pipeline.add_target(
+            'current_month', f"CurrentMonth_{now.year}_{now.month:02d}",
+            pipeline.formatted_report_dataset(now.year, now.month)
+        )
         
-        try:
-            now = datetime.now()
-            year = now.year
-            month = now.month
-            
-            # Generate current month report
-            df = self.payroll_service.generate_variance_report(year, month)
-            df_formatted = format_variance_report(df)
-            
-            # Export to Google Sheets
-            sheet_name = f"CurrentMonth_{year}_{month:02d}"
-            result = self.exporter.export_to_google_sheets(
-                df_formatted,
-                spreadsheet_id=spreadsheet_id,
-                sheet_name=sheet_name
-            )
-            
-            logger.info(f"Synced current month ({year}-{month:02d}) to Google Sheets")
-            return True
-        except Exception as e:
-            logger.error(f"Error syncing current month: {e}")
-            return False
+        success = self._sync(pipeline, spreadsheet_id)['current_month']
+        if success:
+            logger.info(f"Synced current month ({now.year}-{now.month:02d}) to Google Sheets")
+        return success
     
     def sync_latest_report(self, spreadsheet_id: Optional[str] = None, sheet_name: str = "LatestReport"):
         """
@@ -63,40 +101,14 @@ class SheetsSyncService:
             spreadsheet_id: Optional spreadsheet ID
             sheet_name: Name of the sheet to update (default: "LatestReport")
         """
-        if not self.exporter.sheets_service:
-            logger.warning("Google Sheets not initialized. Cannot sync.")
-            return False
+        now = datetime.now()
+        pipeline = SyncPipeline(self.payroll_service)
+        pipeline.add_target('latest', sheet_name, pipeline.formatted_report_dataset(now.year, now.month))
         
-        try:
-            now = datetime.now()
-            year = now.year
-            month = now.month
-            
-            # Generate latest report
-            df = self.payroll_service.generate_variance_report(year, month)
-            df_formatted = format_variance_report(df)
-            
-            # Add metadata row at the top
-            metadata_row = {
-                'Report Date': f"{year}-{month:02d}",
-                'Generated At': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'Total Employees': len(df[df['Employee ID'] != '']),
-                'Total Budget': df[df['Employee ID'] != '']['Budget'].sum(),
-                'Total Actual': df[df['Employee ID'] != '']['Actual'].sum(),
-            }
-            
-            # Export to Google Sheets
-            result = self.exporter.export_to_google_sheets(
-                df_formatted,
-                spreadsheet_id=spreadsheet_id,
-                sheet_name=sheet_name
-            )
-            
+        success = self._sync(pipeline, spreadsheet_id)['latest']
+        if success:
             logger.info(f"Synced latest report to Google Sheets (sheet: {sheet_name})")
-            return True
-        except Exception as e:
-            logger.error(f"Error syncing latest report: {e}")
-            return False
+        return success
     
     def sync_historical_trends(self, months: int = 12, spreadsheet_id: Optional[str] = None):
         """
@@ -106,27 +118,16 @@ class SheetsSyncService:
             months: Number of months to sync
             spreadsheet_id: Optional spreadsheet ID
         """
-        if not self.exporter.sheets_service:
-            logger.warning("Google Sheets not initialized. Cannot sync.")
-            return False
+        now = datetime.now()
+        pipeline = SyncPipeline(self.payroll_service)
+        pipeline.add_target(
+            'historical', f"HistoricalTrends_{months}Months", pipeline.trends_dataset(months, now.year, now.month)
+        )
         
-        try:
-            # Get historical trends
-            trends_df = self.payroll_service.get_historical_variance_trends(months)
-            
-            # Export to Google Sheets
-            sheet_name = f"HistoricalTrends_{months}Months"
-            result = self.exporter.export_to_google_sheets(
-                trends_df,
-                spreadsheet_id=spreadsheet_id,
-                sheet_name=sheet_name
-            )
-            
+        success = self._sync(pipeline, spreadsheet_id)['historical']
+        if success:
             logger.info(f"Synced {months} months of historical trends to Google Sheets")
-            return True
-        except Exception as e:
-            logger.error(f"Error syncing historical trends: {e}")
-            return False
+        return success
     
     def sync_all(self, spreadsheet_id: Optional[str] = None):
         """
@@ -135,18 +136,72 @@ class SheetsSyncService:
         - Current month
         - Historical trends (12 months)
         
+        The current month report is computed once for both report sheets and
+        all sheets are written in a single batched export.
+        
         Args:
             spreadsheet_id: Optional spreadsheet ID
         """
-        results = {
-            'latest': False,
-            'current_month': False,
-            'historical': False
-        }
+        now = datetime.now()
+        pipeline = SyncPipeline(self.payroll_service)
+        report = pipeline.formatted_report_dataset(now.year, now.month)
+        pipeline.add_target('latest', "LatestReport", report)
+        pipeline.add_target('current_month', f"CurrentMonth_{now.year}_{now.month:02d}", report)
+        pipeline.add_target('historical', "HistoricalTrends_12Months", pipeline.trends_dataset(12, now.year, now.month))
+        
+        return self._sync(pipeline, spreadsheet_id)
+    
+    def _sync(self, pipeline: SyncPipeline, spreadsheet_id: Optional[str] = None) -> Dict[str, bool]:
+        """Build a pipeline's frames and write them in one batched export."""
+        results = {target: False for target in pipeline.targets}
+        
+        if not self.exporter.sheets_service:
+            logger.warning("Google Sheets not initialized. Cannot sync.")
+            return results
+        
+        frames, built = pipeline.build()
+        if not frames:
+            return results
         
-        results['latest'] = self.sync_latest_report(spreadsheet_id)
-        results['current_month'] = self.sync_current_month(spreadsheet_id)
-        results['historical'] = self.sync_historical_trends(12, spreadsheet_id)
+        try:
+            self._export(frames, spreadsheet_id)
+            for target in built:
+                results[target] = True
+        except Exception as e:
+            logger.error(f"Error syncing {', '.join(frames)} to Google Sheets: {e}")
         
         return results
-
+    
+    def _export(self, frames: Dict[str, pd.DataFrame], spreadsheet_id: Optional[str] = None) -> Dict:
+        """
+        Write sheets incrementally using the fingerprints of the last sync.
+        
+        Unchanged sheets are skipped and only changed rows are rewritten. If
+        the write fails, the fingerprints are dropped so the next sync
+        rewrites those sheets in full.
+        """
+        spreadsheet_id = spreadsheet_id or settings.google_sheets_spreadsheet_id
+        with _fingerprints_lock:
+            previous = {
+                name: _fingerprints[(spreadsheet_id, name)]
+                for name in frames if (spreadsheet_id, name) in _fingerprints
+            }
+        
+        try:
+            result = self.exporter.export_sheets_to_google_sheets(
+                frames,
+                spreadsheet_id=spreadsheet_id,
+                previous_fingerprints=previous
+            )
+        except Exception:
+            with _fingerprints_lock:
+                for name in frames:
+                    _fingerprints.pop((spreadsheet_id, name), None)
+            raise
+        
+        with _fingerprints_lock:
+            for name, fingerprints in result['fingerprints'].items():
+                _fingerprints[(spreadsheet_id, name)] = fingerprints
+        if result['skippedSheets']:
+            logger.info(f"Skipped unchanged sheets: {', '.join(result['skippedSheets'])}")
+        return result
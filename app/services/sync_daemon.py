@@ -0,0 +1,379 @@
+"""Long-running scheduled Google Sheets sync daemon."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from app.quickbooks.client import create_qb_client
+from app.payroll.service import PayrollService
+from app.services.cache import get_cache, period_tag
+from app.services.sheets_quota import sheets_priority, BACKGROUND
+from app.services.sync_queue import SYNC_METHODS
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CronSchedule:
+    """
+    Minimal five-field cron expression (minute hour day month weekday).
+
+    Each field accepts "*", numbers, ranges ("1-5"), lists ("1,15") and
+    steps ("*/5", "0-30/10"). Weekday 0 is Sunday.
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression: str):
+        """Parse a cron expression."""
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(field, low, high)
+            for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        ]
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(value) for value in part.split("-", 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"Invalid cron field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def matches(self, moment: datetime) -> bool:
+        """Check whether a moment (to the minute) is scheduled."""
+        if moment.minute not in self.minutes or moment.hour not in self.hours:
+            return False
+        if moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        # Standard cron: when both day fields are restricted, either may match
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Get the first scheduled minute strictly after a moment."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if self.matches(candidate):
+                return candidate
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class SyncMetrics:
+    """Counters and gauges rendered in Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: Dict[tuple, int] = {}  # (sync type, status) -> count
+        self.skipped: Dict[str, int] = {}
+        self.duration_sum: Dict[str, float] = {}
+        self.duration_count: Dict[str, int] = {}
+        self.last_success: Dict[str, float] = {}
+        self.running = 0
+
+    def record_run(self, sync_type: str, status: str, duration: float):
+        with self._lock:
+            self.runs[(sync_type, status)] = self.runs.get((sync_type, status), 0) + 1
+            self.duration_sum[sync_type] = self.duration_sum.get(sync_type, 0.0) + duration
+            self.duration_count[sync_type] = self.duration_count.get(sync_type, 0) + 1
+            if status == "success":
+                self.last_success[sync_type] = time.time()
+
+    def run_started(self):
+        with self._lock:
+            self.running += 1
+
+    def run_finished(self):
+        with self._lock:
+            self.running -= 1
+
+    def record_skip(self, sync_type: str):
+        with self._lock:
+            self.skipped[sync_type] = self.skipped.get(sync_type, 0) + 1
+
+    def render(self) -> str:
+        """Render all metrics as Prometheus text."""
+        with self._lock:
+            lines = [
+                "# HELP sheets_sync_runs_total Sync runs by type and outcome.",
+                "# TYPE sheets_sync_runs_total counter",
+            ]
+            lines += [
+                f'sheets_sync_runs_total{{sync_type="{sync_type}",status="{status}"}} {count}'
+                for (sync_type, status), count in sorted(self.runs.items())
+            ]
+            lines += [
+                "# HELP sheets_sync_skipped_total Scheduled syncs skipped because sources were unchanged.",
+                "# TYPE sheets_sync_skipped_total counter",
+            ]
+            lines += [
+                f'sheets_sync_skipped_total{{sync_type="{sync_type}"}} {count}'
+                for sync_type, count in sorted(self.skipped.items())
+            ]
+            lines += [
+                "# HELP sheets_sync_duration_seconds Time spent running syncs.",
+                "# TYPE sheets_sync_duration_seconds summary",
+            ]
+            for sync_type in sorted(self.duration_count):
+                lines.append(f'sheets_sync_duration_seconds_sum{{sync_type="{sync_type}"}} {self.duration_sum[sync_type]:.6f}')
+                lines.append(f'sheets_sync_duration_seconds_count{{sync_type="{sync_type}"}} {self.duration_count[sync_type]}')
+            lines += [
+                "# HELP sheets_sync_last_success_timestamp_seconds Unix time of the last successful sync.",
+                "# TYPE sheets_sync_last_success_timestamp_seconds gauge",
+            ]
+            lines += [
+                f'sheets_sync_last_success_timestamp_seconds{{sync_type="{sync_type}"}} {timestamp:.3f}'
+                for sync_type, timestamp in sorted(self.last_success.items())
+            ]
+            lines += [
+                "# HELP sheets_sync_running Syncs currently running.",
+                "# TYPE sheets_sync_running gauge",
+                f"sheets_sync_running {self.running}",
+            ]
+            return "\n".join(lines) + "\n"
+
+
+class SyncDaemon:
+    """
+    Run Google Sheets syncs on cron schedules, only when source data changed.
+
+    Each sync type has its own schedule. When a schedule fires, the daemon
+    computes a source version from the budget store version and the payroll
+    rollup hashes of the months the sync covers, and skips the sync if it
+    matches the version recorded after the last successful run. State is
+    persisted to a JSON file so restarts do not trigger redundant syncs.
+    """
+
+    def __init__(self, schedules: Dict[str, str], state_path: str = "data/sync_state.json",
+                 workers: int = 2, trend_months: int = 12, service_factory=None):
+        """
+        Initialize daemon.
+
+        Args:
+            schedules: Mapping of sync type (see SYNC_METHODS) to cron expression
+            state_path: JSON file holding the last-sync state
+            workers: Number of syncs that may run at once
+            trend_months: Months covered by the historical sync
+            service_factory: Callable returning a SheetsSyncService
+        """
+        for sync_type in schedules:
+            if sync_type not in SYNC_METHODS:
+                raise ValueError(f"Unknown sync type: {sync_type}")
+        self.schedules = {sync_type: CronSchedule(expr) for sync_type, expr in schedules.items()}
+        self.state_path = Path(state_path)
+        self.trend_months = trend_months
+        if service_factory is None:
+            from app.services.sheets_sync import SheetsSyncService
+            service_factory = SheetsSyncService
+        self.service_factory = service_factory
+        self.metrics = SyncMetrics()
+        self.state = self._load_state()
+        self._state_lock = threading.Lock()
+        self._running: Set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync-daemon")
+        self._stop = threading.Event()
+        self._metrics_server: Optional[ThreadingHTTPServer] = None
+
+    def _load_state(self) -> Dict:
+        """Load persisted last-sync state."""
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, "r") as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable sync state {self.state_path}: {e}")
+        return {}
+
+    def _save_state(self):
+        """Persist last-sync state atomically (state lock held)."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        tmp_path.replace(self.state_path)
+
+    def _covered_months(self, sync_type: str, now: datetime) -> List[tuple]:
+        """Months whose payroll a sync type depends on."""
+        months = 1 if sync_type in ("latest", "current") else self.trend_months
+        covered = []
+        year, month = now.year, now.month
+        for _ in range(months):
+            covered.append((year, month))
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+        return covered
+
+    def source_version(self, sync_type: str, now: Optional[datetime] = None) -> str:
+        """Version of the source data a sync type would publish."""
+        now = now or datetime.now()
+        # Fresh service so payroll is re-read rather than served from memory
+        payroll_service = PayrollService(create_qb_client())
+        parts = [f"budgets:{payroll_service.budget_manager.version}"]
+        for year, month in self._covered_months(sync_type, now):
+            parts.append(f"{year}-{month:02d}:{payroll_service.payroll_rollup_hash(year, month)}")
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    def check_and_sync(self, sync_type: str, force: bool = False) -> str:
+        """
+        Run one sync type if its source data changed.
+
+        Returns:
+            "success", "failed" or "skipped"
+        """
+        version = self.source_version(sync_type)
+        with self._state_lock:
+            previous = self.state.get(sync_type, {})
+        if not force and previous.get("source_version") == version and previous.get("status") == "success":
+            self.metrics.record_skip(sync_type)
+            logger.debug(f"Skipping {sync_type} sync, sources unchanged")
+            return "skipped"
+
+        started = time.perf_counter()
+        self.metrics.run_started()
+        try:
+            # Drop cached reports and trends so the sync reflects the changed sources
+            covered = self._covered_months(sync_type, datetime.now())
+            get_cache().invalidate_tags(*(period_tag(year, month) for year, month in covered))
+            service = self.service_factory()
+            with sheets_priority(BACKGROUND):
+                result = getattr(service, SYNC_METHODS[sync_type])()
+            success = all(result.values()) if isinstance(result, dict) else bool(result)
+            error = None if success else "Sync reported failure"
+        except Exception as e:
+            success = False
+            error = str(e)
+        finally:
+            self.metrics.run_finished()
+
+        status = "success" if success else "failed"
+        self.metrics.record_run(sync_type, status, time.perf_counter() - started)
+        with self._state_lock:
+            entry = dict(previous)
+            entry.update({"status": status, "last_run": datetime.now().isoformat(), "error": error})
+            if success:
+                entry["source_version"] = version
+                entry["last_success"] = entry["last_run"]
+            self.state[sync_type] = entry
+            self._save_state()
+        log = logger.info if success else logger.warning
+        log(f"Scheduled {sync_type} sync {status}" + (f": {error}" if error else ""))
+        return status
+
+    def _submit(self, sync_type: str):
+        """Run a sync type in the worker pool unless it is already running."""
+        with self._state_lock:
+            if sync_type in self._running:
+                logger.debug(f"{sync_type} sync still running, not starting another")
+                return
+            self._running.add(sync_type)
+
+        def job():
+            try:
+                self.check_and_sync(sync_type)
+            finally:
+                with self._state_lock:
+                    self._running.discard(sync_type)
+
+        self._pool.submit(job)
+
+    def run_once(self, force: bool = False) -> Dict[str, str]:
+        """Check every scheduled sync type once, in parallel."""
+        futures = {
+            sync_type: self._pool.submit(self.check_and_sync, sync_type, force)
+            for sync_type in self.schedules
+        }
+        return {sync_type: future.result() for sync_type, future in futures.items()}
+
+    def run_forever(self, metrics_port: Optional[int] = None):
+        """Run schedules until stop() is called (or KeyboardInterrupt)."""
+        if metrics_port:
+            self.start_metrics_server(metrics_port)
+        now = datetime.now()
+        next_runs = {sync_type: schedule.next_after(now) for sync_type, schedule in self.schedules.items()}
+        for sync_type, schedule in self.schedules.items():
+            logger.info(f"Scheduled {sync_type} sync '{schedule.expression}', next run {next_runs[sync_type]}")
+        try:
+            while not self._stop.is_set():
+                now = datetime.now()
+                for sync_type, next_run in next_runs.items():
+                    if next_run <= now:
+                        self._submit(sync_type)
+                        next_runs[sync_type] = self.schedules[sync_type].next_after(now)
+                wait = (min(next_runs.values()) - datetime.now()).total_seconds()
+                self._stop.wait(max(wait, 0.0))
+        except KeyboardInterrupt:
+            logger.info("Sync daemon interrupted")
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Ask run_forever to return."""
+        self._stop.set()
+
+    def shutdown(self):
+        """Stop the metrics server and wait for running syncs."""
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server = None
+        self._pool.shutdown(wait=True)
+
+    def start_metrics_server(self, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Serve Prometheus metrics at /metrics on a background thread."""
+        metrics = self.metrics
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._metrics_server.serve_forever, name="sync-metrics", daemon=True).start()
+        logger.info(f"Serving sync metrics on {host}:{port}/metrics")
+        return self._metrics_server
+
+
+def build_sync_daemon() -> SyncDaemon:
+    """Create a sync daemon configured from application settings."""
+    return SyncDaemon(
+        schedules=settings.sync_daemon_schedules,
+        state_path=settings.sync_daemon_state_path,
+        workers=settings.sync_daemon_workers,
+    )
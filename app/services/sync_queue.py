@@ -0,0 +1,179 @@
+"""Background queue that coalesces and debounces Google Sheets syncs."""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from app.services.sheets_quota import sheets_priority, BACKGROUND
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sync type -> SheetsSyncService method
+SYNC_METHODS = {
+    "latest": "sync_latest_report",
+    "current": "sync_current_month",
+    "historical": "sync_historical_trends",
+    "all": "sync_all",
+}
+
+
+class SyncQueue:
+    """
+    Run Google Sheets syncs on a background worker thread.
+
+    Requests for the same sync type are coalesced while one is pending, and
+    a sync type never runs more than once per debounce window, so a busy
+    dashboard triggers at most one sync per window instead of one per hit.
+    """
+
+    def __init__(self, service_factory: Callable, debounce_seconds: float = 30.0):
+        """
+        Initialize sync queue.
+
+        Args:
+            service_factory: Callable returning a SheetsSyncService
+            debounce_seconds: Minimum seconds between two syncs of one type
+        """
+        self.service_factory = service_factory
+        self.debounce_seconds = debounce_seconds
+        self._service = None
+        self._pending: Dict[str, float] = {}  # sync type -> due time
+        self._last_run: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.requested = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failures = 0
+        self.last_sync_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def sync_service(self):
+        """Get the sync service, creating it on first use."""
+        if self._service is None:
+            self._service = self.service_factory()
+        return self._service
+
+    def request(self, sync_type: str = "latest") -> bool:
+        """
+        Queue a sync without waiting for it.
+
+        Args:
+            sync_type: One of SYNC_METHODS
+
+        Returns:
+            True if a new sync was queued, False if coalesced into a pending one
+        """
+        if sync_type not in SYNC_METHODS:
+            raise ValueError(f"Unknown sync type: {sync_type}")
+
+        with self._condition:
+            self.requested += 1
+            if sync_type in self._pending:
+                self.coalesced += 1
+                return False
+
+            # Debounce against the last run of this type
+            last_run = self._last_run.get(sync_type, 0.0)
+            self._pending[sync_type] = max(time.monotonic(), last_run + self.debounce_seconds)
+            self._ensure_worker()
+            self._condition.notify()
+            return True
+
+    def _ensure_worker(self):
+        """Start the worker thread if it is not running (lock held)."""
+        self._stopped = False
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="sheets-sync", daemon=True)
+            self._thread.start()
+
+    def _next_due(self) -> Optional[str]:
+        """Wait for the next due sync type (lock held); None when stopping."""
+        while not self._stopped:
+            if self._pending:
+                sync_type, due = min(self._pending.items(), key=lambda item: item[1])
+                delay = due - time.monotonic()
+                if delay <= 0:
+                    del self._pending[sync_type]
+                    # Requests arriving while this runs are debounced from now
+                    self._last_run[sync_type] = time.monotonic()
+                    return sync_type
+                self._condition.wait(delay)
+            else:
+                self._condition.wait()
+        return None
+
+    def _worker(self):
+        """Process queued syncs until stopped."""
+        while True:
+            with self._condition:
+                sync_type = self._next_due()
+                if sync_type is None:
+                    return
+            self._run(sync_type)
+
+    def _run(self, sync_type: str):
+        """Run one sync and record the outcome."""
+        try:
+            service = self.sync_service
+            if not service.exporter.sheets_service:
+                logger.debug("Google Sheets not configured, skipping auto-sync")
+                return
+            with sheets_priority(BACKGROUND):
+                result = getattr(service, SYNC_METHODS[sync_type])()
+            success = all(result.values()) if isinstance(result, dict) else bool(result)
+            if success:
+                self.completed += 1
+                self.last_sync_at = datetime.now()
+                logger.info(f"Background sync '{sync_type}' completed")
+            else:
+                self.failures += 1
+                self.last_error = f"Sync '{sync_type}' reported failure"
+                logger.warning(f"Background sync '{sync_type}' failed")
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Background sync '{sync_type}' failed: {e}")
+        finally:
+            with self._condition:
+                self._last_run[sync_type] = time.monotonic()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the worker thread; pending syncs are dropped."""
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Get queue statistics."""
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending),
+                "pending": sorted(self._pending),
+                "requested": self.requested,
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "failures": self.failures,
+                "last_sync_at": self.last_sync_at.isoformat() if self.last_sync_at else None,
+                "last_error": self.last_error,
+                "debounce_seconds": self.debounce_seconds,
+            }
+
+
+_sync_queue = None
+
+
+def get_sync_queue() -> SyncQueue:
+    """Get the global sync queue."""
+    global _sync_queue
+    if _sync_queue is None:
+        from app.services.sheets_sync import SheetsSyncService
+        _sync_queue = SyncQueue(SheetsSyncService, debounce_seconds=settings.sheets_sync_debounce_seconds)
+    return _sync_queue
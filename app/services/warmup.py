@@ -0,0 +1,152 @@
+"""Background cache warming of recent periods after startup."""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from app.payroll.service import PayrollService
+from app.quickbooks.client import create_qb_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+RUNNING = "running"
+DONE = "done"
+TIMED_OUT = "timed_out"  # Budget ran out; the remaining periods are computed on demand
+STOPPED = "stopped"
+FAILED = "failed"
+
+
+class CacheWarmer:
+    """
+    Pre-compute the data behind the first dashboard loads.
+
+    For the current month and the previous months it caches the variance
+    report (which also holds the department rollups) and the trends
+    windows ending at that month, newest month first. Warming runs in a
+    background thread so it never delays readiness, and stops once the
+    time budget is spent. A failing period is logged and skipped.
+    """
+
+    def __init__(self, months: int = 3, trend_windows: Sequence[int] = (12,), budget_seconds: float = 30.0):
+        """
+        Initialize cache warmer.
+
+        Args:
+            months: Previous months warmed in addition to the current one
+            trend_windows: Trends window lengths (months) warmed per month
+            budget_seconds: Wall-clock budget for the whole warm-up
+        """
+        self.months = months
+        self.trend_windows = tuple(trend_windows)
+        self.budget_seconds = budget_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self):
+        self.status = IDLE
+        self.progress = {"done": 0, "total": 0, "label": ""}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.errors: List[str] = []
+
+    def tasks(self, service: PayrollService, now: Optional[datetime] = None) -> List[Tuple[str, Callable]]:
+        """(label, callable) pairs to run, most recent period first."""
+        now = now or datetime.now()
+        year, month = now.year, now.month
+        tasks = []
+        for _ in range(self.months + 1):
+            period = f"{year}-{month:02d}"
+            tasks.append((f"report {period}", lambda y=year, m=month: service.generate_variance_report(y, m)))
+            for window in self.trend_windows:
+                tasks.append((
+                    f"trends {window}m to {period}",
+                    lambda w=window, y=year, m=month: service.get_historical_variance_trends(w, y, m)
+                ))
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+        return tasks
+
+    def start(self) -> bool:
+        """Start warming in the background; returns False if already running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._reset()
+            self._stop.clear()
+            self.status = RUNNING
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout: float = 1.0):
+        """Stop after the task in progress."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        deadline = time.monotonic() + self.budget_seconds
+        try:
+            service = PayrollService(create_qb_client())
+            tasks = self.tasks(service)
+        except Exception as e:
+            logger.warning(f"Cache warm-up could not start: {e}")
+            self._finish(FAILED, error=str(e))
+            return
+
+        self.progress = {"done": 0, "total": len(tasks), "label": ""}
+        for done, (label, task) in enumerate(tasks):
+            if self._stop.is_set():
+                self._finish(STOPPED)
+                return
+            if time.monotonic() >= deadline:
+                logger.info(f"Cache warm-up budget spent after {done}/{len(tasks)} tasks")
+                self._finish(TIMED_OUT)
+                return
+            self.progress = {"done": done, "total": len(tasks), "label": label}
+            try:
+                task()
+            except Exception as e:
+                logger.warning(f"Cache warm-up of {label} failed: {e}")
+                self.errors.append(f"{label}: {e}")
+        self.progress = {"done": len(tasks), "total": len(tasks), "label": ""}
+        self._finish(DONE)
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            if error:
+                self.errors.append(error)
+            self.status = status
+            self.finished_at = time.time()
+        if status == DONE:
+            logger.info(f"Cache warmed in {self.finished_at - self.started_at:.1f}s")
+
+    def stats(self) -> Dict:
+        """Warm-up status and progress, for /health."""
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "status": self.status,
+                "progress": dict(self.progress),
+                "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else None,
+                "budget_seconds": self.budget_seconds,
+                "errors": list(self.errors),
+            }
+
+
+_warmer = CacheWarmer(
+    months=settings.cache_warm_months,
+    trend_windows=settings.cache_warm_trend_windows,
+    budget_seconds=settings.cache_warm_budget_seconds,
+)
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """Get the global cache warmer."""
+    return _warmer
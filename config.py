@@ -1,6 +1,6 @@
 """Configuration management for the application."""
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -16,11 +16,59 @@ class Settings(BaseSettings):
     # Google Sheets
     google_sheets_credentials_path: Optional[str] = None
     google_sheets_spreadsheet_id: Optional[str] = None
+    sheets_sync_debounce_seconds: float = 30.0  # Minimum gap between background auto-syncs
+    sheets_write_chunk_rows: int = 2000  # Rows per Sheets write request
+    sheets_write_parallelism: int = 4  # Concurrent chunk writes for large sheets
+    sheets_read_requests_per_minute: int = 60  # Sheets API per-user read quota
+    sheets_write_requests_per_minute: int = 60  # Sheets API per-user write quota
+    sheets_max_retries: int = 5  # Retries on 429/5xx responses
+    sheets_backoff_base_seconds: float = 1.0
+    
+    # Scheduled sync daemon (python sync_sheets.py daemon)
+    sync_daemon_schedules: Dict[str, str] = {"latest": "*/5 * * * *", "historical": "0 * * * *"}
+    sync_daemon_workers: int = 2
+    sync_daemon_state_path: str = "data/sync_state.json"
+    sync_daemon_metrics_port: int = 9108  # 0 disables the /metrics endpoint
     
     # Application
     app_secret_key: str = "dev-secret-key-change-in-production"
     log_level: str = "INFO"
     
+    # Cache (see app/services/cache.py)
+    cache_backend: str = "memory"  # memory (per process) or sqlite (shared by all workers on the host)
+    cache_sqlite_path: str = "data/cache.sqlite3"
+    cache_default_ttl: int = 300
+    cache_max_entries: int = 1024
+    cache_max_bytes: int = 256 * 1024 * 1024  # Approximate; DataFrames are measured deeply
+    cache_sweep_interval: float = 60.0  # Seconds between expired-entry sweeps
+    trends_cache_stale_seconds: float = 120.0  # Serve expired trends this long while refreshing
+    cache_warm_on_startup: bool = True  # Warm recent periods in the background after startup
+    cache_warm_months: int = 3  # Previous months warmed besides the current one
+    cache_warm_trend_windows: List[int] = [12]  # Trends window lengths warmed per month
+    cache_warm_budget_seconds: float = 30.0  # Warm-up stops after this long
+    
+    # Worker pools for blocking work (see app/services/executors.py)
+    light_pool_workers: int = 8
+    export_pool_workers: int = 2
+    loop_lag_interval: float = 0.5  # Seconds between event loop lag samples
+    
+    # Excel/CSV downloads (see app/api/streaming.py)
+    max_concurrent_exports: int = 4
+    export_slot_timeout: float = 10.0  # Seconds to wait for a free export slot before 503
+    export_spool_max_bytes: int = 8 * 1024 * 1024  # Larger exports spill to an anonymous temp file
+    bulk_export_processes: int = 2  # Worker processes for bulk workbook exports (0 = in-process)
+    
+    # JSON responses (see app/api/fastjson.py)
+    response_compression_min_bytes: int = 1024  # Smaller bodies are sent uncompressed
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 5  # Used when the optional brotli package is installed
+    
+    # Asynchronous export jobs (see app/services/export_jobs.py)
+    export_job_dir: str = "data/exports"
+    export_job_workers: int = 2
+    export_job_ttl_seconds: float = 3600.0  # How long finished artifacts stay downloadable
+    export_job_max_pending: int = 20  # Queued jobs before new submissions get 503
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
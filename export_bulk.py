@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Script to export a year-end pack of monthly variance reports.
+
+Usage:
+    python export_bulk.py YEAR [--months 1-12] [--companies ID,ID] [--zip] [--out PATH]
+
+Each month (per company) is built in a worker process
+(BULK_EXPORT_PROCESSES). Output is one workbook with a summary sheet
+and a sheet per month, or with --zip one workbook per company.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from app.reports.bulk import export_bulk
+from app.services.executors import shutdown_executors
+
+
+def parse_months(value: str):
+    """Parse a month list such as "1-12" or "1,4,7,10"."""
+    months = []
+    for part in value.split(","):
+        if "-" in part:
+            start, end = part.split("-", 1)
+            months.extend(range(int(start), int(end) + 1))
+        else:
+            months.append(int(part))
+    return months
+
+
+def print_progress(done: int, total: int, label: str):
+    """Print a one-line progress bar."""
+    width = 30
+    filled = int(width * done / total)
+    sys.stdout.write(f"\r  [{'#' * filled}{'.' * (width - filled)}] {done}/{total} {label:<20}")
+    sys.stdout.flush()
+    if done == total:
+        sys.stdout.write("\n")
+
+
+def main():
+    """Export a bulk variance pack."""
+    parser = argparse.ArgumentParser(description="Export a year-end pack of variance reports")
+    parser.add_argument("year", type=int)
+    parser.add_argument("--months", type=parse_months, default=None, help='e.g. "1-12" or "1,4,7,10"')
+    parser.add_argument("--companies", default=None, help="Comma-separated QuickBooks company IDs")
+    parser.add_argument("--zip", action="store_true", help="One workbook per company, zipped")
+    parser.add_argument("--out", default=None, help="Output path (default: exports/variance_pack_YEAR.xlsx|zip)")
+    args = parser.parse_args()
+
+    output = "zip" if args.zip else "workbook"
+    out = Path(args.out or f"exports/variance_pack_{args.year}.{'zip' if args.zip else 'xlsx'}")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    companies = args.companies.split(",") if args.companies else None
+
+    print("=" * 60)
+    print("Bulk Variance Export")
+    print("=" * 60)
+    print()
+
+    try:
+        export_bulk(out, args.year, months=args.months, company_ids=companies,
+                    output=output, progress=print_progress)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        shutdown_executors()
+
+    print()
+    print(f"✅ Saved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,43 @@
 """Main FastAPI application entry point."""
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.api.batch import router as batch_router
+from app.api.jobs import router as jobs_router
+from app.api.fastjson import FastJSONResponse
+from app.services.cache import get_cache
+from app.services.executors import get_loop_monitor, shutdown_executors
+from app.services.sync_queue import get_sync_queue
+from app.services.export_jobs import shutdown_export_jobs
+from app.services.warmup import get_cache_warmer
 from config import settings
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services on startup and stop them on shutdown."""
+    monitor = get_loop_monitor()
+    monitor.start()
+    get_cache().start_sweeper()
+    if settings.cache_warm_on_startup:
+        # Runs in the background; the app serves requests meanwhile
+        get_cache_warmer().start()
+    yield
+    get_cache_warmer().stop()
+    await monitor.stop()
+    get_cache().stop_sweeper()
+    get_sync_queue().stop(timeout=5)
+    shutdown_export_jobs()
+    shutdown_executors()
+
+
 app = FastAPI(
     title="QuickBooks Accounting Automation",
     description="Automated salary variance reporting for Architecture and Engineering firms",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware - allow all origins by default, or specific origins from environment variable
@@ -37,6 +66,7 @@ app.add_middleware(
 # Include routers
 app.include_router(router)
 app.include_router(batch_router)
+app.include_router(jobs_router)
 
 
 @app.get("/")
@@ -1,12 +1,48 @@
 #!/usr/bin/env python3
-"""Script to manually sync data to Google Sheets."""
+"""
+Script to sync data to Google Sheets.
 
+Usage:
+    python sync_sheets.py [latest|current|historical|all] [months]
+    python sync_sheets.py daemon [--once]
+
+The daemon runs each sync type on its cron schedule (SYNC_DAEMON_SCHEDULES),
+skipping runs whose budget and payroll sources are unchanged, and serves
+Prometheus metrics on SYNC_DAEMON_METRICS_PORT.
+"""
+
+import logging
 import sys
 from app.services.sheets_sync import SheetsSyncService
+from config import settings
+
+def run_daemon(once: bool = False):
+    """Run the scheduled sync daemon."""
+    from app.services.sync_daemon import build_sync_daemon
+    
+    logging.basicConfig(
+        level=settings.log_level.upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+    daemon = build_sync_daemon()
+    
+    if once:
+        results = daemon.run_once()
+        daemon.shutdown()
+        for sync_type, status in results.items():
+            print(f"  {sync_type}: {status}")
+        return
+    
+    daemon.run_forever(metrics_port=settings.sync_daemon_metrics_port or None)
 
 def main():
     """Sync data to Google Sheets."""
     sync_type = sys.argv[1] if len(sys.argv) > 1 else "latest"
+    
+    if sync_type == "daemon":
+        run_daemon(once="--once" in sys.argv[2:])
+        return
+    
     months = int(sys.argv[2]) if len(sys.argv) > 2 else 12
     
     print("=" * 60)
@@ -0,0 +1,307 @@
+"""Tests for API endpoints."""
+import gzip
+import io
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+from main import app
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_health_reports_cache_warmup(client):
+    response = client.get("/api/v1/health")
+    assert response.status_code == 200
+    warmup = response.json()["cache_warmup"]
+    assert warmup["status"] in ("running", "done", "timed_out")
+    assert set(warmup["progress"]) == {"done", "total", "label"}
+
+
+def test_excel_export_is_streamed(client):
+    from openpyxl import load_workbook
+    from app.api.streaming import get_export_limiter
+
+    response = client.post("/api/v1/reports/variance", json={"year": 2024, "month": 3, "format": "excel"})
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == 'attachment; filename="variance_report_2024_03.xlsx"'
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert "Variance Report" in load_workbook(io.BytesIO(response.content)).sheetnames
+    assert get_export_limiter().active == 0
+
+
+def test_csv_export_can_be_compressed(client):
+    response = client.post(
+        "/api/v1/reports/variance",
+        json={"year": 2024, "month": 3, "format": "csv", "compress": True},
+        headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text.startswith("Employee ID,Employee Name")
+
+    refused = client.post(
+        "/api/v1/reports/variance",
+        json={"year": 2024, "month": 3, "format": "csv", "compress": True},
+        headers={"Accept-Encoding": "gzip;q=0"}
+    )
+    assert "content-encoding" not in refused.headers
+    assert refused.headers["vary"] == "Accept-Encoding"
+    assert int(refused.headers["content-length"]) == len(refused.content)
+
+
+def test_export_limiter_follows_the_event_loop():
+    import asyncio
+    from app.api.streaming import ExportLimiter
+
+    limiter = ExportLimiter(1)
+
+    async def export():
+        assert await limiter.acquire(timeout=1)
+        # Waiting binds the semaphore to the running loop
+        assert not await limiter.acquire(timeout=0.01)
+        limiter.release()
+
+    # Each asyncio.run() has its own loop, like successive app lifespans
+    asyncio.run(export())
+    asyncio.run(export())
+    assert limiter.active == 0
+
+
+def test_unsupported_format_is_rejected(client):
+    response = client.post("/api/v1/reports/variance", json={"year": 2024, "month": 3, "format": "pdf"})
+    assert response.status_code == 400
+
+
+def test_bulk_export_rejects_bad_months(client):
+    response = client.post("/api/v1/reports/bulk", json={"year": 2024, "months": [0, 13]})
+    assert response.status_code == 400
+
+
+def test_export_job_lifecycle(client):
+    response = client.post("/api/v1/exports", json={"format": "csv", "year": 2024, "month": 3})
+    assert response.status_code in (200, 202)
+    job_id = response.json()["id"]
+
+    events = client.get(f"/api/v1/exports/{job_id}/events").text
+    assert "event: done" in events
+
+    job = client.get(f"/api/v1/exports/{job_id}").json()
+    assert job["status"] == "done" and job["download"]
+
+    full = client.get(f"/api/v1/exports/{job_id}/download")
+    assert full.status_code == 200
+    assert full.text.startswith("Employee ID,Employee Name")
+
+    partial = client.get(f"/api/v1/exports/{job_id}/download", headers={"Range": "bytes=0-10"})
+    assert partial.status_code == 206
+    assert partial.content == full.content[:11]
+    assert partial.headers["content-range"] == f"bytes 0-10/{len(full.content)}"
+
+    assert client.get("/api/v1/exports/missing").status_code == 404
+
+
+def test_columnar_formats_round_trip(client):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    response = client.post("/api/v1/reports/variance", json={"year": 2024, "month": 3, "format": "parquet"})
+    assert response.status_code == 200
+    table = pq.read_table(pa.BufferReader(response.content))
+    assert table.schema.field("Budget").type == pa.float64()
+    report = client.post("/api/v1/reports/variance", json={"year": 2024, "month": 3}).json()
+    assert table.to_pylist() == report
+
+    response = client.get("/api/v1/reports/variance/trends?months=3&end_year=2024&end_month=3&format=arrow")
+    assert response.status_code == 200
+    assert pa.ipc.open_file(pa.BufferReader(response.content)).read_all().num_rows == 3
+
+    response = client.get("/api/v1/batch/dashboard?year=2024&month=3&format=arrow&part=employees")
+    assert response.status_code == 200
+    assert "display_name" in pa.ipc.open_file(pa.BufferReader(response.content)).schema.names
+    assert client.get("/api/v1/batch/dashboard?year=2024&month=3&format=xml").status_code == 400
+
+
+def test_columnar_dashboard_builds_only_the_requested_part(client):
+    pytest.importorskip("pyarrow")
+    from fastapi import Depends
+    from app.api.routes import get_datasets, get_qb_client
+
+    contexts = []
+
+    def recording_datasets(qb_client=Depends(get_qb_client)):
+        contexts.append(get_datasets(qb_client))
+        return contexts[-1]
+
+    app.dependency_overrides[get_datasets] = recording_datasets
+    try:
+        for part, expected in (("employees", ["employees"]),
+                               ("department", ["report:2024-06", "formatted_report:2024-06", "departments:2024-06"])):
+            response = client.get(f"/api/v1/batch/dashboard?year=2024&month=6&format=parquet&part={part}")
+            assert response.status_code == 200
+            # Monthly payroll/budget inputs are loaded only on shared-cache misses
+            built = [name for name in contexts[-1].computed if not name.startswith(("payroll:", "budgets:"))]
+            assert sorted(built) == sorted(expected)
+    finally:
+        app.dependency_overrides.pop(get_datasets, None)
+
+
+def test_trends_and_dashboard_support_etags(client):
+    for url in ("/api/v1/reports/variance/trends?months=3&end_year=2024&end_month=5",
+                "/api/v1/batch/dashboard?months=3&year=2024&month=5"):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        second = client.get(url)
+        assert second.headers["etag"] == etag and second.content == first.content
+
+        not_modified = client.get(url, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304 and not_modified.content == b""
+        assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    stats = client.get("/api/v1/cache/stats").json()["namespaces"]["rendered"]
+    assert stats["hits"] >= 4
+    client.post("/api/v1/cache/invalidate", json={"year": 2024, "month": 4})
+    assert client.get("/api/v1/cache/stats").json()["namespaces"]["rendered"]["entries"] == 0
+
+
+def test_fast_json_handles_numpy_pandas_and_fallback(monkeypatch):
+    import json
+    import numpy as np
+    import pandas as pd
+    from app.api import fastjson
+
+    content = {"n": np.int64(3), "x": np.float32(1.5), "nan": float("nan"),
+               "when": pd.Timestamp("2024-03-01"), "df": pd.DataFrame({"a": [1, 2]})}
+    expected = {"n": 3, "x": 1.5, "nan": None, "when": "2024-03-01T00:00:00", "df": [{"a": 1}, {"a": 2}]}
+    assert json.loads(fastjson.dumps(content)) == expected
+    monkeypatch.setattr(fastjson, "orjson", None)
+    assert json.loads(fastjson.dumps(content)) == expected
+
+    assert fastjson.negotiate_encoding("gzip;q=0, br", ("br", "gzip")) == "br"
+    assert fastjson.negotiate_encoding("br;q=0, gzip;q=0.5", ("br", "gzip")) == "gzip"
+    assert fastjson.negotiate_encoding("identity", ("br", "gzip")) is None
+    assert fastjson.negotiate_encoding("*", ("gzip",)) == "gzip"
+
+
+def test_dashboard_split_orient_and_compression(client):
+    import json
+
+    url = "/api/v1/batch/dashboard?months=6&year=2024&month=2"
+    records = client.get(url).json()
+    split = client.get(url + "&orient=split").json()
+    report = split["report"]
+    assert set(report) == {"columns", "data"}
+    assert [dict(zip(report["columns"], row)) for row in report["data"]] == records["report"]
+    assert client.get(url + "&orient=table").status_code == 400
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    raw = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers and json.loads(raw.content) == records
+
+
+def test_dashboard_parts_selector_and_server_timing(client):
+    url = "/api/v1/batch/dashboard?months=4&year=2023&month=11"
+    full = client.get(url)
+    assert set(full.json()) == {"trends", "department", "employees", "report"}
+    timing = full.headers["server-timing"]
+    assert all(f"{name};dur=" in timing for name in ("report", "trends", "employees", "render"))
+    assert all(row["Employee ID"] == "" for row in full.json()["department"])
+    assert len(full.json()["department"]) == 2
+
+    partial = client.get(url + "&parts=department,trends")
+    assert list(partial.json()) == ["trends", "department"]
+    assert partial.json()["department"] == full.json()["department"]
+    assert "employees;dur=" not in partial.headers["server-timing"]
+    assert client.get(url + "&parts=trends,department").headers["server-timing"] == 'cache;desc="hit"'
+    assert client.get(url + "&parts=payroll").status_code == 400
+
+
+def test_excel_export_formats_the_report_once(client, monkeypatch):
+    from app.services import datasets
+
+    calls = []
+    format_report = datasets.format_variance_report
+    monkeypatch.setattr(datasets, "format_variance_report", lambda df: calls.append(1) or format_report(df))
+    response = client.post("/api/v1/reports/variance", json={"year": 2024, "month": 8, "format": "excel"})
+    assert response.status_code == 200
+    assert len(calls) == 1
+
+
+def test_async_render_skips_results_invalidated_mid_build():
+    import asyncio
+    from app.api.rendered import cached_render_async, render_json
+    from app.services.cache import get_cache
+
+    builds = []
+
+    async def build(invalidate: bool):
+        builds.append(invalidate)
+        await asyncio.sleep(0.05)
+        if invalidate:
+            get_cache().invalidate_tags("period:2024-01")
+        return render_json({"build": len(builds)})
+
+    async def scenario():
+        key, tags = "test:invalidated-mid-build", ("period:2024-01",)
+        (first, hit), (shared, shared_hit) = await asyncio.gather(
+            cached_render_async(key, lambda: build(True), tags=tags),
+            cached_render_async(key, lambda: build(True), tags=tags),
+        )
+        assert not hit and shared_hit and shared.body == first.body
+        assert len(builds) == 1
+        rebuilt, hit = await cached_render_async(key, lambda: build(False), tags=tags)
+        assert not hit and rebuilt.body != first.body
+        cached, hit = await cached_render_async(key, lambda: build(False), tags=tags)
+        assert hit and cached.body == rebuilt.body
+
+    asyncio.run(scenario())
+    assert len(builds) == 2
+
+
+def test_rendered_response_compresses_on_demand(monkeypatch):
+    from app.api import rendered as rendered_module
+
+    calls = []
+    compress = rendered_module.compress
+    monkeypatch.setattr(rendered_module, "compress", lambda body, coding: calls.append(coding) or compress(body, coding))
+    rendered = rendered_module.render_json({"rows": ["payroll"] * 2000})
+    assert "gzip" in rendered.encodings and calls == []
+    assert rendered.content() == rendered.body and calls == []
+    assert gzip.decompress(rendered.content("gzip")) == rendered.body
+    rendered.content("gzip")
+    assert calls == ["gzip"]
+
+
+def test_buffer_response_releases_once_however_it_ends():
+    import asyncio
+    from app.api.streaming import buffer_response
+
+    async def never_disconnects():
+        await asyncio.Event().wait()
+
+    async def broken_send(message):
+        raise OSError("client went away")
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    for send_message in (broken_send, send):
+        released = []
+        buffer = io.BytesIO(b"Employee ID\n")
+        response = buffer_response(buffer, "report.csv", "text/csv", on_close=lambda: released.append(1))
+        try:
+            asyncio.run(response({"type": "http"}, never_disconnects, send_message))
+        except OSError:
+            pass
+        assert released == [1] and buffer.closed
+    assert sent[-2]["body"] == b"Employee ID\n"
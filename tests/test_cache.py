@@ -0,0 +1,301 @@
+"""Tests for the cache backends."""
+import threading
+import time
+import pandas as pd
+import pytest
+from app.services.cache import CacheBackend, LRUCache, estimate_size
+from app.services.cache_sqlite import SQLiteCache
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = LRUCache(max_entries=2)
+    cache.set("a:1", 1)
+    cache.set("a:2", 2)
+    cache.get("a:1")  # a:1 is now most recently used
+    cache.set("b:1", 3)
+    assert cache.get("a:2") is None
+    assert cache.get("a:1") == 1 and cache.get("b:1") == 3
+
+    df = pd.DataFrame({"x": range(1000)})
+    size = estimate_size(df)
+    cache = LRUCache(max_bytes=int(size * 2.5))
+    for i in range(3):
+        cache.set(f"df:{i}", df)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= cache.max_bytes
+    assert stats["namespaces"]["df"]["evictions"] == 1
+
+
+def test_expiry_sweep_and_namespace_stats():
+    cache = LRUCache(default_ttl=1, sweep_interval=3600)
+    cache.set("trends:12", "t", ttl=0.05)
+    cache.set("report:1", "r", ttl=60)
+    assert cache.get("trends:12") == "t"
+    assert cache.get("trends:missing") is None
+    time.sleep(0.06)
+    assert cache.sweep() == 1
+
+    stats = cache.stats()["namespaces"]
+    assert stats["trends"]["hits"] == 1
+    assert stats["trends"]["misses"] == 1
+    assert stats["trends"]["expirations"] == 1
+    assert stats["report"]["entries"] == 1
+
+
+def test_concurrent_access_keeps_accounting_consistent():
+    cache = LRUCache(max_entries=50)
+
+    def worker(n):
+        for i in range(500):
+            cache.set(f"ns:{(n * i) % 80}", [i] * 10)
+            cache.get(f"ns:{i % 80}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["entries"] <= 50
+    assert stats["bytes"] == sum(entry.size for entry in cache._entries.values())
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = LRUCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("trends:12", compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    stats = cache.stats()["namespaces"]["trends"]
+    assert stats["misses"] == 1 and stats["coalesced"] == 7
+
+
+def test_failed_computation_is_not_cached():
+    cache = LRUCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cache.get_or_compute("report:1", fail)
+    assert cache.get_or_compute("report:1", lambda: 1) == 1
+
+
+def test_stale_value_served_while_refreshing():
+    cache = LRUCache()
+    cache.get_or_compute("trends:6", lambda: "old", ttl=0.05, stale_ttl=10)
+    time.sleep(0.06)
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def refresh():
+        started.set()
+        release.wait(5)
+        return "new"
+
+    assert cache.get_or_compute("trends:6", refresh, ttl=60) == "old"
+    assert started.wait(1)
+    # A second caller during the refresh still gets the stale value, no new refresh
+    assert cache.get_or_compute("trends:6", lambda: "other", ttl=60) == "old"
+    release.set()
+
+    deadline = time.monotonic() + 2
+    while cache.get("trends:6") != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("trends:6") == "new"
+    assert cache.stats()["namespaces"]["trends"]["refreshes"] == 1
+
+
+def test_values_are_encoded_outside_the_cache_lock():
+    blocked = []
+
+    class SlowEncodingCache(LRUCache):
+        def _encode(self, value):
+            # Another thread must be able to use the cache meanwhile
+            reader = threading.Thread(target=self.get, args=("report:other",))
+            reader.start()
+            reader.join(timeout=1)
+            blocked.append(reader.is_alive())
+            return super()._encode(value)
+
+    cache = SlowEncodingCache()
+    assert cache.get_or_compute("report:1", lambda: pd.DataFrame({"x": [1]})) is not None
+    cache.set("report:2", 2)
+    assert blocked == [False, False]
+
+
+def test_tag_invalidation_removes_only_dependent_entries():
+    cache = LRUCache()
+    cache.set("trends:a", 1, tags=["period:2024-02", "period:2024-03"])
+    cache.set("trends:b", 2, tags=["period:2024-04"])
+    cache.set("report:c", 3, tags=["period:2024-03", "company:acme"])
+
+    assert cache.invalidate_tags("period:2024-03") == 2
+    assert cache.get("trends:a") is None and cache.get("report:c") is None
+    assert cache.get("trends:b") == 2
+    assert cache.stats()["tags"] == 1
+
+
+def test_set_budget_invalidates_covering_trends(tmp_path, monkeypatch):
+    import json
+    from app.payroll.budget import BudgetManager
+    from app.payroll.service import PayrollService
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    from app.services import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "_cache", LRUCache())
+    budget_file = tmp_path / "budgets.json"
+    budget_file.write_text(json.dumps({}))
+
+    service = PayrollService(MockQuickBooksClient())
+    service.budget_manager = BudgetManager(str(budget_file))
+    service.get_historical_variance_trends(3, 2024, 3)  # 2024-01..03
+    service.get_historical_variance_trends(3, 2024, 6)  # 2024-04..06
+    assert cache_module.get_cache().stats()["entries"] == 2
+
+    service.budget_manager.set_budget("emp_001", "John Smith", "Engineering", "05", 2024, 1.0)
+    keys = list(cache_module.get_cache()._entries)
+    assert len(keys) == 1 and keys[0].endswith(":3:2024:03")
+
+
+def test_budget_files_are_versioned_separately(tmp_path, monkeypatch):
+    import json
+    import os
+    from app.payroll.budget import BudgetManager
+    from app.services import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "_cache", LRUCache())
+    cache = cache_module.get_cache()
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+    first.write_text(json.dumps({"a": {"amount": 1.0}}))
+    second.write_text(json.dumps({"b": {"amount": 2.0}}))
+    managers = [BudgetManager(str(first)), BudgetManager(str(second))]
+
+    cache.set("report:x", 1, tags=["budgets"])
+    for manager in managers * 2:
+        manager.reload_budgets()
+    assert cache.get("report:x") == 1
+
+    # An outside edit of one file still invalidates
+    first.write_text(json.dumps({"a": {"amount": 5.0}}))
+    os.utime(first, (time.time() + 5, time.time() + 5))
+    managers[0].reload_budgets()
+    assert cache.get("report:x") is None
+
+
+def test_sqlite_cache_is_shared_between_instances(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    first, second = SQLiteCache(str(path)), SQLiteCache(str(path))
+    df = pd.DataFrame({"x": [1.5, 2.5]})
+    first.set("trends:a", df, tags=("period:2024-01",))
+    first.set("trends:b", {"n": 1}, tags=("period:2024-02",))
+    pd.testing.assert_frame_equal(second.get("trends:a"), df)
+
+    assert second.invalidate_tags("period:2024-01") == 1
+    assert first.get("trends:a") is None
+    assert first.get("trends:b") == {"n": 1}
+
+    # A computation that started before another process invalidated its input is not stored
+    def compute():
+        second.invalidate_tags("period:2024-03")
+        return "old"
+
+    assert first.get_or_compute("trends:c", compute, tags=("period:2024-03",)) == "old"
+    assert second.get("trends:c") is None
+
+    second.clear()
+    assert first.get("trends:b") is None and first.stats()["entries"] == 0
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a:1", 1)
+    time.sleep(0.01)
+    cache.set("a:2", 2)
+    time.sleep(0.01)
+    cache.get("a:1")
+    cache.set("b:1", 3)
+    assert cache.get("a:2") is None
+    assert cache.get("a:1") == 1 and cache.get("b:1") == 3
+    assert cache.stats()["namespaces"]["a"]["evictions"] == 1
+
+
+def test_incomplete_backend_cannot_be_created():
+    class NoStorage(CacheBackend):
+        def _encode(self, value):
+            return value, 0
+
+    with pytest.raises(TypeError):
+        NoStorage()
+
+
+def test_key_builder_canonicalizes_arguments():
+    from app.services.cache_keys import KeyBuilder, CacheKeyError
+
+    def report(year, month=1, options=None, df=None, session=None):
+        pass
+
+    make_key = KeyBuilder(report, key={"df": lambda df: None if df is None else len(df.columns)}, ignore=("session",))
+    assert make_key(2024) == make_key(year=2024, month=1) == make_key(2024, 1, session=object())
+    assert make_key(2024, options={"a": 1, "b": 2}) == make_key(2024, options={"b": 2, "a": 1})
+    assert len({make_key(1), make_key(1.0), make_key("1"), make_key(True)}) == 4
+    assert make_key(2024, df=pd.DataFrame({"x": [1, 2]})) == make_key(2024, df=pd.DataFrame({"x": [3]}))
+
+    with pytest.raises(CacheKeyError):
+        KeyBuilder(report)(2024, session=object())
+
+    big = pd.DataFrame({"x": range(1000)})
+    assert KeyBuilder(report)(2024, df=big) == KeyBuilder(report)(2024, df=big.copy())
+
+
+def test_cached_service_method_hits_across_instances(monkeypatch):
+    from app.payroll.service import PayrollService
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    from app.services import cache as cache_module
+
+    monkeypatch.setattr(cache_module, "_cache", LRUCache())
+    first = PayrollService(MockQuickBooksClient()).generate_variance_report(2024, 2)
+    second = PayrollService(MockQuickBooksClient()).generate_variance_report(year=2024, month=2)
+    assert second is first
+    stats = cache_module.get_cache().stats()["namespaces"]["report"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+    PayrollService(MockQuickBooksClient()).invalidate_period(2024, 2)
+    assert cache_module.get_cache().stats()["entries"] == 0
+
+
+def test_cache_warmer_fills_recent_periods_within_budget(monkeypatch):
+    from app.services import cache as cache_module
+    from app.services.warmup import CacheWarmer, DONE, TIMED_OUT
+
+    monkeypatch.setattr(cache_module, "_cache", LRUCache())
+    warmer = CacheWarmer(months=1, trend_windows=(3,), budget_seconds=30)
+    assert warmer.start()
+    warmer._thread.join(timeout=30)
+    stats = warmer.stats()
+    assert stats["status"] == DONE and stats["progress"]["done"] == stats["progress"]["total"] == 4
+    namespaces = cache_module.get_cache().stats()["namespaces"]
+    assert namespaces["report"]["entries"] == 2 and namespaces["trends"]["entries"] == 2
+
+    warmer = CacheWarmer(months=1, budget_seconds=0)
+    warmer.start()
+    warmer._thread.join(timeout=30)
+    assert warmer.stats()["status"] == TIMED_OUT and warmer.stats()["progress"]["done"] == 0
@@ -0,0 +1,24 @@
+"""Tests for executor offloading and event loop lag monitoring."""
+import asyncio
+import threading
+import time
+from app.services.executors import run_light, run_export, LoopLagMonitor
+
+
+def test_blocking_work_runs_off_the_event_loop():
+    """Blocking calls run in pool threads while the loop keeps ticking."""
+    async def scenario():
+        loop_thread = threading.get_ident()
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.start()
+        threads = await asyncio.gather(
+            run_export(lambda: (time.sleep(0.2), threading.get_ident())[1]),
+            run_light(threading.get_ident),
+        )
+        await monitor.stop()
+        return loop_thread, threads, monitor.stats()
+
+    loop_thread, threads, stats = asyncio.run(scenario())
+    assert loop_thread not in threads
+    assert stats["samples"] > 5
+    assert stats["max_ms"] < 150
@@ -0,0 +1,80 @@
+"""Tests for asynchronous export jobs."""
+import threading
+import time
+import pytest
+from app.api.streaming import parse_range
+from app.services.export_jobs import ExportJobManager, DONE, FAILED
+
+
+def wait_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status not in (DONE, FAILED) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_identical_in_flight_jobs_are_deduplicated(tmp_path):
+    manager = ExportJobManager(str(tmp_path), workers=2)
+    release = threading.Event()
+    calls = []
+
+    def builder(params, target, progress):
+        calls.append(params)
+        release.wait(5)
+        target.write_bytes(b"report")
+        progress(1, 1, "done")
+        return {"filename": "report.csv", "media_type": "text/csv"}
+
+    first, created = manager.submit({"year": 2024, "month": 3}, builder)
+    second, created_again = manager.submit({"month": 3, "year": 2024}, builder)
+    assert created and not created_again
+    assert second is first
+
+    release.set()
+    wait_finished(first)
+    assert first.status == DONE
+    assert first.path.read_bytes() == b"report"
+    assert first.progress == {"done": 1, "total": 1, "label": "done"}
+    assert len(calls) == 1
+
+    # Once finished, the same export starts a new job
+    third, created = manager.submit({"year": 2024, "month": 3}, builder)
+    assert created and third is not first
+    wait_finished(third)
+    manager.shutdown()
+
+
+def test_failed_and_expired_jobs(tmp_path):
+    manager = ExportJobManager(str(tmp_path), workers=1, ttl=0.05)
+
+    def failing(params, target, progress):
+        raise RuntimeError("boom")
+
+    def working(params, target, progress):
+        target.write_bytes(b"x")
+        return {"filename": "x.csv"}
+
+    failed, _ = manager.submit({"n": 1}, failing)
+    assert wait_finished(failed).status == FAILED
+    assert failed.error == "boom"
+
+    done, _ = manager.submit({"n": 2}, working)
+    wait_finished(done)
+    assert done.path.exists()
+    time.sleep(0.1)
+    assert manager.get(done.id) is None
+    assert not done.path.exists()
+    assert list(tmp_path.iterdir()) == []
+    manager.shutdown()
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+    with pytest.raises(ValueError):
+        parse_range("bytes=-10", 0)
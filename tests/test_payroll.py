@@ -21,3 +21,93 @@ def test_budget_manager():
     if os.path.exists("data/test_budgets.json"):
         os.remove("data/test_budgets.json")
 
+
+
+def test_concurrent_payroll_loads_share_one_fetch():
+    """Test that parallel callers of one service load a month's payroll once."""
+    import threading
+    import time
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    
+    client = MockQuickBooksClient()
+    fetch = client.get_payroll_data
+    calls = []
+    
+    def slow_fetch(start_date, end_date):
+        calls.append(start_date)
+        time.sleep(0.05)
+        return fetch(start_date, end_date)
+    
+    client.get_payroll_data = slow_fetch
+    service = PayrollService(client)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.get_monthly_payroll(2024, 7)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_dataset_context_builds_each_dataset_once(monkeypatch):
+    """Test that a dataset context memoizes datasets, including failures."""
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    from app.services import cache as cache_module
+    from app.services.datasets import DatasetContext
+    
+    monkeypatch.setattr(cache_module, "_cache", cache_module.LRUCache())
+    datasets = DatasetContext(PayrollService(MockQuickBooksClient()))
+    report = datasets.formatted_report(2024, 4)
+    assert datasets.formatted_report(2024, 4) is report
+    assert "Status" in report.columns
+    assert (datasets.departments(2024, 4)["Employee ID"] == "").all()
+    assert datasets.computed == [
+        "payroll:2024-04", "budgets:2024-04", "report:2024-04", "formatted_report:2024-04", "departments:2024-04"
+    ]
+    
+    calls = []
+    
+    def failing():
+        calls.append(1)
+        raise ValueError("no data")
+    
+    datasets.add_dataset("broken", failing)
+    datasets.add_dataset("dependent", lambda value: value, depends_on=("broken",))
+    for name in ("broken", "dependent"):
+        with pytest.raises(ValueError):
+            datasets.resolve(name)
+    assert len(calls) == 1
+
+
+def test_dataset_context_shares_period_inputs(monkeypatch):
+    """Test that reports and trends of one context load each month's inputs once."""
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    from app.services import cache as cache_module
+    from app.services.datasets import DatasetContext
+    
+    monkeypatch.setattr(cache_module, "_cache", cache_module.LRUCache())
+    service = PayrollService(MockQuickBooksClient())
+    budget_loads = []
+    get_all_budgets = service.budget_manager.get_all_budgets
+    monkeypatch.setattr(
+        service.budget_manager, "get_all_budgets",
+        lambda month, year: budget_loads.append((year, month)) or get_all_budgets(month, year)
+    )
+    
+    datasets = DatasetContext(service)
+    reports = [datasets.report(2024, month) for month in (4, 5, 6)]
+    trends = datasets.trends(3, 2024, 6)
+    assert sorted(budget_loads) == [(2024, "04"), (2024, "05"), (2024, "06")]
+    assert list(trends["Total Actual"]) == [
+        round(report[report["Employee ID"] != ""]["Actual"].sum(), 2) for report in reports
+    ]
+    
+    # A shared-cache hit loads nothing
+    budget_loads.clear()
+    DatasetContext(service).report(2024, 5)
+    assert budget_loads == []
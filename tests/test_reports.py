@@ -0,0 +1,150 @@
+"""Tests for report generation and streaming."""
+import json
+from app.quickbooks.mock_client import MockQuickBooksClient
+from app.payroll.service import PayrollService
+from app.reports.variance import (
+    format_variance_report, iter_formatted_rows, iter_ndjson, iter_json_array
+)
+
+
+def test_streamed_rows_match_report():
+    """Streaming pipeline yields the same rows as the DataFrame report."""
+    service = PayrollService(MockQuickBooksClient())
+    df_formatted = format_variance_report(service.generate_variance_report(2024, 3))
+
+    rows = list(iter_formatted_rows(service.iter_variance_rows(2024, 3)))
+    assert rows == df_formatted.to_dict(orient="records")
+
+    # Department totals come last
+    dept_rows = [row for row in rows if row["Employee ID"] == ""]
+    assert rows[-len(dept_rows):] == dept_rows
+
+
+def test_ndjson_and_json_array_serialization():
+    """Both streaming encodings round-trip to the original rows."""
+    rows = [{"a": 1}, {"a": 2}]
+
+    lines = b"".join(iter_ndjson(rows)).decode().splitlines()
+    assert [json.loads(line) for line in lines] == rows
+    assert json.loads(b"".join(iter_json_array(rows))) == rows
+    assert json.loads(b"".join(iter_json_array([]))) == []
+
+
+def test_streaming_excel_export(tmp_path):
+    """Write-only export keeps the sheets, charts, header style and widths."""
+    from openpyxl import load_workbook
+    from app.reports.exporter import ReportExporter
+
+    service = PayrollService(MockQuickBooksClient())
+    df_formatted = format_variance_report(service.generate_variance_report(2024, 3))
+    trends_df = service.get_historical_variance_trends(3, 2024, 3)
+    dept_df = df_formatted[df_formatted["Employee ID"] == ""]
+
+    path = ReportExporter().export_to_excel(
+        df_formatted, tmp_path / "report.xlsx", department_data=dept_df, trends_data=trends_df
+    )
+    workbook = load_workbook(path)
+    assert workbook.sheetnames == [
+        "Variance Report", "Department Charts", "Historical Trends", "Monthly Comparison", "Employee Charts"
+    ]
+    ws = workbook["Variance Report"]
+    assert ws.max_row == len(df_formatted) + 1
+    assert ws["A1"].font.b
+    longest = df_formatted["Employee Name"].str.len().max()
+    assert ws.column_dimensions["B"].width == min(longest + 2, 50)
+    assert len(workbook["Department Charts"]._charts) == 1
+
+
+def test_streaming_excel_export_memory_is_bounded():
+    """A large write-only export stays under a fixed allocation ceiling."""
+    import tempfile
+    import tracemalloc
+    import numpy as np
+    import pandas as pd
+    from app.reports.exporter import ReportExporter
+
+    # Large enough that an in-memory workbook needs several times the
+    # ceiling; kept moderate because tracemalloc slows openpyxl down a lot
+    rows = 10_000
+    rng = np.random.default_rng(0)
+    budget = rng.uniform(3000, 12000, rows).round(2)
+    actual = (budget * rng.uniform(0.8, 1.2, rows)).round(2)
+    df = pd.DataFrame({
+        "Employee ID": [f"E{i:06d}" for i in range(rows)],
+        "Employee Name": [f"Employee {i}" for i in range(rows)],
+        "Department": rng.choice(["Architecture", "Engineering", "Administration"], rows),
+        "Budget": budget,
+        "Actual": actual,
+        "Variance": actual - budget,
+        "Variance %": ((actual - budget) / budget * 100).round(2),
+        "Status": "Within Budget",
+    })
+
+    with tempfile.TemporaryFile() as output:
+        tracemalloc.start()
+        try:
+            ReportExporter().export_to_excel(df, output, include_charts=False, streaming=True)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert peak < 10 * 1024 * 1024
+
+
+def test_excel_template_builds_charts_per_export():
+    """Each export gets its own charts; the shared template holds no chart state."""
+    import io
+    from openpyxl import load_workbook
+    from app.reports.excel_template import get_excel_template
+    from app.reports.exporter import ReportExporter
+
+    service = PayrollService(MockQuickBooksClient())
+    df_formatted = format_variance_report(service.generate_variance_report(2024, 3))
+    exporter = ReportExporter()
+    for _ in range(2):
+        buffer = io.BytesIO()
+        exporter.export_to_excel(df_formatted, buffer)
+        ws = load_workbook(buffer)["Employee Charts"]
+        assert len(ws._charts) == 1
+        assert len(ws._charts[0].series) == 2
+
+    template = get_excel_template()
+    assert template is get_excel_template()
+    layout = template.sheets["employee"]
+    assert layout.chart() is not layout.chart()
+    assert not layout.chart().series
+
+
+def test_bulk_workbook_built_in_worker_processes():
+    """Months are built in spawned workers and merged behind a summary sheet."""
+    import io
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from openpyxl import load_workbook
+    from app.reports.bulk import export_bulk
+
+    progress = []
+    buffer = io.BytesIO()
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        export_bulk(buffer, 2024, months=[1, 2], company_ids=["acme", "globex"],
+                    executor=pool, progress=lambda done, total, label: progress.append((done, total)))
+
+    workbook = load_workbook(buffer)
+    assert workbook.sheetnames == ["Summary", "acme 2024-01", "acme 2024-02", "globex 2024-01", "globex 2024-02"]
+    assert workbook["Summary"].max_row == 5
+    assert progress[-1] == (5, 5)
+
+
+def test_bulk_zip_has_one_workbook_per_company():
+    import io
+    import zipfile
+    from openpyxl import load_workbook
+    from app.reports.bulk import export_bulk, InlineExecutor
+
+    buffer = io.BytesIO()
+    export_bulk(buffer, 2024, months=[3], company_ids=["acme", "globex"], output="zip",
+                executor=InlineExecutor())
+
+    archive = zipfile.ZipFile(buffer)
+    assert sorted(archive.namelist()) == ["variance_pack_acme_2024.xlsx", "variance_pack_globex_2024.xlsx"]
+    pack = load_workbook(io.BytesIO(archive.read("variance_pack_acme_2024.xlsx")))
+    assert pack.sheetnames == ["Summary", "2024-03"]
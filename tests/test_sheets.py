@@ -0,0 +1,337 @@
+"""Tests for the Google Sheets client and writers."""
+import json
+import threading
+import httplib2
+import pytest
+import pandas as pd
+from googleapiclient.errors import HttpError
+from app.services import sheets_client
+from app.reports import exporter as exporter_module
+from app.reports.exporter import ReportExporter
+from config import settings
+
+
+class FakeRequest:
+    def __init__(self, handler):
+        self.handler = handler
+
+    def execute(self):
+        return self.handler()
+
+
+class FakeSheetsService:
+    """
+    In-memory stand-in for the Sheets v4 API that counts round trips.
+
+    Like the real API, sheets have a grid (1000 x 26 for new sheets) that
+    updateCells cannot write outside of.
+    """
+
+    def __init__(self, titles=()):
+        self.sheets = {title: self._new_sheet(index) for index, title in enumerate(titles)}
+        self.calls = []
+
+    @staticmethod
+    def _new_sheet(sheet_id, row_count=1000, column_count=26):
+        return {"id": sheet_id, "rows": {}, "row_count": row_count, "column_count": column_count}
+
+    def spreadsheets(self):
+        return self
+
+    def get(self, spreadsheetId, fields=None):
+        def handler():
+            self.calls.append("get")
+            return {"sheets": [
+                {"properties": {"title": title, "sheetId": sheet["id"]}}
+                for title, sheet in self.sheets.items()
+            ]}
+        return FakeRequest(handler)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def handler():
+            self.calls.append("batchUpdate")
+            by_id = {sheet["id"]: sheet for sheet in self.sheets.values()}
+            for request in body["requests"]:
+                if "addSheet" in request:
+                    props = request["addSheet"]["properties"]
+                    self.sheets[props["title"]] = by_id[props["sheetId"]] = self._new_sheet(props["sheetId"])
+                elif "updateSheetProperties" in request:
+                    props = request["updateSheetProperties"]["properties"]
+                    sheet = by_id[props["sheetId"]]
+                    sheet["row_count"] = props["gridProperties"]["rowCount"]
+                    sheet["column_count"] = props["gridProperties"]["columnCount"]
+                    sheet["rows"] = {index: row for index, row in sheet["rows"].items() if index < sheet["row_count"]}
+                elif "updateCells" in request:
+                    update = request["updateCells"]
+                    if "range" in update:
+                        grid = update["range"]
+                        sheet = by_id[grid["sheetId"]]
+                        start = grid.get("startRowIndex", 0)
+                        end = grid.get("endRowIndex")
+                        self._check_grid(sheet, end or start, 0)
+                        for index in list(sheet["rows"]):
+                            if index >= start and (end is None or index < end):
+                                del sheet["rows"][index]
+                    else:
+                        start = update["start"]
+                        sheet = by_id[start["sheetId"]]
+                        self._check_grid(
+                            sheet, start["rowIndex"] + len(update["rows"]),
+                            max((len(row["values"]) for row in update["rows"]), default=0)
+                        )
+                        for offset, row in enumerate(update["rows"]):
+                            sheet["rows"][start["rowIndex"] + offset] = [
+                                next(iter(cell["userEnteredValue"].values())) if cell else None
+                                for cell in row["values"]
+                            ]
+            return {"replies": []}
+        return FakeRequest(handler)
+
+    @staticmethod
+    def _check_grid(sheet, rows, columns):
+        if rows > sheet["row_count"] or columns > sheet["column_count"]:
+            raise HttpError(httplib2.Response({"status": 400}), b"Range exceeds grid limits")
+
+    def values_of(self, title):
+        rows = self.sheets[title]["rows"]
+        return [rows[index] for index in sorted(rows)]
+
+
+@pytest.fixture
+def fake_exporter(monkeypatch):
+    """Exporter wired to a fake Sheets service with an empty metadata cache."""
+    monkeypatch.setattr(settings, "google_sheets_spreadsheet_id", "sheet-1")
+    monkeypatch.setattr(exporter_module, "_sheet_metadata", {})
+    exporter = ReportExporter()
+    exporter.sheets_service = FakeSheetsService(titles=["Existing"])
+    return exporter
+
+
+@pytest.fixture
+def service_account_file(tmp_path, monkeypatch):
+    """Point settings at a throwaway service account key."""
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+    rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    path = tmp_path / "credentials.json"
+    path.write_text(json.dumps({
+        "type": "service_account",
+        "project_id": "test",
+        "private_key_id": "1",
+        "private_key": pem,
+        "client_email": "test@test.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }))
+    monkeypatch.setattr(settings, "google_sheets_credentials_path", str(path))
+    sheets_client.reset_sheets_client()
+    yield path
+    sheets_client.reset_sheets_client()
+
+
+def test_sheets_client_is_shared_per_thread(service_account_file):
+    """Credentials load once; each thread reuses its own client."""
+    service = sheets_client.get_sheets_service()
+    assert sheets_client.get_sheets_service() is service
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(sheets_client.get_sheets_service()))
+    thread.start()
+    thread.join()
+    assert other[0] is not service
+    assert other[0]._http.credentials is service._http.credentials
+
+
+def test_sheets_client_disabled_without_credentials(monkeypatch):
+    monkeypatch.setattr(settings, "google_sheets_credentials_path", None)
+    assert sheets_client.get_sheets_service() is None
+
+
+def test_exporter_uses_shared_client(service_account_file):
+    assert ReportExporter().sheets_service is sheets_client.get_sheets_service()
+
+
+def test_multi_sheet_export_is_one_batch_update(fake_exporter):
+    """Creating, clearing and writing several sheets costs one round trip."""
+    service = fake_exporter.sheets_service
+    frames = {
+        "Existing": pd.DataFrame({"a": [1, 2]}),
+        "New": pd.DataFrame({"b": ["x"], "c": [True]}),
+    }
+
+    result = fake_exporter.export_sheets_to_google_sheets(frames)
+    assert service.calls == ["get", "batchUpdate"]
+    assert result["updatedCells"] == 3 + 4
+    assert service.values_of("New") == [["b", "c"], ["x", True]]
+
+    # Metadata is cached: the next export is a single call
+    fake_exporter.export_to_google_sheets(pd.DataFrame({"a": [3]}), sheet_name="Existing")
+    assert service.calls == ["get", "batchUpdate", "batchUpdate"]
+    assert service.values_of("Existing") == [["a"], [3]]
+
+
+def test_incremental_export_skips_and_diffs(fake_exporter, monkeypatch):
+    """Unchanged sheets cost nothing; changed sheets rewrite only changed rows."""
+    service = fake_exporter.sheets_service
+    df = pd.DataFrame({"a": list(range(10))})
+    first = fake_exporter.export_sheets_to_google_sheets({"Existing": df})
+    previous = first["fingerprints"]
+    calls = len(service.calls)
+
+    unchanged = fake_exporter.export_sheets_to_google_sheets({"Existing": df}, previous_fingerprints=previous)
+    assert unchanged["skippedSheets"] == ["Existing"]
+    assert len(service.calls) == calls
+
+    changed = df.copy()
+    changed.loc[4, "a"] = 99
+    changed = changed.iloc[:8]
+    result = fake_exporter.export_sheets_to_google_sheets({"Existing": changed}, previous_fingerprints=previous)
+    assert result["updatedCells"] == 1
+    assert service.values_of("Existing") == [["a"]] + [[value] for value in changed["a"]]
+
+
+def test_large_sheets_are_written_in_chunks(fake_exporter, monkeypatch):
+    """Sheets longer than a new sheet's 1000-row grid are resized, then written in parallel chunks."""
+    monkeypatch.setattr(settings, "sheets_write_chunk_rows", 250)
+    service = fake_exporter.sheets_service
+    df = pd.DataFrame({"a": range(1200)})
+
+    fake_exporter.export_sheets_to_google_sheets({"Big": df})
+    assert service.calls.count("batchUpdate") == 5
+    assert service.values_of("Big") == [["a"]] + [[value] for value in range(1200)]
+    assert service.sheets["Big"]["row_count"] == 1201
+
+
+def test_incremental_export_resizes_the_grid(fake_exporter, monkeypatch):
+    """A sheet growing past its earlier size is enlarged; a shrinking one gives its rows back."""
+    monkeypatch.setattr(settings, "sheets_write_chunk_rows", 500)
+    service = fake_exporter.sheets_service
+    first = fake_exporter.export_sheets_to_google_sheets({"Existing": pd.DataFrame({"a": range(300)})})
+
+    grown = pd.DataFrame({"a": range(1500)})
+    grown.loc[10, "a"] = -1
+    second = fake_exporter.export_sheets_to_google_sheets(
+        {"Existing": grown}, previous_fingerprints=first["fingerprints"]
+    )
+    assert second["updatedCells"] == 1 + 1200
+    assert service.values_of("Existing") == [["a"]] + [[value] for value in grown["a"]]
+
+    fake_exporter.export_sheets_to_google_sheets(
+        {"Existing": grown.iloc[:10]}, previous_fingerprints=second["fingerprints"]
+    )
+    assert service.sheets["Existing"]["row_count"] == 11
+    assert service.values_of("Existing") == [["a"]] + [[value] for value in grown["a"][:10]]
+
+
+@pytest.fixture
+def fake_sheets_endpoint():
+    """Local HTTP server answering Sheets batchUpdate calls, throttling the first two."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            hits.append(self.path)
+            status = 429 if len(hits) <= 2 else 200
+            body = b'{"error": {"code": 429, "message": "quota"}}' if status == 429 else b'{"replies": []}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", hits
+    server.shutdown()
+
+
+def test_scheduler_retries_throttled_calls(fake_sheets_endpoint):
+    """429 responses from the API are retried with backoff until they succeed."""
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    from app.services.sheets_quota import SheetsScheduler
+
+    url, hits = fake_sheets_endpoint
+    service = build_from_document(
+        get_static_doc("sheets", "v4"),
+        http=httplib2.Http(),
+        client_options={"api_endpoint": url}
+    )
+    scheduler = SheetsScheduler(backoff_base=0.01)
+    request = service.spreadsheets().batchUpdate(spreadsheetId="abc", body={"requests": []})
+
+    assert scheduler.execute(request, "write") == {"replies": []}
+    assert len(hits) == 3
+    assert hits[0].startswith("/v4/spreadsheets/abc:batchUpdate")
+    assert scheduler.stats()["retries"] == 2
+
+
+def test_scheduler_serves_interactive_lane_first():
+    """When quota is exhausted, a waiting interactive call beats a background one."""
+    import time
+    from app.services.sheets_quota import SheetsScheduler, INTERACTIVE, BACKGROUND
+
+    scheduler = SheetsScheduler(write_per_minute=60 * 20)
+    scheduler._buckets["write"].tokens = 0
+    order = []
+
+    class Request:
+        def __init__(self, name):
+            self.name = name
+
+        def execute(self):
+            order.append(self.name)
+
+    background = threading.Thread(target=scheduler.execute, args=(Request("background"), "write", BACKGROUND))
+    interactive = threading.Thread(target=scheduler.execute, args=(Request("interactive"), "write", INTERACTIVE))
+    background.start()
+    time.sleep(0.01)
+    interactive.start()
+    background.join(2)
+    interactive.join(2)
+    assert order == ["interactive", "background"]
+
+
+def test_sync_all_computes_shared_report_once(fake_exporter, monkeypatch):
+    """Both report sheets come from one report build and one batched write."""
+    from app.services import sheets_sync
+    monkeypatch.setattr(sheets_sync, "_fingerprints", {})
+    service = sheets_sync.SheetsSyncService()
+    service.exporter = fake_exporter
+    builds = []
+    generate = service.payroll_service.generate_variance_report
+    monkeypatch.setattr(
+        service.payroll_service, "generate_variance_report",
+        lambda *args, **kwargs: builds.append(args) or generate(*args, **kwargs)
+    )
+    pipelines = []
+
+    class RecordingPipeline(sheets_sync.SyncPipeline):
+        def build(self):
+            pipelines.append(self)
+            return super().build()
+
+    monkeypatch.setattr(sheets_sync, "SyncPipeline", RecordingPipeline)
+
+    results = service.sync_all()
+    assert all(results.values())
+    assert len(builds) == 1
+    # Targets use the standard datasets, each memoized under one name
+    year, month = builds[0]
+    built = [name for name in pipelines[0].computed if not name.startswith(("payroll:", "budgets:"))]
+    assert sorted(built) == sorted([
+        f"report:{year}-{month:02d}", f"formatted_report:{year}-{month:02d}", f"trends:12:{year}-{month:02d}"
+    ])
+    assert fake_exporter.sheets_service.calls == ["get", "batchUpdate"]
@@ -0,0 +1,63 @@
+"""Tests for the scheduled sync daemon."""
+from datetime import datetime
+import pytest
+from app.services.sync_daemon import CronSchedule, SyncDaemon
+
+
+def test_cron_schedule_next_run():
+    every_five = CronSchedule("*/5 * * * *")
+    assert every_five.next_after(datetime(2024, 1, 1, 10, 3, 30)) == datetime(2024, 1, 1, 10, 5)
+
+    weekday_mornings = CronSchedule("30 8 * * 1-5")
+    # 2024-01-06 is a Saturday
+    assert weekday_mornings.next_after(datetime(2024, 1, 6, 9, 0)) == datetime(2024, 1, 8, 8, 30)
+
+    with pytest.raises(ValueError):
+        CronSchedule("61 * * * *")
+
+
+class FakeSyncService:
+    calls = 0
+
+    def sync_latest_report(self):
+        FakeSyncService.calls += 1
+        return True
+
+
+def test_daemon_skips_unchanged_sources_and_persists_state(tmp_path):
+    state_path = tmp_path / "state.json"
+    FakeSyncService.calls = 0
+    daemon = SyncDaemon({"latest": "* * * * *"}, state_path=str(state_path), service_factory=FakeSyncService)
+
+    assert daemon.run_once() == {"latest": "success"}
+    assert daemon.run_once() == {"latest": "skipped"}
+    daemon.shutdown()
+    assert FakeSyncService.calls == 1
+
+    # A restarted daemon picks up the persisted state
+    restarted = SyncDaemon({"latest": "* * * * *"}, state_path=str(state_path), service_factory=FakeSyncService)
+    assert restarted.run_once() == {"latest": "skipped"}
+    assert restarted.run_once(force=True) == {"latest": "success"}
+    restarted.shutdown()
+
+    metrics = restarted.metrics.render()
+    assert 'sheets_sync_runs_total{sync_type="latest",status="success"} 1' in metrics
+    assert 'sheets_sync_skipped_total{sync_type="latest"} 1' in metrics
+
+
+def test_source_version_reads_the_configured_client(tmp_path, monkeypatch):
+    from app.quickbooks.mock_client import MockQuickBooksClient
+    from app.services import sync_daemon
+
+    clients = []
+
+    def create_qb_client():
+        clients.append(MockQuickBooksClient())
+        return clients[-1]
+
+    monkeypatch.setattr(sync_daemon, "create_qb_client", create_qb_client)
+    daemon = SyncDaemon({"latest": "* * * * *"}, state_path=str(tmp_path / "state.json"),
+                        service_factory=FakeSyncService)
+    assert daemon.source_version("latest", datetime(2024, 3, 15))
+    daemon.shutdown()
+    assert len(clients) == 1
@@ -0,0 +1,48 @@
+"""Tests for the background Google Sheets sync queue."""
+import threading
+import time
+from app.services.sync_queue import SyncQueue
+
+
+class FakeExporter:
+    sheets_service = object()
+
+
+class FakeSyncService:
+    """Counts syncs instead of calling Google Sheets."""
+
+    def __init__(self):
+        self.exporter = FakeExporter()
+        self.calls = 0
+        self.done = threading.Event()
+
+    def sync_latest_report(self):
+        self.calls += 1
+        self.done.set()
+        return True
+
+
+def test_requests_are_coalesced_and_debounced():
+    """Bursts of requests produce a single sync per debounce window."""
+    service = FakeSyncService()
+    queue = SyncQueue(lambda: service, debounce_seconds=0.3)
+
+    assert queue.request("latest") is True
+    for _ in range(10):
+        queue.request("latest")
+    assert service.done.wait(2)
+
+    # A request right after the sync waits out the debounce window
+    service.done.clear()
+    queue.request("latest")
+    assert queue.stats()["queue_depth"] == 1
+    time.sleep(0.1)
+    assert service.calls == 1
+    assert service.done.wait(2)
+    queue.stop(timeout=2)
+
+    stats = queue.stats()
+    assert service.calls == 2
+    assert stats["completed"] == 2
+    assert stats["coalesced"] >= 9
+    assert stats["last_sync_at"] is not None